@@ -0,0 +1,122 @@
+"""
+Benchmark: vectorized geometry engine vs the original per-feature loops.
+
+Usage (from the repo root):
+    python benchmarks/bench_geometry.py [path/to/GN_census_merged.geojson]
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import geometry  # noqa: E402
+from build_geojson import SOURCE_PATH, resolve_conflicts  # noqa: E402
+
+
+def legacy_centroid(feature):
+    """Original approximation: mean of the first outer ring's vertices."""
+    geom = feature.get('geometry')
+    if not geom or not geom.get('coordinates'):
+        return None
+    coords = geom['coordinates']
+    ring = coords[0] if geom['type'] == 'Polygon' else coords[0][0]
+    lons = [p[0] for p in ring]
+    lats = [p[1] for p in ring]
+    return (sum(lats)/len(lats), sum(lons)/len(lons))
+
+
+def legacy_resolve(data):
+    """The original four-pass loop from dashboard.load_geojson()."""
+    shape_to_districts = {}
+    feature_centroids = {}
+    for i, feature in enumerate(data['features']):
+        props = feature['properties']
+        sid = props.get('shapeID')
+        dist = str(props.get('District_Name', '')).upper().strip()
+        if sid and dist and dist != 'NONE':
+            shape_to_districts.setdefault(sid, set()).add(dist)
+            cent = legacy_centroid(feature)
+            if cent:
+                feature_centroids[i] = cent
+
+    district_points = {}
+    for i, feature in enumerate(data['features']):
+        props = feature['properties']
+        sid = props.get('shapeID')
+        dist = str(props.get('District_Name', '')).upper().strip()
+        if sid and dist and len(shape_to_districts.get(sid, [])) == 1 and i in feature_centroids:
+            district_points.setdefault(dist, []).append(feature_centroids[i])
+    district_centers = {
+        d: (sum(p[0] for p in pts) / len(pts), sum(p[1] for p in pts) / len(pts))
+        for d, pts in district_points.items()
+    }
+
+    def dist_sq(p1, p2): return (p1[0]-p2[0])**2 + (p1[1]-p2[1])**2
+
+    validated = []
+    for i, feature in enumerate(data['features']):
+        props = feature['properties']
+        sid = props.get('shapeID')
+        claimed = str(props.get('District_Name', '')).upper().strip()
+        is_valid = True
+        if sid and len(shape_to_districts.get(sid, [])) > 1:
+            cent = feature_centroids.get(i)
+            if cent and claimed in district_centers:
+                my_dist = dist_sq(cent, district_centers[claimed])
+                for comp in shape_to_districts[sid]:
+                    if comp != claimed and comp in district_centers and dist_sq(cent, district_centers[comp]) < my_dist:
+                        is_valid = False
+                        break
+        if is_valid:
+            props['District_GN_Key'] = claimed + '|' + str(props.get('shapeName', '')).upper().strip()
+            validated.append(feature)
+    data['features'] = validated
+    return data
+
+
+def timed(label, fn, repeat=3, setup=None):
+    """Best-of-N wall time; `setup` (untimed) builds fresh input for each run."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        result = fn(arg) if setup else fn()
+        best = min(best, time.perf_counter() - start)
+        del arg
+    print(f"  {label:<40} {best * 1000:9.1f} ms")
+    return result, best
+
+
+def main():
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else SOURCE_PATH
+    print(f"Loading {path}...")
+    raw = path.read_bytes()
+    features = json.loads(raw)['features']
+    print(f"Features: {len(features):,}\n")
+
+    print("Centroids")
+    _, t_loop = timed("loop (first-ring vertex mean)", lambda: [legacy_centroid(f) for f in features])
+    flat, t_flat = timed("flatten_features", lambda: geometry.flatten_features(features))
+    _, t_vec = timed("centroids (area-weighted)", lambda: geometry.centroids(flat))
+    timed("bounding_boxes", lambda: geometry.bounding_boxes(flat))
+    print(f"  speed-up, centroids only:   {t_loop / t_vec:.1f}x")
+    print(f"  speed-up, incl. flattening: {t_loop / (t_flat + t_vec):.1f}x\n")
+    del features, flat
+
+    print("Conflict resolution (fresh parse per run, parse time excluded)")
+    fresh = lambda: json.loads(raw)  # noqa: E731
+    legacy, t_legacy = timed("legacy four-pass loop", legacy_resolve, setup=fresh)
+    vector, t_vector = timed("vectorized resolve_conflicts", resolve_conflicts, setup=fresh)
+    print(f"  speed-up: {t_legacy / t_vector:.1f}x")
+
+    legacy_keys = {f['properties']['shapeID'] + '|' + f['properties']['District_GN_Key'] for f in legacy['features']}
+    vector_keys = {f['properties']['shapeID'] + '|' + f['properties']['District_GN_Key'] for f in vector['features']}
+    print(f"\nKept features: legacy {len(legacy_keys):,}, vectorized {len(vector_keys):,}, "
+          f"differing {len(legacy_keys ^ vector_keys):,} (true centroids vs vertex means)")
+
+
+if __name__ == "__main__":
+    main()
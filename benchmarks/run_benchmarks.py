@@ -0,0 +1,273 @@
+"""
+Benchmark suite for the dashboard data path and the cleaning script.
+Every stage runs headless (no Streamlit runtime) and records its best wall
+time over `--repeat` runs plus the peak memory traced by tracemalloc in one
+extra run. Tracing slows large stages several times, so `--no-memory`
+skips it for quick timing runs. Scale 1 is the real data; larger scales
+use synth_census.py (synthetic GN rows and matching boundaries). Results
+are written as JSON tagged with the current commit, so two runs can be
+compared with `--compare`.
+
+Stages:
+  load_data               census store -> DataFrame (dashboard columns)
+  load_data_mapped        memory-mapped Arrow copy -> DataFrame (what the dashboard reads)
+  load_geojson_artifact   validated map artifact (size/mtime check, as in the dashboard)
+  load_geojson_resolve    raw merged file: resolve conflicts + link (stale-artifact path)
+  filter_index            hierarchy index build (once per session)
+  filter_select           Province / District selection as in main()
+  groupby_cube            Province/District/DS cube build (once per session)
+  groupby_breakdown       District and DS rollups for the breakdown charts
+  groupby_pandas          plain DataFrame.groupby of the same breakdown
+  clean_census            numeric cleaning of the raw Population sheet
+
+GeoJSON stages run at every scale against synthetic boundaries for the
+scaled census, so map loading is measured at the same sizes as the tables.
+
+Usage (from the repo root):
+    python benchmarks/run_benchmarks.py [--scales 1 10 100] [--repeat 3] [--no-memory]
+        [--stages load_data filter_select ...] [--output path.json] [--compare old.json]
+"""
+import argparse
+import gc
+import hashlib
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+import clean_census  # noqa: E402
+import synth_census  # noqa: E402
+from build_geojson import ARTIFACT_VERSION, SOURCE_PATH, load_artifact, resolve_conflicts  # noqa: E402
+from census_cube import COUNT_COLUMNS, build_cube, display_population, rollup  # noqa: E402
+from census_index import build_index, select_rows  # noqa: E402
+from census_store import DASHBOARD_COLUMNS, STORE_PATH, load_census, map_census, write_store  # noqa: E402
+from gn_linkage import CENSUS_COLUMNS, attach_ids, feature_table, link  # noqa: E402
+from synth_census import scale_raw  # noqa: E402
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+STAGES = ['load_data', 'load_data_mapped', 'load_geojson_artifact', 'load_geojson_resolve', 'filter_index', 'filter_select',
+          'groupby_cube', 'groupby_breakdown', 'groupby_pandas', 'clean_census']
+
+
+def measure(fn, repeat, memory=False):
+    """
+    Best wall time over `repeat` runs and, with `memory`, the tracemalloc
+    peak of one more run. Arrow buffers are invisible to tracemalloc, so the
+    Arrow memory still held by the stage's result is recorded separately.
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    timing = {'seconds': round(min(times), 6), 'runs': [round(t, 6) for t in times]}
+    if not memory:
+        return dict(timing, peak_mb=None, arrow_mb=None)
+    gc.collect()
+    arrow_before = pa.total_allocated_bytes()
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    arrow = pa.total_allocated_bytes() - arrow_before
+    del result
+    return dict(timing, peak_mb=round(peak / 1e6, 3), arrow_mb=round(arrow / 1e6, 3))
+
+
+def scaled_inputs(base, factor, directory, geojson):
+    """
+    (store, merged GeoJSON) paths for one scale: the real files at 1x,
+    synthetic ones written to `directory` above that.
+    """
+    if factor == 1:
+        return STORE_PATH, SOURCE_PATH
+    df = synth_census.synth_census(base, factor)
+    store = directory / "census.parquet"
+    write_store(df, store)
+    merged = None
+    if geojson:
+        merged = directory / "merged.geojson"
+        synth_census.write_boundaries(df, merged)
+    return store, merged
+
+
+def write_artifact(data, directory):
+    """Artifact + minimal manifest readable by load_artifact(). Returns (artifact, manifest)."""
+    payload = json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    artifact, manifest = directory / "artifact.geojson", directory / "artifact.manifest.json"
+    artifact.write_bytes(payload)
+    manifest.write_text(json.dumps({'version': ARTIFACT_VERSION, 'artifact': {
+        'sha256': hashlib.sha256(payload).hexdigest(), 'bytes': len(payload),
+        'mtime_ns': artifact.stat().st_mtime_ns}}))
+    return artifact, manifest
+
+
+def first_selection(df):
+    """A representative drill-down: the largest province and its two largest districts."""
+    sizes = df.groupby(['Province', 'District'], observed=True).size().sort_values(ascending=False)
+    province = sizes.index[0][0]
+    districts = [d for p, d in sizes.index if p == province][:2]
+    return [province], districts
+
+
+def census_stages(store, directory):
+    """Stage name -> callable for the census data path over a scaled store."""
+    df = load_census(columns=DASHBOARD_COLUMNS, path=store)
+    arrow = directory / "census.arrow"
+    index = build_index(df)
+    cube = build_cube(df)
+    provinces, districts = first_selection(df)
+
+    def filter_select():
+        rows = select_rows(index, provinces, districts, [])
+        filtered = df if rows is None else df.iloc[rows]
+        return display_population(filtered, ['Age_0_14'], 'All')
+
+    def groupby_breakdown():
+        rollup(cube, 'District', provinces, [], [])
+        return rollup(cube, 'DS_Division', provinces, districts, [])
+
+    def groupby_pandas():
+        rows = select_rows(index, provinces, [], [])
+        return df.iloc[rows].groupby('District', observed=True)[COUNT_COLUMNS].sum()
+
+    return {
+        'load_data': lambda: load_census(columns=DASHBOARD_COLUMNS, path=store),
+        'load_data_mapped': lambda: map_census(DASHBOARD_COLUMNS, store, arrow),
+        'filter_index': lambda: build_index(df),
+        'filter_select': filter_select,
+        'groupby_cube': lambda: build_cube(df),
+        'groupby_breakdown': groupby_breakdown,
+        'groupby_pandas': groupby_pandas,
+    }
+
+
+def geojson_stages(store, merged, directory):
+    """Stage name -> callable for both map loading paths over one census store / merged file."""
+    link_census = load_census(columns=CENSUS_COLUMNS, path=store)
+
+    def resolve_path():
+        with open(merged, 'r', encoding='utf-8') as f:
+            data = resolve_conflicts(json.load(f))
+        attach_ids(data, link(link_census, feature_table(data['features'])))
+        return data
+
+    artifact, manifest = write_artifact(resolve_path(), directory)
+    missing_source = directory / "no_source.geojson"
+
+    return {
+        'load_geojson_artifact': lambda: load_artifact(artifact, manifest, missing_source),
+        'load_geojson_resolve': resolve_path,
+    }
+
+
+def clean_stage(df_raw, header_idx, factor):
+    raw = scale_raw(df_raw, header_idx, factor)
+    return {'clean_census': lambda: clean_census.clean_frame(raw)}
+
+
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, old_path):
+    """Print time and memory ratios against an earlier results file."""
+    with open(old_path, 'r', encoding='utf-8') as f:
+        old = json.load(f)
+    print(f"\nCompared with {old_path} (commit {old.get('commit')}):")
+    for scale, stages in results['results'].items():
+        for stage, r in stages.items():
+            prev = old.get('results', {}).get(scale, {}).get(stage)
+            if not prev:
+                continue
+            t_ratio = r['seconds'] / prev['seconds'] if prev['seconds'] else np.nan
+            m_ratio = r['peak_mb'] / prev['peak_mb'] if r['peak_mb'] and prev.get('peak_mb') else np.nan
+            flag = '  <-- slower' if t_ratio > 1.2 else ''
+            print(f"  {scale:>4}x {stage:<24} time x{t_ratio:5.2f}  memory x{m_ratio:5.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard data path and cleaning script.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help="Skip the extra peak-memory run per stage (quicker on large scales)")
+    parser.add_argument('--output', type=Path, help="Results JSON (default: benchmarks/results/<time>_<commit>.json)")
+    parser.add_argument('--compare', type=Path, help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    census = load_census()
+    want_geojson = any(s.startswith('load_geojson') for s in args.stages)
+    df_raw = header_idx = None
+    if 'clean_census' in args.stages:
+        df_raw = pd.read_excel(clean_census.file_path, sheet_name='Population', header=None)
+        header_idx = clean_census.find_header_row(df_raw)
+
+    results = {
+        'commit': commit,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'base_rows': len(census),
+        'repeat': args.repeat,
+        'memory': args.memory,
+        'results': {},
+    }
+    for factor in args.scales:
+        print(f"\nScale {factor}x ({len(census) * factor:,} GN rows)")
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            store, merged = scaled_inputs(census, factor, tmp, want_geojson)
+            stages = census_stages(store, tmp)
+            if want_geojson:
+                stages.update(geojson_stages(store, merged, tmp))
+            if df_raw is not None:
+                stages.update(clean_stage(df_raw, header_idx, factor))
+
+            scale_results = {}
+            for name in args.stages:
+                if name not in stages:
+                    continue
+                r = measure(stages[name], args.repeat, args.memory)
+                scale_results[name] = r
+                line = f"  {name:<24} {r['seconds'] * 1000:10.1f} ms"
+                if args.memory:
+                    line += f"   peak {r['peak_mb']:9.1f} MB   arrow {r['arrow_mb']:7.1f} MB"
+                print(line)
+            results['results'][str(factor)] = scale_results
+            del stages
+            gc.collect()
+
+    output = args.output or RESULTS_DIR / f"{time.strftime('%Y%m%d_%H%M%S')}_{commit or 'nogit'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Offline extent table for map framing.
+For every Province, District and DS Division the bounding box of its GN
+boundaries, its population-weighted centroid (of the GN centroids) and the
+Mapbox zoom that fits the box around that centroid are computed once from
+the validated artifact. The dashboard frames a selection by looking these
+up and merging the few selected rows (box union, population-weighted
+centroid), without touching any geometry at request time.
+
+Usage:
+    python src/build_extents.py
+"""
+import json
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+import geometry
+from build_geojson import MANIFEST_PATH, PROCESSED_DIR, load_artifact
+from census_store import load_census
+
+EXTENTS_PATH = PROCESSED_DIR / "GN_extents.json"
+
+# Bump when the table layout or a derivation changes
+EXTENTS_VERSION = 1
+
+LEVELS = ['Province', 'District', 'DS_Division']
+
+# Mapbox GL zoom levels are defined on 512 px tiles
+MAPBOX_TILE_PX = 512
+
+# Approximate size of the dashboard's map panel
+VIEW_SIZE_PX = (900, 600)
+
+# Zoom levels left as margin around the fitted box, and the allowed range
+ZOOM_PADDING = 0.3
+MIN_ZOOM, MAX_ZOOM = 5.0, 14.0
+
+
+def lonlat_to_tile(lon, lat, z):
+    """Fractional Web Mercator tile coordinates (x, y) at zoom z."""
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.radians(np.clip(np.asarray(lat, dtype=np.float64), -85.0511, 85.0511))
+    n = 2 ** z
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def fit_zoom(center_lat, center_lon, bbox, view_px=VIEW_SIZE_PX):
+    """
+    Largest Mapbox zoom at which a view of `view_px` centered on
+    (lat, lon) contains the [lon_min, lat_min, lon_max, lat_max] box.
+    """
+    cx, cy = lonlat_to_tile(center_lon, center_lat, 0)
+    x0, y1 = lonlat_to_tile(bbox[0], bbox[1], 0)
+    x1, y0 = lonlat_to_tile(bbox[2], bbox[3], 0)
+    # Half extents in world fractions at zoom 0, where the world is one 512 px tile
+    half_w = max(float(cx - x0), float(x1 - cx), 1e-9)
+    half_h = max(float(cy - y0), float(y1 - cy), 1e-9)
+    zoom = min(math.log2(view_px[0] / 2 / (MAPBOX_TILE_PX * half_w)),
+               math.log2(view_px[1] / 2 / (MAPBOX_TILE_PX * half_h))) - ZOOM_PADDING
+    return round(min(max(zoom, MIN_ZOOM), MAX_ZOOM), 2)
+
+
+def _extent(rows):
+    """Merged extent of extent rows: box union and population-weighted centroid."""
+    population = sum(r['population'] for r in rows)
+    if population > 0:
+        lat = sum(r['population'] * r['center'][0] for r in rows) / population
+        lon = sum(r['population'] * r['center'][1] for r in rows) / population
+    else:
+        lat = sum(r['center'][0] for r in rows) / len(rows)
+        lon = sum(r['center'][1] for r in rows) / len(rows)
+    bbox = [min(r['bbox'][0] for r in rows), min(r['bbox'][1] for r in rows),
+            max(r['bbox'][2] for r in rows), max(r['bbox'][3] for r in rows)]
+    return {'population': int(population), 'center': [round(lat, 6), round(lon, 6)],
+            'bbox': [round(v, 6) for v in bbox], 'zoom': fit_zoom(lat, lon, bbox)}
+
+
+def build(path=EXTENTS_PATH):
+    """Compute every level's extents from the artifact and write the table."""
+    data = load_artifact(verify=True)
+    if data is None:
+        raise FileNotFoundError("Validated GeoJSON artifact missing or stale; run build_geojson.py first")
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+        artifact_sha = json.load(f)['artifact']['sha256']
+
+    features = data['features']
+    flat = geometry.flatten_features(features)
+    feature_frame = pd.DataFrame(geometry.bounding_boxes(flat), columns=['lon_min', 'lat_min', 'lon_max', 'lat_max'])
+    feature_frame[['lat', 'lon']] = geometry.centroids(flat)
+    feature_frame['GN_UID'] = [f.get('id') for f in features]
+    feature_frame = feature_frame.dropna()
+
+    census = load_census(columns=LEVELS + ['GN_UID', 'Total_Population'])
+    for col in LEVELS:
+        census[col] = census[col].astype(str)
+    gn = census.merge(feature_frame, on='GN_UID', how='inner')
+    gn['w'] = gn['Total_Population'].clip(lower=0)
+    gn['w_lat'] = gn['w'] * gn['lat']
+    gn['w_lon'] = gn['w'] * gn['lon']
+
+    table = {'version': EXTENTS_VERSION, 'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+             'artifact_sha256': artifact_sha, 'levels': {}}
+    for level in LEVELS:
+        agg = gn.groupby(level, sort=True).agg(
+            population=('w', 'sum'), w_lat=('w_lat', 'sum'), w_lon=('w_lon', 'sum'),
+            mean_lat=('lat', 'mean'), mean_lon=('lon', 'mean'), gn_count=('GN_UID', 'size'),
+            lon_min=('lon_min', 'min'), lat_min=('lat_min', 'min'),
+            lon_max=('lon_max', 'max'), lat_max=('lat_max', 'max'))
+        weighted = agg['population'] > 0
+        lat = np.where(weighted, agg['w_lat'] / agg['population'].where(weighted, 1), agg['mean_lat'])
+        lon = np.where(weighted, agg['w_lon'] / agg['population'].where(weighted, 1), agg['mean_lon'])
+
+        entries = {}
+        for (name, row), c_lat, c_lon in zip(agg.iterrows(), lat, lon):
+            bbox = [round(float(row[c]), 6) for c in ('lon_min', 'lat_min', 'lon_max', 'lat_max')]
+            entries[name] = {'population': int(row['population']), 'gn_count': int(row['gn_count']),
+                             'center': [round(float(c_lat), 6), round(float(c_lon), 6)], 'bbox': bbox,
+                             'zoom': fit_zoom(c_lat, c_lon, bbox)}
+        table['levels'][level] = entries
+        print(f"  {level:<12} {len(entries):>4} extents")
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(table, f, indent=1, ensure_ascii=False)
+    return table
+
+
+def load_extents(path=EXTENTS_PATH):
+    """Extent table, or None when it is missing or older than the artifact."""
+    if not path.exists() or not MANIFEST_PATH.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        table = json.load(f)
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+        artifact_sha = json.load(f)['artifact']['sha256']
+    if table.get('version') != EXTENTS_VERSION or table.get('artifact_sha256') != artifact_sha:
+        return None
+    return table
+
+
+def selection_extent(table, provinces=(), districts=(), ds_divisions=()):
+    """
+    Extent (center [lat, lon], bbox, zoom) of a selection, from its finest
+    selected level: one lookup per selected name. None without a selection
+    or when none of the names has boundaries.
+    """
+    for level, names in zip(reversed(LEVELS), [ds_divisions, districts, provinces]):
+        if names:
+            entries = table['levels'][level]
+            rows = [entries[n] for n in names if n in entries]
+            if not rows:
+                return None
+            return rows[0] if len(rows) == 1 else _extent(rows)
+    return None
+
+
+def country_extent(table):
+    """Extent of the whole country: the merged Province rows."""
+    return _extent(list(table['levels']['Province'].values()))
+
+
+def main():
+    print(f"Building extent table {EXTENTS_PATH}...")
+    build()
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Offline build step for the dashboard map boundaries.
+Resolves the spatial conflicts in GN_census_merged.geojson once and writes a
+validated artifact (District_GN_Key already attached) with a content-hash
+manifest, so the dashboard can load it directly instead of re-resolving
+the raw file on every cold start.
+"""
+import hashlib
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+import geometry
+import gn_linkage
+
+PROCESSED_DIR = Path(__file__).parent.parent / "data" / "processed"
+SOURCE_PATH = PROCESSED_DIR / "GN_census_merged.geojson"
+ARTIFACT_PATH = PROCESSED_DIR / "GN_census_validated.geojson"
+MANIFEST_PATH = PROCESSED_DIR / "GN_census_validated.manifest.json"
+
+# Bump when the resolution logic or artifact layout changes
+ARTIFACT_VERSION = 3
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Return the hex SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _factorize(values):
+    """Integer codes for a list of hashable values, plus the unique values."""
+    codes = {}
+    idx = np.fromiter((codes.setdefault(v, len(codes)) for v in values), dtype=np.int64, count=len(values))
+    return idx, list(codes)
+
+
+def resolve_conflicts(data):
+    """Drop "lying" records and attach District_GN_Key to the remaining features."""
+    # --- Spatial Conflict Resolution ---
+    # The GeoJSON contains "lying" records: identical geometries (ShapeID & coords) duplicated
+    # across districts. e.g. Mallikaithivu exists as "Trincomalee" but uses "Mullaitivu"
+    # geometry. We must filter these out based on physical proximity to the district center.
+    features = data['features']
+    n = len(features)
+    if not n:
+        return data
+
+    sids = [f['properties'].get('shapeID') or '' for f in features]
+    dists = [str(f['properties'].get('District_Name', '')).upper().strip() for f in features]
+
+    # 1. Area-weighted centroid of every feature in one batched pass
+    cents = geometry.centroids(geometry.flatten_features(features))
+    has_cent = ~np.isnan(cents[:, 0])
+
+    # 2. Which districts claim each ShapeID (membership matrix: shape x district)
+    sid_idx, _ = _factorize(sids)
+    dist_idx, dist_names = _factorize(dists)
+    claims = np.fromiter((bool(s) and d not in ('', 'NONE') for s, d in zip(sids, dists)), dtype=bool, count=n)
+
+    membership = np.zeros((sid_idx.max() + 1, len(dist_names)), dtype=bool)
+    membership[sid_idx[claims], dist_idx[claims]] = True
+    n_claimants = membership.sum(axis=1)[sid_idx]
+
+    # 3. District Centers: mean centroid of uncontested shapes
+    reliable = claims & (n_claimants == 1) & has_cent
+    counts = np.bincount(dist_idx[reliable], minlength=len(dist_names))
+    center_lat = np.bincount(dist_idx[reliable], weights=cents[reliable, 0], minlength=len(dist_names))
+    center_lon = np.bincount(dist_idx[reliable], weights=cents[reliable, 1], minlength=len(dist_names))
+    has_center = counts > 0
+    centers = np.zeros((len(dist_names), 2))
+    centers[has_center, 0] = center_lat[has_center] / counts[has_center]
+    centers[has_center, 1] = center_lon[has_center] / counts[has_center]
+
+    # 4. Filter "Lying" Records
+    # A contested feature is a lie if its centroid is closer to a competing
+    # claimant's center than to the center of the district it claims.
+    contested = claims & (n_claimants > 1) & has_cent & has_center[dist_idx]
+    is_valid = np.ones(n, dtype=bool)
+    if contested.any():
+        rows = np.flatnonzero(contested)
+        d2 = geometry.squared_distances(cents[rows], centers)
+        my_dist = d2[np.arange(len(rows)), dist_idx[rows]]
+        competitor = membership[sid_idx[rows]] & has_center
+        competitor[np.arange(len(rows)), dist_idx[rows]] = False
+        best_competitor = np.where(competitor, d2, np.inf).min(axis=1)
+        is_valid[rows] = ~(best_competitor < my_dist)
+
+    validated_features = []
+    for i in np.flatnonzero(is_valid):
+        feature = features[i]
+        props = feature['properties']
+        gn_name = str(props.get('shapeName', '')).upper().strip()
+        # Generate the key only for valid features
+        props['District_GN_Key'] = dists[i] + '|' + gn_name
+        validated_features.append(feature)
+
+    # Update data with filtered features
+    data['features'] = validated_features
+
+    return data
+
+
+def validate_artifact(data):
+    """Sanity-check a resolved FeatureCollection. Returns a list of problems."""
+    problems = []
+    keys = set()
+    duplicate_keys = 0
+    for feature in data['features']:
+        key = feature['properties'].get('District_GN_Key')
+        if not key:
+            problems.append(f"Feature without District_GN_Key: {feature['properties'].get('shapeID')}")
+            continue
+        if key in keys:
+            duplicate_keys += 1
+        keys.add(key)
+        geom = feature.get('geometry')
+        if not geom or not geom.get('coordinates'):
+            problems.append(f"Feature without geometry: {key}")
+    if duplicate_keys:
+        # Not fatal: plotly simply matches the first feature for a repeated key
+        print(f"Warning: {duplicate_keys} features share a District_GN_Key with another feature.")
+    return problems
+
+
+def build(source_path=SOURCE_PATH, artifact_path=ARTIFACT_PATH, manifest_path=MANIFEST_PATH):
+    """Resolve the merged GeoJSON and write the validated artifact + manifest."""
+    source_path = Path(source_path)
+    print(f"Loading {source_path}...")
+    with open(source_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    source_features = len(data['features'])
+
+    print("Resolving spatial conflicts...")
+    data = resolve_conflicts(data)
+
+    # Integer join: each linked feature's id is its census GN_UID
+    print("Linking features to census GN divisions...")
+    crosswalk = gn_linkage.build(data)
+    linked = int((crosswalk['feature_index'] >= 0).sum())
+
+    problems = validate_artifact(data)
+    if problems:
+        for p in problems[:10]:
+            print(f"  ✗ {p}")
+        raise ValueError(f"Validated artifact failed {len(problems)} checks")
+
+    # Compact encoding: no whitespace, UTF-8 names kept as-is
+    payload = json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    Path(artifact_path).write_bytes(payload)
+    artifact_mtime = Path(artifact_path).stat().st_mtime_ns
+
+    stat = source_path.stat()
+    manifest = {
+        'version': ARTIFACT_VERSION,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'source': {
+            'path': source_path.name,
+            'sha256': file_sha256(source_path),
+            'bytes': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'features': source_features,
+        },
+        'artifact': {
+            'path': Path(artifact_path).name,
+            'sha256': hashlib.sha256(payload).hexdigest(),
+            'bytes': len(payload),
+            'mtime_ns': artifact_mtime,
+            'features': len(data['features']),
+        },
+    }
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"Kept {len(data['features'])} of {source_features} features "
+          f"({source_features - len(data['features'])} conflicting records dropped)")
+    print(f"Linked {linked:,} of {len(crosswalk):,} census GN divisions ({gn_linkage.CROSSWALK_PATH.name})")
+    print(f"Artifact saved to {artifact_path} ({len(payload) / 1e6:.1f} MB)")
+    return manifest
+
+
+def load_artifact(artifact_path=ARTIFACT_PATH, manifest_path=MANIFEST_PATH,
+                  source_path=SOURCE_PATH, verify=False):
+    """
+    Load the validated artifact. Returns None if it is missing, stale
+    (source file changed since the build) or modified since the build: its
+    size/mtime are compared with the manifest, and only with `verify` (the
+    offline builders) is its content hash recomputed.
+    """
+    artifact_path, manifest_path, source_path = Path(artifact_path), Path(manifest_path), Path(source_path)
+    if not artifact_path.exists() or not manifest_path.exists():
+        return None
+
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('version') != ARTIFACT_VERSION:
+        return None
+
+    # Cheap staleness check: compare the source file's size/mtime, not its hash
+    if source_path.exists():
+        stat = source_path.stat()
+        src = manifest['source']
+        if stat.st_size != src['bytes'] or stat.st_mtime_ns != src['mtime_ns']:
+            return None
+
+    artifact = manifest['artifact']
+    stat = artifact_path.stat()
+    if (stat.st_size != artifact.get('bytes', stat.st_size)
+            or stat.st_mtime_ns != artifact.get('mtime_ns', stat.st_mtime_ns)):
+        return None
+    # Manifests without the artifact's mtime can only be checked by hash
+    verify = verify or 'mtime_ns' not in artifact
+
+    payload = artifact_path.read_bytes()
+    if verify and hashlib.sha256(payload).hexdigest() != artifact['sha256']:
+        return None
+    return json.loads(payload)
+
+
+def main():
+    if not SOURCE_PATH.exists():
+        print(f"Error: {SOURCE_PATH} not found.")
+        return
+    build()
+
+
+if __name__ == "__main__":
+    main()
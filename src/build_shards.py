@@ -0,0 +1,151 @@
+"""
+Offline per-Province and per-District partitions of the map boundaries.
+A drill-down map only needs the GN divisions of the selected area, so the
+validated, census-linked features are written once per Province and per
+District at every distinct simplification level (simplify.py), with
+coordinates rounded to the level's precision. The dashboard then loads just the
+shards covering the current filter instead of the national file. A
+manifest lists each shard's path, feature count and size and is tied to
+the artifact hash like the tile and simplification indexes.
+
+Usage:
+    python src/build_shards.py
+"""
+import json
+import re
+import shutil
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+import geometry
+import simplify
+from build_geojson import MANIFEST_PATH, PROCESSED_DIR, load_artifact
+from census_store import load_census
+
+SHARDS_DIR = PROCESSED_DIR / "shards"
+SHARD_MANIFEST_PATH = SHARDS_DIR / "manifest.json"
+
+# Bump when the shard layout changes
+SHARDS_VERSION = 2
+
+KINDS = {'Province': 'provinces', 'District': 'districts'}
+
+
+def shard_name(name):
+    """File-system safe shard file name for a Province or District."""
+    return re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_')
+
+
+def feature_hierarchy(features):
+    """Province and District of each census-linked feature (None where unlinked)."""
+    census = load_census(columns=['Province', 'District', 'GN_UID'])
+    lookup = dict(zip(census['GN_UID'].tolist(),
+                      zip(census['Province'].astype(str), census['District'].astype(str))))
+    return [lookup.get(f.get('id')) for f in features]
+
+
+def build(shards_dir=SHARDS_DIR):
+    """Write every level's Province and District shards plus the manifest."""
+    data = load_artifact(verify=True)
+    if data is None:
+        raise FileNotFoundError("Validated GeoJSON artifact missing or stale; run build_geojson.py first")
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+        artifact_sha = json.load(f)['artifact']['sha256']
+
+    features = data['features']
+    flat = geometry.flatten_features(features)
+    # Levels identical to the next finer one share its shards
+    masks, aliases = simplify.collapse_levels(simplify.simplify(flat))
+    hierarchy = feature_hierarchy(features)
+
+    members = {'Province': defaultdict(list), 'District': defaultdict(list)}
+    for i, names in enumerate(hierarchy):
+        if names is not None:
+            members['Province'][names[0]].append(i)
+            members['District'][names[1]].append(i)
+
+    shards_dir = Path(shards_dir)
+    if shards_dir.exists():
+        shutil.rmtree(shards_dir)
+
+    manifest = {'version': SHARDS_VERSION, 'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'artifact_sha256': artifact_sha, 'levels': {}, 'aliases': aliases}
+    for level, keep in masks.items():
+        coords, unique = geometry.quantize(flat, simplify.DECIMALS[level])
+        geoms = geometry.to_geometries(flat, coords, keep & unique)
+        # Serialize each feature once; shards are joined from the encoded pieces
+        encoded = {}
+        for i, names in enumerate(hierarchy):
+            if names is not None and geoms[i] is not None:
+                feature = {'type': 'Feature', 'id': features[i]['id'],
+                           'properties': {'shapeID': features[i]['properties'].get('shapeID', '')},
+                           'geometry': geoms[i]}
+                encoded[i] = json.dumps(feature, separators=(',', ':'), ensure_ascii=False)
+
+        entry = {}
+        for kind, groups in members.items():
+            entry[KINDS[kind]] = {}
+            for name, idx in sorted(groups.items()):
+                parts = [encoded[i] for i in idx if i in encoded]
+                payload = ('{"type":"FeatureCollection","features":[' + ','.join(parts) + ']}').encode('utf-8')
+                path = shards_dir / level / KINDS[kind] / f"{shard_name(name)}.geojson"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(payload)
+                entry[KINDS[kind]][name] = {'path': path.relative_to(shards_dir).as_posix(),
+                                            'features': len(parts), 'bytes': len(payload)}
+        manifest['levels'][level] = entry
+        sizes = np.array([s['bytes'] for s in entry['districts'].values()])
+        print(f"  {level:<7} {len(entry['provinces'])} province / {len(entry['districts'])} district shards, "
+              f"district median {np.median(sizes) / 1e3:.0f} KB, max {sizes.max() / 1e3:.0f} KB")
+
+    with open(shards_dir / SHARD_MANIFEST_PATH.name, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_manifest(shards_dir=SHARDS_DIR):
+    """Shard manifest, or None when shards are missing or older than the artifact."""
+    path = Path(shards_dir) / SHARD_MANIFEST_PATH.name
+    if not path.exists() or not MANIFEST_PATH.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+        artifact_sha = json.load(f)['artifact']['sha256']
+    if manifest.get('version') != SHARDS_VERSION or manifest.get('artifact_sha256') != artifact_sha:
+        return None
+    return manifest
+
+
+def covering_shards(manifest, level, provinces=(), districts=()):
+    """
+    (kind, name) of the shards covering a selection at `level`: the selected
+    districts, else the selected provinces. None when nothing is selected
+    (the national level file is smaller than every shard together) or the
+    level is not in the manifest.
+    """
+    entry = manifest['levels'].get(simplify.resolve_level(manifest, level))
+    if entry is None or not (provinces or districts):
+        return None
+    kind, names = ('districts', districts) if districts else ('provinces', provinces)
+    return [(kind, name) for name in sorted(set(names)) if name in entry[kind]]
+
+
+def load_shard(manifest, level, kind, name, shards_dir=SHARDS_DIR):
+    """One shard's FeatureCollection."""
+    entry = manifest['levels'][simplify.resolve_level(manifest, level)]
+    with open(Path(shards_dir) / entry[kind][name]['path'], 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    print(f"Building Province/District boundary shards in {SHARDS_DIR}...")
+    manifest = build()
+    print(f"Done ({len(manifest['levels'])} levels).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Offline zoom-aware tile pyramid for the dashboard map.
+The validated boundaries are cut into the standard slippy-map z/x/y grid at
+a few zoom levels, each with the matching topology-preserving simplification
+level (simplify.py) and coordinate precision, so the map only loads the
+tiles covering the current view instead of the full national GeoJSON. The
+dashboard frames every map view from the extent table (build_extents.py),
+so the tiles in view cover the whole selection; the unfiltered national
+map is served from them.
+
+Plotly's choropleth_mapbox joins data to GeoJSON features, not to binary
+vector tiles, so each tile is a small GeoJSON FeatureCollection of the
+census-linked features, carrying the integer GN_UID as the feature `id`
+(the map's join key) and the shapeID. A feature is written to every tile
+its bounding box touches; loaders de-duplicate on the id.
+
+Usage:
+    python src/build_tiles.py
+"""
+import json
+import math
+import shutil
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+import geometry
+import simplify
+from build_extents import MAPBOX_TILE_PX, VIEW_SIZE_PX, lonlat_to_tile
+from build_geojson import MANIFEST_PATH, PROCESSED_DIR, load_artifact
+
+TILES_DIR = PROCESSED_DIR / "tiles"
+INDEX_PATH = TILES_DIR / "index.json"
+
+# Bump when the tile layout changes
+TILES_VERSION = 4
+
+# Tile zoom -> simplification level
+TILE_ZOOMS = {6: 'coarse', 8: 'medium', 10: 'fine'}
+
+
+def _feature_tiles(bbox, z):
+    """Inclusive tile ranges (x0, x1, y0, y1) covered by each bounding box."""
+    x0, y1 = lonlat_to_tile(bbox[:, 0], bbox[:, 1], z)
+    x1, y0 = lonlat_to_tile(bbox[:, 2], bbox[:, 3], z)
+    return [np.floor(v).astype(np.int64) for v in (x0, x1, y0, y1)]
+
+
+def build(tiles_dir=TILES_DIR):
+    """Cut the validated artifact into per-zoom GeoJSON tiles plus an index."""
+    data = load_artifact(verify=True)
+    if data is None:
+        raise FileNotFoundError("Validated GeoJSON artifact missing or stale; run build_geojson.py first")
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+        artifact_sha = json.load(f)['artifact']['sha256']
+
+    features = data['features']
+    flat = geometry.flatten_features(features)
+    bbox = geometry.bounding_boxes(flat)
+    # Features without a census link cannot be colored, so they are left out
+    linked = np.fromiter(('id' in f for f in features), dtype=bool, count=len(features))
+    has_geom = np.flatnonzero(~np.isnan(bbox[:, 0]) & linked)
+    levels = simplify.simplify(flat)
+
+    tiles_dir = Path(tiles_dir)
+    if tiles_dir.exists():
+        shutil.rmtree(tiles_dir)
+
+    index = {'version': TILES_VERSION, 'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+             'artifact_sha256': artifact_sha, 'zooms': {}}
+    for z, level in TILE_ZOOMS.items():
+        decimals = simplify.DECIMALS[level]
+        coords, keep = geometry.quantize(flat, decimals)
+        keep &= levels[level]
+        geoms = geometry.to_geometries(flat, coords, keep)
+        # Serialize each feature once; tiles are joined from the encoded pieces
+        encoded = {}
+        for i in has_geom:
+            feature = {'type': 'Feature', 'id': features[i]['id'],
+                       'properties': {'shapeID': features[i]['properties'].get('shapeID', '')},
+                       'geometry': geoms[i]}
+            encoded[i] = json.dumps(feature, separators=(',', ':'), ensure_ascii=False)
+
+        x0, x1, y0, y1 = _feature_tiles(bbox, z)
+        members = defaultdict(list)
+        for i in has_geom:
+            for x in range(x0[i], x1[i] + 1):
+                for y in range(y0[i], y1[i] + 1):
+                    members[(x, y)].append(i)
+
+        total = 0
+        for (x, y), idx in members.items():
+            payload = ('{"type":"FeatureCollection","features":['
+                       + ','.join(encoded[i] for i in idx) + ']}').encode('utf-8')
+            path = tiles_dir / str(z) / str(x) / f"{y}.json"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(payload)
+            total += len(payload)
+
+        index['zooms'][str(z)] = {'level': level, 'decimals': decimals, 'tiles': sorted(f"{x}/{y}" for x, y in members),
+                                  'bytes': total}
+        print(f"  z{z}: {len(members)} tiles, {total / 1e6:.1f} MB")
+
+    with open(tiles_dir / INDEX_PATH.name, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2)
+    return index
+
+
+def load_index(tiles_dir=TILES_DIR):
+    """Tile index, or None when tiles are missing or older than the artifact."""
+    path = Path(tiles_dir) / INDEX_PATH.name
+    if not path.exists() or not MANIFEST_PATH.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+        artifact_sha = json.load(f)['artifact']['sha256']
+    if index.get('version') != TILES_VERSION or index.get('artifact_sha256') != artifact_sha:
+        return None
+    return index
+
+
+def tile_zoom(index, zoom):
+    """Finest tile zoom not above the map zoom (coarsest when zoomed further out)."""
+    zooms = sorted(int(z) for z in index['zooms'])
+    return max([z for z in zooms if z <= zoom], default=zooms[0])
+
+
+def tiles_in_view(center_lat, center_lon, zoom, z, view_px=VIEW_SIZE_PX):
+    """(x, y) tiles at tile zoom z covering a view centered at (lat, lon)."""
+    cx, cy = lonlat_to_tile(center_lon, center_lat, z)
+    # Half the view, converted from screen pixels at the map zoom to z-tiles
+    scale = 2.0 ** (z - zoom) / MAPBOX_TILE_PX
+    dx, dy = view_px[0] / 2 * scale, view_px[1] / 2 * scale
+    xs = range(int(math.floor(cx - dx)), int(math.floor(cx + dx)) + 1)
+    ys = range(int(math.floor(cy - dy)), int(math.floor(cy + dy)) + 1)
+    return [(x, y) for x in xs for y in ys]
+
+
+def load_view(center_lat, center_lon, zoom, index=None, tiles_dir=TILES_DIR):
+    """Merged FeatureCollection of the tiles in view (None without tiles)."""
+    index = index or load_index(tiles_dir)
+    if index is None:
+        return None
+    z = tile_zoom(index, zoom)
+    available = set(index['zooms'][str(z)]['tiles'])
+
+    seen = set()
+    features = []
+    for x, y in tiles_in_view(center_lat, center_lon, zoom, z):
+        if f"{x}/{y}" not in available:
+            continue
+        with open(Path(tiles_dir) / str(z) / str(x) / f"{y}.json", 'r', encoding='utf-8') as f:
+            tile = json.load(f)
+        for feature in tile['features']:
+            if feature['id'] not in seen:
+                seen.add(feature['id'])
+                features.append(feature)
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def main():
+    print(f"Building map tiles in {TILES_DIR}...")
+    index = build()
+    print(f"Done ({len(index['zooms'])} zoom levels).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Pre-aggregated hierarchy cube for the dashboard.
+Sums of every count column are computed once per Province, District and
+DS Division, so rollups and KPI cards are answered from a few hundred cube
+rows instead of scanning every GN row on each rerun. Ratios are computed
+from the sums (ratio of sums), not averaged across GN divisions.
+"""
+import pandas as pd
+
+from census_store import COUNT_COLUMNS
+
+LEVELS = ['Province', 'District', 'DS_Division']
+SUM_COLUMNS = COUNT_COLUMNS + ['GN_Count']
+
+
+def add_ratio_columns(frame):
+    """Ratio-of-sums versions of the store's derived metrics."""
+    frame['Sex_Ratio'] = (frame['Female'] / frame['Male'].replace(0, 1) * 100).round(1)
+    frame['Youth_Pct'] = (frame['Age_0_14'] / frame['Total_Population'].replace(0, 1) * 100).round(1)
+    frame['Working_Age_Pct'] = (frame['Age_15_59'] / frame['Total_Population'].replace(0, 1) * 100).round(1)
+    frame['Elderly_Pct'] = ((frame['Age_60_64'] + frame['Age_65_Plus']) / frame['Total_Population'].replace(0, 1) * 100).round(1)
+    frame['Dependency_Ratio'] = ((frame['Age_0_14'] + frame['Age_60_64'] + frame['Age_65_Plus']) / frame['Age_15_59'].replace(0, 1) * 100).round(1)
+    return frame
+
+
+def build_cube(df):
+    """
+    Aggregate GN-level rows into one table per hierarchy level.
+    Each level's table keeps its parent columns (a District row knows its
+    Province) so it can be filtered by any coarser selection directly.
+    """
+    counts = df[LEVELS + COUNT_COLUMNS].copy()
+    for col in LEVELS:
+        counts[col] = counts[col].astype(str)
+    counts['GN_Count'] = 1
+
+    cube = {}
+    for depth, level in enumerate(LEVELS):
+        keys = LEVELS[:depth + 1]
+        table = counts.groupby(keys, sort=True)[SUM_COLUMNS].sum().reset_index()
+        cube[level] = add_ratio_columns(table)
+    cube['All'] = add_ratio_columns(counts[SUM_COLUMNS].sum().to_frame().T)
+    return cube
+
+
+def _filters(provinces, districts, ds_divisions):
+    """Active (level, values) filters, coarsest first."""
+    selected = zip(LEVELS, [provinces, districts, ds_divisions])
+    return [(level, list(values)) for level, values in selected if values]
+
+
+def rollup(cube, level, provinces=(), districts=(), ds_divisions=()):
+    """Sums and ratios per `level` for the rows matching the sidebar filters."""
+    filters = _filters(provinces, districts, ds_divisions)
+    finest = max((LEVELS.index(f) for f, _ in filters), default=-1)
+
+    # Filters no finer than `level` can be applied to its own table;
+    # a finer filter needs the matching DS rows re-grouped (still tiny).
+    source = cube[level] if finest <= LEVELS.index(level) else cube[LEVELS[finest]]
+    mask = pd.Series(True, index=source.index)
+    for col, values in filters:
+        mask &= source[col].isin(values)
+    rows = source[mask]
+
+    if source is cube[level]:
+        return rows.reset_index(drop=True)
+    keys = LEVELS[:LEVELS.index(level) + 1]
+    grouped = rows.groupby(keys, sort=True)[SUM_COLUMNS].sum().reset_index()
+    return add_ratio_columns(grouped)
+
+
+def totals(cube, provinces=(), districts=(), ds_divisions=()):
+    """Overall sums and ratios for the current filters (KPI cards)."""
+    filters = _filters(provinces, districts, ds_divisions)
+    if not filters:
+        return cube['All'].iloc[0]
+    finest = LEVELS[max(LEVELS.index(f) for f, _ in filters)]
+    rows = rollup(cube, finest, provinces, districts, ds_divisions)
+    return add_ratio_columns(rows[SUM_COLUMNS].sum().to_frame().T).iloc[0]
+
+
+def display_population(frame, age_cols=None, gender="All"):
+    """
+    Population shown for the current age/gender focus, for GN rows, cube
+    rows or a totals Series. The dataset has no gender x age breakdown, so
+    the gender focus only applies when no age group is selected.
+    """
+    if age_cols:
+        subset = frame[age_cols]
+        return subset.sum(axis=1) if isinstance(frame, pd.DataFrame) else subset.sum()
+    if gender in ("Male", "Female"):
+        return frame[gender]
+    return frame['Total_Population']
@@ -0,0 +1,80 @@
+"""
+Hierarchical row index for the census frame.
+Row positions are precomputed per Province, District and DS Division, so
+sidebar filters become integer-array intersections instead of boolean masks
+over a copied frame, and option lists come from a prebuilt parent -> child
+map instead of sorted(df[...].unique()) on every rerun.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+LEVELS = ['Province', 'District', 'DS_Division']
+
+
+@dataclass
+class HierarchyIndex:
+    """Sorted row positions per hierarchy value plus the parent -> child names."""
+    n_rows: int
+    positions: dict             # level -> {name: sorted int64 row positions}
+    provinces: list             # sorted province names
+    districts_by_province: dict  # province -> sorted district names
+    ds_by_district: dict        # district -> sorted DS Division names
+
+
+def _frozen(rows):
+    # The index is shared by every dashboard session, so its arrays are read-only
+    rows = np.asarray(rows, dtype=np.int64)
+    rows.flags.writeable = False
+    return rows
+
+
+def _children(df, parent, child):
+    pairs = df[[parent, child]].astype(str).drop_duplicates()
+    return {name: sorted(group[child]) for name, group in pairs.groupby(parent)}
+
+
+def build_index(df):
+    """Index a census frame with Province / District / DS_Division columns."""
+    positions = {}
+    for level in LEVELS:
+        groups = df.groupby(df[level].astype(str), sort=True).indices
+        positions[level] = {name: _frozen(rows) for name, rows in groups.items()}
+
+    return HierarchyIndex(
+        n_rows=len(df),
+        positions=positions,
+        provinces=sorted(positions['Province']),
+        districts_by_province=_children(df, 'Province', 'District'),
+        ds_by_district=_children(df, 'District', 'DS_Division'),
+    )
+
+
+def district_options(index, provinces=()):
+    """Districts to offer for the selected provinces (all when none selected)."""
+    names = provinces or index.provinces
+    return sorted(d for p in names for d in index.districts_by_province.get(p, []))
+
+
+def ds_options(index, provinces=(), districts=()):
+    """DS Divisions under the selected districts, else under the selected provinces."""
+    if not districts:
+        districts = district_options(index, provinces) if provinces else []
+    return sorted(ds for d in districts for ds in index.ds_by_district.get(d, []))
+
+
+def select_rows(index, provinces=(), districts=(), ds_divisions=()):
+    """
+    Sorted row positions matching every active filter, or None when no filter
+    is active (callers then use the frame as-is, without a copy).
+    """
+    rows = None
+    for level, values in zip(LEVELS, [provinces, districts, ds_divisions]):
+        if not values:
+            continue
+        lookup = index.positions[level]
+        parts = [lookup[v] for v in values if v in lookup]
+        # Groups of one level are disjoint, so the union is just a sorted concat
+        matched = np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+        rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+    return rows
@@ -0,0 +1,241 @@
+"""
+Columnar census data store.
+One typed, categorical-encoded Parquet file holding the cleaned GN-level
+counts plus the derived ratios, so consumers read only the columns they
+need instead of re-parsing and re-deriving the cleaned CSV on every load.
+
+The dashboard reads an uncompressed Arrow IPC copy of the store instead
+(map_census): it is memory-mapped, so numeric and string columns are views
+of the page cache shared by every session and every process on the host,
+and read-only.
+"""
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+PROCESSED_DIR = Path(__file__).parent.parent / "data" / "processed"
+STORE_PATH = PROCESSED_DIR / "GN_population.parquet"
+CLEANED_CSV_PATH = PROCESSED_DIR / "GN_population_cleaned.csv"
+ARROW_PATH = PROCESSED_DIR / "GN_population.arrow"
+
+# Bump when columns are added/renamed or a derivation changes
+SCHEMA_VERSION = 2
+
+# Both the raw Excel headers (cleaned CSV) and clean_census.py's own names
+# map onto the names the dashboard uses.
+RENAME_MAP = {
+    'Province_Name': 'Province',
+    'District_Name': 'District',
+    'DS_Division_Code': 'DS_Code',
+    'DS_Division_Name': 'DS_Division',
+    'DS_Name': 'DS_Division',
+    'GN_Division_Code': 'GN_Code',
+    'GN_Division_Name': 'GN_Division',
+    'GN_Name': 'GN_Division',
+    'GN_Division_Number': 'GN_Number',
+    'Sex_Total': 'Total_Population',
+    'Sex_Male': 'Male',
+    'Sex_Female': 'Female',
+    'Age_0_to_14': 'Age_0_14',
+    'Age_15_to_59': 'Age_15_59',
+    'Age_60_to_64': 'Age_60_64',
+    'Age_65_and_above': 'Age_65_Plus',
+}
+
+CODE_COLUMNS = ['Province_Code', 'District_Code', 'DS_Code', 'GN_Code']
+CATEGORY_COLUMNS = ['Province', 'District', 'DS_Division']
+COUNT_COLUMNS = ['Total_Population', 'Male', 'Female', 'Age_0_14', 'Age_15_59', 'Age_60_64', 'Age_65_Plus']
+RATIO_COLUMNS = ['Sex_Ratio', 'Youth_Pct', 'Working_Age_Pct', 'Elderly_Pct', 'Dependency_Ratio']
+
+STORE_COLUMNS = (
+    ['Province_Code', 'Province', 'District_Code', 'District', 'DS_Code', 'DS_Division',
+     'GN_Code', 'GN_UID', 'GN_Division', 'GN_Number']
+    + COUNT_COLUMNS + RATIO_COLUMNS + ['GN_Link_Key']
+)
+
+# Columns the dashboard actually reads from the store
+DASHBOARD_COLUMNS = [
+    'Province', 'District', 'DS_Division', 'GN_Division',
+    'Total_Population', 'Male', 'Female', 'Age_0_14', 'Age_15_59', 'Age_60_64', 'Age_65_Plus',
+    'Sex_Ratio', 'Youth_Pct', 'Working_Age_Pct', 'Elderly_Pct', 'Dependency_Ratio', 'GN_UID',
+]
+
+
+def normalize_columns(df):
+    """Flatten multi-line headers and rename to the store's column names."""
+    df = df.copy()
+    df.columns = df.columns.str.replace('\n', '_').str.replace('\r', '').str.strip()
+    return df.rename(columns=RENAME_MAP)
+
+
+def make_gn_uid(district_code, ds_code, gn_code):
+    """
+    Integer GN identifier, unique across the country (GN codes repeat
+    between DS Divisions): DDSSGGG = district, DS, GN code.
+    """
+    return (district_code.astype('int32') * 100000 + ds_code.astype('int32') * 1000
+            + gn_code.astype('int32'))
+
+
+def add_derived_columns(df):
+    """Add the ratio columns and the District|GN join key."""
+    df['Sex_Ratio'] = (df['Female'] / df['Male'].replace(0, 1) * 100).round(1)
+    df['Youth_Pct'] = (df['Age_0_14'] / df['Total_Population'].replace(0, 1) * 100).round(1)
+    df['Working_Age_Pct'] = (df['Age_15_59'] / df['Total_Population'].replace(0, 1) * 100).round(1)
+    df['Elderly_Pct'] = ((df['Age_60_64'] + df['Age_65_Plus']) / df['Total_Population'].replace(0, 1) * 100).round(1)
+    df['Dependency_Ratio'] = ((df['Age_0_14'] + df['Age_60_64'] + df['Age_65_Plus']) / df['Age_15_59'].replace(0, 1) * 100).round(1)
+
+    # Composite key for unique GeoJSON joining (District + GN name).
+    # GN Division names like 'Mallikaithivu' exist in MULTIPLE districts (Trinco & Mullaitivu).
+    df['GN_Link_Key'] = (df['District'].astype(str).str.upper().str.strip() + '|'
+                         + df['GN_Division'].astype(str).str.upper().str.strip())
+    return df
+
+
+def prepare(df):
+    """Normalize, type and derive a cleaned census frame into the store layout."""
+    df = normalize_columns(df)
+
+    for col in COUNT_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype('int32')
+    for col in CODE_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype('int16')
+    df['GN_UID'] = make_gn_uid(df['District_Code'], df['DS_Code'], df['GN_Code'])
+    df['GN_Number'] = df['GN_Number'].astype(str).str.strip()
+    df['GN_Division'] = df['GN_Division'].astype(str).str.strip()
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].astype(str).str.strip().astype('category')
+
+    df = add_derived_columns(df)
+    return df[STORE_COLUMNS].reset_index(drop=True)
+
+
+def _store_schema():
+    """Fixed Arrow schema so independently prepared batches stay compatible."""
+    types = {col: pa.int16() for col in CODE_COLUMNS}
+    types.update({col: pa.dictionary(pa.int32(), pa.string()) for col in CATEGORY_COLUMNS})
+    types.update({col: pa.int32() for col in COUNT_COLUMNS + ['GN_UID']})
+    types.update({col: pa.float64() for col in RATIO_COLUMNS})
+    schema = pa.schema([(col, types.get(col, pa.string())) for col in STORE_COLUMNS])
+    return schema.with_metadata({b'census_schema_version': str(SCHEMA_VERSION).encode()})
+
+
+class StoreWriter:
+    """Append cleaned census batches to the Parquet store, one row group per batch."""
+
+    def __init__(self, path=STORE_PATH):
+        self.path = Path(path)
+        self.schema = _store_schema()
+        self.rows = 0
+        self._writer = pq.ParquetWriter(self.path, self.schema, compression='zstd')
+
+    def write(self, df):
+        """Prepare a cleaned batch and append it. Returns the prepared frame."""
+        df = prepare(df)
+        self._writer.write_table(pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+        self.rows += len(df)
+        return df
+
+    def close(self):
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_store(df, path=STORE_PATH):
+    """Write a cleaned census frame to the Parquet store."""
+    with StoreWriter(path) as writer:
+        return writer.write(df)
+
+
+def load_census(columns=None, path=STORE_PATH):
+    """
+    Load the census store, optionally projecting to `columns`.
+    Rebuilds the store from the cleaned CSV if it is missing or outdated.
+    """
+    path = Path(path)
+    if not path.exists() or store_schema_version(path) != SCHEMA_VERSION:
+        df = pd.read_csv(CLEANED_CSV_PATH)
+        try:
+            write_store(df, path)
+        except OSError:
+            # Read-only deployment: serve the freshly prepared frame directly
+            df = prepare(df)
+            return df[columns] if columns else df
+
+    table = pq.read_table(path, columns=columns)
+    return table.to_pandas()
+
+
+def write_arrow(store_path=STORE_PATH, arrow_path=ARROW_PATH):
+    """
+    Uncompressed Arrow IPC copy of the Parquet store (memory-mappable).
+    Written to a temporary file and renamed, so processes mapping the
+    previous copy keep a consistent file.
+    """
+    arrow_path = Path(arrow_path)
+    # One record batch: columns split across batches would be concatenated (copied) on load
+    table = pq.read_table(store_path).unify_dictionaries().combine_chunks()
+    tmp = arrow_path.with_name(f"{arrow_path.name}.{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, arrow_path)
+    return arrow_path
+
+
+def _arrow_current(store_path, arrow_path):
+    if not arrow_path.exists() or arrow_path.stat().st_mtime < store_path.stat().st_mtime:
+        return False
+    with pa.memory_map(str(arrow_path)) as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    return metadata.get(b'census_schema_version') == str(SCHEMA_VERSION).encode()
+
+
+def map_census(columns=None, store_path=STORE_PATH, arrow_path=ARROW_PATH):
+    """
+    Census frame backed by a memory-mapped Arrow IPC copy of the store.
+    Numeric and string columns are zero-copy, read-only views of the mapped
+    file (only the small categorical codes are materialized), so repeated
+    calls and other processes share the same pages. The copy is (re)built
+    from the store when missing or older than it; where it cannot be
+    written, the store is loaded normally.
+    """
+    store_path, arrow_path = Path(store_path), Path(arrow_path)
+    if not store_path.exists() or store_schema_version(store_path) != SCHEMA_VERSION:
+        load_census(columns=[], path=store_path)  # rebuilds the store from the cleaned CSV
+    try:
+        if not _arrow_current(store_path, arrow_path):
+            write_arrow(store_path, arrow_path)
+    except OSError:
+        return load_census(columns=columns, path=store_path)
+
+    table = pa.ipc.open_file(pa.memory_map(str(arrow_path))).read_all()
+    if columns:
+        table = table.select(columns)
+    return table.to_pandas(split_blocks=True)
+
+
+def store_schema_version(path=STORE_PATH):
+    """Schema version recorded in the store's metadata (None if absent)."""
+    metadata = pq.read_schema(path).metadata or {}
+    version = metadata.get(b'census_schema_version')
+    return int(version) if version else None
+
+
+def main():
+    print(f"Building {STORE_PATH} from {CLEANED_CSV_PATH}...")
+    df = write_store(pd.read_csv(CLEANED_CSV_PATH))
+    print(f"Saved {len(df):,} rows x {len(df.columns)} columns (schema v{SCHEMA_VERSION}).")
+    print(f"Memory-mappable copy: {write_arrow()}")
+
+
+if __name__ == "__main__":
+    main()
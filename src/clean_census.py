@@ -1,118 +1,271 @@
+import argparse
+import sys
 import pandas as pd
 import numpy as np
+import openpyxl
+from pathlib import Path
+from pandas.api.types import infer_dtype
 
-file_path = "../data/raw/GN_population_excel.xlsx"
-output_path = "../data/processed/GN_population_cleaned.csv"
-
-def clean_and_convert(val):
-    """Clean numeric strings with commas and convert to int."""
-    if pd.isna(val) or val == ' ':
-        return 0
-    if isinstance(val, (int, float)):
-        return int(val)
-    # Remove commas and whitespace
-    clean_str = str(val).replace(',', '').strip()
-    try:
-        return int(clean_str)
-    except ValueError:
-        return 0
+import profiling
+from census_store import STORE_PATH, StoreWriter, write_store
 
-try:
-    print("Reading Excel file...")
-    # Read full file without headers first to locate data
-    df_raw = pd.read_excel(file_path, sheet_name='Population', header=None)
-    
-    # Locate the header row containing "Province Code"
-    header_idx = -1
-    for i, row in df_raw.iterrows():
-        if "Province Code" in str(row.values):
-            header_idx = i
-            break
-            
-    if header_idx == -1:
+script_dir = Path(__file__).resolve().parent
+file_path = script_dir.parent / "data" / "raw" / "GN_population_excel.xlsx"
+output_path = script_dir.parent / "data" / "processed" / "GN_population_cleaned.csv"
+
+# Only the first rows of the sheet are searched for the header (title block + headers)
+HEADER_PROBE_ROWS = 50
+
+# Raw rows held in memory per batch when streaming
+BATCH_ROWS = 5000
+
+# Sheet holding the GN population table in the release workbook
+DEFAULT_SHEET = 'Population'
+
+# Indices based on user sample (0-based):
+# 0: Province Code
+# 1: Province
+# 2: District Code
+# 3: District Name
+# 4: DS_Division Code
+# 5: DS_Division Name
+# 6: GN_Division Code
+# 7: GN_Division Name
+# 8: GN_Division Number
+# 9: Total_Pop (Sex>Total)
+# 10: Male
+# 11: Female
+# 12: Age_Total (Redundant) - SKIP
+# 13: Age_0_14
+# 14: Age_15_59
+# 15: Age_60_64
+# 16: Age_65_Plus
+selected_indices = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 13, 14, 15, 16]
+new_columns = [
+    "Province_Code", "Province_Name",
+    "District_Code", "District_Name",
+    "DS_Code", "DS_Name",
+    "GN_Code", "GN_Name", "GN_Number",
+    "Total_Population", "Male", "Female",
+    "Age_0_14", "Age_15_59", "Age_60_64", "Age_65_Plus"
+]
+numeric_cols = ["Total_Population", "Male", "Female", "Age_0_14", "Age_15_59", "Age_60_64", "Age_65_Plus"]
+
+
+def _text_mask(series):
+    """Boolean mask of the str cells of a column."""
+    kind = infer_dtype(series, skipna=True)
+    if kind in ('integer', 'floating', 'mixed-integer-float', 'decimal', 'boolean', 'empty'):
+        return np.zeros(len(series), dtype=bool)
+    if kind == 'string':
+        return series.notna().to_numpy()
+    # Mixed column: one C-level ufunc pass over the cell types
+    return np.frompyfunc(type, 1, 1)(series.to_numpy(dtype=object)) == str
+
+
+def clean_numeric(series):
+    """
+    Counts of a raw column as int64: numbers truncated toward zero, text with
+    thousands separators parsed, missing or non-integer cells -> 0.
+    """
+    result = np.zeros(len(series), dtype=np.int64)
+    is_text = _text_mask(series)
+
+    # Numeric cells: missing -> 0, floats truncated toward zero like int()
+    numbers = pd.to_numeric(series[~is_text], errors='coerce')
+    result[~is_text] = np.trunc(numbers.fillna(0).to_numpy(dtype=np.float64))
+
+    # Text cells: drop thousands separators and whitespace, then accept only
+    # integer literals (what int() accepts); anything else ('-', '3.5', ' ') -> 0
+    if is_text.any():
+        text = series[is_text].astype('string[pyarrow]').str.replace(',', '', regex=False).str.strip()
+        is_int = text.str.fullmatch(r'[+-]?\d+(?:_\d+)*').fillna(False).astype(bool)
+        digits = text.where(is_int, '0').str.replace('_', '', regex=False)
+        result[is_text] = digits.astype('int64').to_numpy()
+
+    return pd.Series(result, index=series.index, name=series.name)
+
+
+def find_header_row(df_raw, probe_rows=HEADER_PROBE_ROWS):
+    """Locate the header row containing "Province Code" within the first rows."""
+    # Header cells wrap across lines in the sheet ("Province\nCode")
+    probe = df_raw.head(probe_rows).astype(str).replace(r'\s+', ' ', regex=True)
+    matches = probe.apply(lambda col: col.str.strip() == 'Province Code').any(axis=1)
+    if not matches.any():
         raise ValueError("Could not find header row starting with 'Province Code'")
-        
-    print(f"Headers found at row {header_idx}")
-    
-    # The actual data usually starts 2 rows after 'Province Code' row in this provisional layout?
-    # Based on user sample: 
-    # Row 3: Headers (Province Code...)
-    # Row 4: Sub-headers (Total, Male...)
-    # Row 5: Data
-    data_start_idx = header_idx + 2 
-    
-    # Extract data slice
-    df_data = df_raw.iloc[data_start_idx:].copy()
-    
-    # Check if we need to adjust columns. 
-    # We will select columns by index as they are structural.
-    # Indices based on user sample (0-based):
-    # 0: Province Code
-    # 1: Province
-    # 2: District Code
-    # 3: District Name
-    # 4: DS_Division Code
-    # 5: DS_Division Name
-    # 6: GN_Division Code
-    # 7: GN_Division Name
-    # 8: GN_Division Number
-    # 9: Total_Pop (Sex>Total)
-    # 10: Male
-    # 11: Female
-    # 12: Age_Total (Redundant) - SKIP
-    # 13: Age_0_14
-    # 14: Age_15_59
-    # 15: Age_60_64
-    # 16: Age_65_Plus
-    
-    selected_indices = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 13, 14, 15, 16]
-    new_columns = [
-        "Province_Code", "Province_Name", 
-        "District_Code", "District_Name", 
-        "DS_Code", "DS_Name", 
-        "GN_Code", "GN_Name", "GN_Number",
-        "Total_Population", "Male", "Female",
-        "Age_0_14", "Age_15_59", "Age_60_64", "Age_65_Plus"
-    ]
-    
-    # Filter columns
+    return int(matches.to_numpy().argmax())
+
+
+def clean_rows(df_data, convert=clean_numeric):
+    """Select, name and type the structural columns of raw data rows."""
+    # Short rows (trailing empty cells) are padded so every index exists
+    df_data = df_data.reindex(columns=range(max(selected_indices) + 1))
+
+    # Select columns by index as they are structural
     df_clean = df_data.iloc[:, selected_indices].copy()
     df_clean.columns = new_columns
-    
+
     # Drop rows where essential identifiers are missing (e.g. totals rows or empty lines)
     # Ensure GN_Code is present
     df_clean = df_clean.dropna(subset=['GN_Code'])
-    
+
     # Convert numeric columns
-    numeric_cols = ["Total_Population", "Male", "Female", "Age_0_14", "Age_15_59", "Age_60_64", "Age_65_Plus"]
-    
     for col in numeric_cols:
-        df_clean[col] = df_clean[col].apply(clean_and_convert)
-        
-    # Verify Total Population integrity
+        df_clean[col] = convert(df_clean[col])
+
+    return df_clean
+
+
+def clean_frame(df_raw, convert=clean_numeric):
+    """Turn the raw 'Population' sheet into the cleaned GN-level frame."""
+    header_idx = find_header_row(df_raw)
+    print(f"Headers found at row {header_idx}")
+
+    # Row header_idx: Headers (Province Code...)
+    # Row header_idx + 1: Sub-headers (Total, Male...)
+    # Row header_idx + 2: Data
+    data_start_idx = header_idx + 2
+    return clean_rows(df_raw.iloc[data_start_idx:], convert=convert)
+
+
+def _is_header(row):
+    """True if a raw sheet row holds the "Province Code" header cell."""
+    return any(isinstance(v, str) and " ".join(v.split()) == 'Province Code' for v in row)
+
+
+def iter_clean_batches(path=file_path, sheets=(DEFAULT_SHEET,), batch_rows=BATCH_ROWS):
+    """
+    Stream cleaned row batches from the given sheets of a read-only workbook.
+    Each sheet's header is detected on the fly; sheets without one (notes,
+    contents pages) are skipped. Yields (sheet_name, cleaned_frame); only
+    one batch of raw rows is held in memory at a time.
+    """
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for name in sheets:
+            rows = wb[name].iter_rows(values_only=True)
+            for i, row in enumerate(rows):
+                if _is_header(row):
+                    print(f"[{name}] Headers found at row {i}")
+                    break
+                if i + 1 >= HEADER_PROBE_ROWS:
+                    row = None
+                    break
+            else:
+                row = None
+            if row is None:
+                print(f"[{name}] No 'Province Code' header, skipping sheet")
+                continue
+
+            next(rows, None)  # Sub-headers (Total, Male...)
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_rows:
+                    yield name, clean_rows(pd.DataFrame(batch, dtype=object))
+                    batch = []
+            if batch:
+                yield name, clean_rows(pd.DataFrame(batch, dtype=object))
+    finally:
+        wb.close()
+
+
+def check_totals(df_clean):
+    """Warn about rows whose sex or age breakdown does not add up to the total."""
+    mismatch_sex, mismatch_age = count_mismatches(df_clean)
+    if mismatch_sex:
+        print(f"Warning: {mismatch_sex} rows have mismatching Sex sums.")
+    if mismatch_age:
+        print(f"Warning: {mismatch_age} rows have mismatching Age sums.")
+
+
+def count_mismatches(df_clean):
+    """Rows where Male + Female or the age groups do not add up to the total."""
     # Check if Male + Female ~= Total
-    df_clean['Sex_Sum'] = df_clean['Male'] + df_clean['Female']
-    mismatch_sex = df_clean[df_clean['Total_Population'] != df_clean['Sex_Sum']]
-    if not mismatch_sex.empty:
-        print(f"Warning: {len(mismatch_sex)} rows have mismatching Sex sums.")
-        
+    sex_sum = df_clean['Male'] + df_clean['Female']
+    mismatch_sex = int((df_clean['Total_Population'] != sex_sum).sum())
+
     # Check Age Sum
-    df_clean['Age_Sum'] = df_clean['Age_0_14'] + df_clean['Age_15_59'] + df_clean['Age_60_64'] + df_clean['Age_65_Plus']
-    mismatch_age = df_clean[df_clean['Total_Population'] != df_clean['Age_Sum']]
-    if not mismatch_age.empty:
-        print(f"Warning: {len(mismatch_age)} rows have mismatching Age sums.")
-        
-    # Drop check columns
-    df_clean.drop(columns=['Sex_Sum', 'Age_Sum'], inplace=True)
-    
+    age_sum = df_clean['Age_0_14'] + df_clean['Age_15_59'] + df_clean['Age_60_64'] + df_clean['Age_65_Plus']
+    mismatch_age = int((df_clean['Total_Population'] != age_sum).sum())
+    return mismatch_sex, mismatch_age
+
+
+def run_in_memory(input_path, sheet):
+    """Original path: load the whole sheet, clean it, write CSV + store."""
+    print("Reading Excel file...")
+    # Read full file without headers first to locate data
+    with profiling.stage('excel_read'):
+        df_raw = pd.read_excel(input_path, sheet_name=sheet, header=None)
+
+    with profiling.stage('numeric_coercion'):
+        df_clean = clean_frame(df_raw)
+    with profiling.stage('validate_totals'):
+        check_totals(df_clean)
+
     print("\nSample Data:")
     print(df_clean.head())
-    
+
     print(f"\nSaving to {output_path}...")
-    df_clean.to_csv(output_path, index=False)
-    print("Done.")
+    with profiling.stage('write_csv'):
+        df_clean.to_csv(output_path, index=False)
+
+    # Typed columnar store with derived metrics, read by the dashboard and reports
+    print(f"Saving to {STORE_PATH}...")
+    with profiling.stage('write_store'):
+        write_store(df_clean)
+
+
+def run_streaming(input_path, sheets):
+    """Bounded-memory path: stream batches straight into the CSV and the store."""
+    print(f"Streaming {input_path}...")
+    rows = mismatch_sex = mismatch_age = 0
+    per_sheet = {}
+    with profiling.stage('stream_clean_write'), \
+            open(output_path, 'w', newline='', encoding='utf-8') as csv_file, StoreWriter() as store:
+        for sheet, batch in iter_clean_batches(input_path, sheets):
+            batch.to_csv(csv_file, index=False, header=(rows == 0))
+            store.write(batch)
+            sex, age = count_mismatches(batch)
+            mismatch_sex += sex
+            mismatch_age += age
+            rows += len(batch)
+            per_sheet[sheet] = per_sheet.get(sheet, 0) + len(batch)
+
+    for sheet, count in per_sheet.items():
+        print(f"  {sheet}: {count:,} rows")
+    if mismatch_sex:
+        print(f"Warning: {mismatch_sex} rows have mismatching Sex sums.")
+    if mismatch_age:
+        print(f"Warning: {mismatch_age} rows have mismatching Age sums.")
+    print(f"Saved {rows:,} rows to {output_path} and {STORE_PATH}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean the GN population Excel release.")
+    parser.add_argument('--input', default=file_path, help="Excel workbook to clean")
+    parser.add_argument('--stream', action='store_true',
+                        help="Stream rows from a read-only workbook (bounded memory)")
+    parser.add_argument('--sheet', action='append', dest='sheets',
+                        help=f"Sheet to clean (default: {DEFAULT_SHEET}). Repeat with --stream to ingest several sheets.")
+    args = parser.parse_args()
+    sheets = args.sheets or [DEFAULT_SHEET]
+    if len(sheets) > 1 and not args.stream:
+        parser.error("several --sheet values need --stream")
+
+    try:
+        if args.stream:
+            run_streaming(args.input, sheets)
+        else:
+            run_in_memory(args.input, sheets[0])
+        print("Done.")
+
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+
 
-except Exception as e:
-    print(f"Error: {e}")
-    import traceback
-    traceback.print_exc()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+Demographic profile clustering for GN divisions (K-Means).
+Moves the notebook's clustering out of Sri_Lanka_Census_EDA.ipynb:
+  - the elbow sweep fits every K in parallel worker processes,
+  - a mini-batch mode handles large or multi-year inputs,
+  - the fitted scaler and centroids are saved as a small .npz keyed by a
+    hash of the feature data, so new GN rows are assigned to a profile
+    without refitting,
+  - an index next to the models maps the input files (size/mtime) to that
+    hash and (hash, K, algorithm) to the model file, so `assign` finds the
+    model without re-reading the training data.
+
+Unnamed profiles are labelled Profile_{i} with an integer cluster number
+(the notebook's float Cluster column gave Profile_2.0).
+
+Usage:
+    python src/clustering.py sweep [--k-min 2 --k-max 9] [--workers N] [--minibatch]
+    python src/clustering.py fit [--k 4] [--minibatch] [--force]
+    python src/clustering.py assign NEW_ROWS.csv [--k 4] [--minibatch] [--output out.csv] [--model path.npz]
+
+`--input` (repeatable) reads cleaned census CSVs or Parquet stores instead
+of the default store, e.g. one file per census year. `assign` uses the
+model fitted on that data with the given K and algorithm unless `--model`
+names a file.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from census_store import PROCESSED_DIR, STORE_PATH, load_census, prepare
+
+MODELS_DIR = PROCESSED_DIR / "clusters"
+MODEL_INDEX_PATH = MODELS_DIR / "index.json"
+
+# Same features, K and seed as the notebook
+FEATURES = ['Sex_Ratio', 'Child_Dependency_Ratio', 'Old_Age_Dependency_Ratio']
+DEFAULT_K = 4
+RANDOM_STATE = 42
+N_INIT = 10
+MINIBATCH_SIZE = 4096
+
+
+def feature_frame(df):
+    """
+    Clustering features with the notebook's definitions (Sex_Ratio is
+    males per 100 females here). Rows with a zero denominator are NaN.
+    """
+    female = df['Female'].replace(0, np.nan)
+    working = df['Age_15_59'].replace(0, np.nan)
+    return pd.DataFrame({
+        'Sex_Ratio': df['Male'] / female * 100,
+        'Child_Dependency_Ratio': df['Age_0_14'] / working * 100,
+        'Old_Age_Dependency_Ratio': (df['Age_60_64'] + df['Age_65_Plus']) / working * 100,
+    }, index=df.index)
+
+
+def data_hash(X):
+    """Content hash of a feature matrix (values and shape)."""
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    digest = hashlib.sha256(str(X.shape).encode())
+    digest.update(X.tobytes())
+    return digest.hexdigest()
+
+
+def standardize(X):
+    """Column means and standard deviations (StandardScaler equivalent)."""
+    mean = X.mean(axis=0)
+    scale = X.std(axis=0)
+    scale[scale == 0] = 1.0
+    return mean, scale
+
+
+def _make_model(k, minibatch, seed=RANDOM_STATE):
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+    if minibatch:
+        return MiniBatchKMeans(n_clusters=k, random_state=seed, n_init=N_INIT, batch_size=MINIBATCH_SIZE)
+    return KMeans(n_clusters=k, random_state=seed, n_init=N_INIT)
+
+
+def _fit_one(args):
+    """Worker: fit one K and return (k, inertia). Each process runs single-threaded."""
+    X_scaled, k, minibatch = args
+    from threadpoolctl import threadpool_limits
+    with threadpool_limits(1):
+        model = _make_model(k, minibatch).fit(X_scaled)
+    return k, float(model.inertia_)
+
+
+def sweep(X_scaled, k_values, workers=None, minibatch=False):
+    """Inertia for every K, one fit per worker process. Returns {k: inertia}."""
+    workers = workers or os.cpu_count() or 1
+    jobs = [(X_scaled, k, minibatch) for k in k_values]
+    if workers == 1:
+        return dict(map(_fit_one, jobs))
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        return dict(pool.map(_fit_one, jobs))
+
+
+def profile_names(centroids):
+    """Notebook naming: extreme centroids become named profiles, the rest Profile_{i}."""
+    profiles = pd.DataFrame(centroids, columns=FEATURES)
+    names = {
+        profiles['Old_Age_Dependency_Ratio'].idxmax(): 'Aging Villages',
+        profiles['Child_Dependency_Ratio'].idxmax(): 'Young Families',
+        profiles['Sex_Ratio'].idxmax(): 'Male-Dominated',
+        profiles['Sex_Ratio'].idxmin(): 'Female-Dominated',
+    }
+    return [names.get(i, f'Profile_{i}') for i in range(len(centroids))]
+
+
+def model_path(digest, k, minibatch=False):
+    return MODELS_DIR / f"kmeans_{digest[:16]}_k{k}{'_mb' if minibatch else ''}.npz"
+
+
+def model_key(digest, k, minibatch=False):
+    return f"{digest}|k{k}|{'minibatch' if minibatch else 'kmeans'}"
+
+
+def input_files(paths):
+    """Resolved input paths (default: the census store) as stored in the index."""
+    return [str(Path(p).resolve()) for p in (paths or [STORE_PATH])]
+
+
+def file_stats(files):
+    """[path, size, mtime_ns] of each input file (None for a missing file)."""
+    stats = []
+    for path in files:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stats.append([path, st.st_size, st.st_mtime_ns])
+    return stats
+
+
+def load_index(path=MODEL_INDEX_PATH):
+    """Model index: {'inputs': {files: {stats, data_sha256}}, 'models': {key: file}}."""
+    if not path.exists():
+        return {'inputs': {}, 'models': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def record_model(digest, k, minibatch, model_file, inputs=None, path=MODEL_INDEX_PATH):
+    """Add a fitted model (and the input files its data hash came from) to the index."""
+    index = load_index(path)
+    index['models'][model_key(digest, k, minibatch)] = Path(model_file).name
+    files = input_files(inputs)
+    stats = file_stats(files)
+    if stats is not None:
+        index['inputs']['|'.join(files)] = {'stats': stats, 'data_sha256': digest}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2)
+
+
+def indexed_digest(inputs, index):
+    """Data hash recorded for these input files, or None if they changed since the fit."""
+    files = input_files(inputs)
+    entry = index['inputs'].get('|'.join(files))
+    if entry is None or entry['stats'] != file_stats(files):
+        return None
+    return entry['data_sha256']
+
+
+def fit(X, k=DEFAULT_K, minibatch=False, force=False, inputs=None):
+    """
+    Fit (or reuse) the profile model for feature matrix X, read from the
+    files `inputs` (default: the census store). Returns (model, path).
+    """
+    digest = data_hash(X)
+    path = model_path(digest, k, minibatch)
+    if path.exists() and not force:
+        record_model(digest, k, minibatch, path, inputs)
+        return load_model(path), path
+
+    mean, scale = standardize(X)
+    km = _make_model(k, minibatch).fit((X - mean) / scale)
+    centroids = km.cluster_centers_ * scale + mean  # original units
+    model = {
+        'features': np.array(FEATURES), 'mean': mean, 'scale': scale,
+        'centroids': centroids, 'profiles': np.array(profile_names(centroids)),
+        'k': k, 'minibatch': minibatch, 'inertia': float(km.inertia_), 'data_sha256': digest,
+    }
+    MODELS_DIR.mkdir(parents=True, exist_ok=True)
+    np.savez(path, **model)
+    record_model(digest, k, minibatch, path, inputs)
+    return load_model(path), path
+
+
+def load_model(path):
+    """Load a saved model into a plain dict."""
+    with np.load(path, allow_pickle=False) as f:
+        model = {name: f[name] for name in f.files}
+    model['profiles'] = model['profiles'].tolist()
+    model['features'] = model['features'].tolist()
+    return model
+
+
+def saved_model(inputs=None, k=DEFAULT_K, minibatch=False):
+    """
+    Saved model fitted on the data in `inputs` with this K and algorithm:
+    (model, path) or None. The data hash comes from the model index while
+    the input files are unchanged; otherwise the inputs are read and hashed.
+    """
+    index = load_index()
+    digest = indexed_digest(inputs, index)
+    if digest is None:
+        digest = data_hash(feature_matrix(read_inputs(inputs)))
+    name = index['models'].get(model_key(digest, k, minibatch))
+    path = MODELS_DIR / name if name else model_path(digest, k, minibatch)
+    if not path.exists():
+        return None
+    model = load_model(path)
+    if (str(model['data_sha256']) != digest or int(model['k']) != k
+            or bool(model['minibatch']) != minibatch):
+        return None
+    return model, path
+
+
+def assign(df, model):
+    """
+    Cluster and Profile for census rows using a saved model (no refit).
+    Rows without valid features get Cluster NaN / Profile None.
+    """
+    feats = feature_frame(df)[model['features']]
+    valid = feats.notna().all(axis=1).to_numpy()
+    scaled = (feats.to_numpy()[valid] - model['mean']) / model['scale']
+    centers = (model['centroids'] - model['mean']) / model['scale']
+    d2 = ((scaled[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+
+    cluster = np.full(len(df), np.nan)
+    cluster[valid] = d2.argmin(axis=1)
+    profiles = np.array(model['profiles'], dtype=object)
+    profile = np.full(len(df), None, dtype=object)
+    profile[valid] = profiles[cluster[valid].astype(int)]
+    return pd.DataFrame({'Cluster': cluster, 'Profile': profile}, index=df.index)
+
+
+def read_inputs(paths):
+    """Census rows from cleaned CSVs / Parquet stores (default: the census store)."""
+    if not paths:
+        return load_census()
+    frames = []
+    for path in paths:
+        path = Path(path)
+        frames.append(pd.read_parquet(path) if path.suffix == '.parquet' else prepare(pd.read_csv(path)))
+    return pd.concat(frames, ignore_index=True)
+
+
+def feature_matrix(df):
+    feats = feature_frame(df).dropna()
+    return feats.to_numpy(dtype=np.float64)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="K-Means demographic profiles for GN divisions.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_sweep = sub.add_parser('sweep', help="Elbow sweep over K (parallel)")
+    p_sweep.add_argument('--k-min', type=int, default=2)
+    p_sweep.add_argument('--k-max', type=int, default=9)
+    p_sweep.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+
+    p_fit = sub.add_parser('fit', help="Fit and save the profile model")
+    p_fit.add_argument('--k', type=int, default=DEFAULT_K)
+    p_fit.add_argument('--force', action='store_true', help="Refit even if a model for this data exists")
+
+    p_assign = sub.add_parser('assign', help="Assign new GN rows to saved profiles")
+    p_assign.add_argument('rows', help="Cleaned census CSV or Parquet with the rows to assign")
+    p_assign.add_argument('--k', type=int, default=DEFAULT_K)
+    p_assign.add_argument('--model', help="Model .npz (default: the one fitted on --input with --k)")
+    p_assign.add_argument('--output', help="CSV to write (default: print a summary)")
+
+    for p in (p_sweep, p_fit, p_assign):
+        p.add_argument('--input', action='append', dest='inputs', help="Census CSV/Parquet (repeatable)")
+        p.add_argument('--minibatch', action='store_true', help="Use MiniBatchKMeans (large inputs)")
+    args = parser.parse_args()
+
+    if args.command == 'assign':
+        if args.model:
+            path = Path(args.model)
+            if not path.exists():
+                print(f"Error: model {path} not found.")
+                sys.exit(1)
+            model = load_model(path)
+        else:
+            found = saved_model(args.inputs, args.k, args.minibatch)
+            if found is None:
+                algorithm = 'MiniBatchKMeans' if args.minibatch else 'KMeans'
+                flags = f"--k {args.k}" + (" --minibatch" if args.minibatch else "")
+                print(f"Error: no saved {algorithm} model with K={args.k} for this data; "
+                      f"run `python src/clustering.py fit {flags}` first.")
+                sys.exit(1)
+            model, path = found
+        df = read_inputs([args.rows])
+        result = assign(df, model)
+        print(f"Assigned {int(result['Cluster'].notna().sum()):,} of {len(df):,} rows using {path.name}")
+        print(result['Profile'].value_counts().to_string())
+        if args.output:
+            pd.concat([df, result], axis=1).to_csv(args.output, index=False)
+            print(f"Saved to {args.output}")
+        return
+
+    X = feature_matrix(read_inputs(args.inputs))
+    print(f"Clustering {len(X):,} GN divisions (data {data_hash(X)[:12]})...")
+
+    if args.command == 'sweep':
+        mean, scale = standardize(X)
+        inertias = sweep((X - mean) / scale, range(args.k_min, args.k_max + 1), args.workers, args.minibatch)
+        for k in sorted(inertias):
+            print(f"  K={k}: inertia {inertias[k]:,.1f}")
+        MODELS_DIR.mkdir(parents=True, exist_ok=True)
+        out = MODELS_DIR / f"sweep_{data_hash(X)[:16]}{'_mb' if args.minibatch else ''}.json"
+        with open(out, 'w', encoding='utf-8') as f:
+            json.dump({str(k): v for k, v in sorted(inertias.items())}, f, indent=2)
+        print(f"Saved to {out}")
+    else:
+        model, path = fit(X, args.k, args.minibatch, args.force, args.inputs)
+        for name, centroid in zip(model['profiles'], model['centroids']):
+            values = ', '.join(f"{f}={v:.1f}" for f, v in zip(model['features'], centroid))
+            print(f"  {name:<18} {values}")
+        print(f"Model saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,25 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from pathlib import Path
 import json
+import os
+from dataclasses import asdict, dataclass
+
+from build_geojson import MANIFEST_PATH, SOURCE_PATH, load_artifact, resolve_conflicts
+from gn_linkage import link_features
+import build_shards
+import build_extents
+import build_tiles
+import simplify
+from build_extents import country_extent, selection_extent
+from build_tiles import load_view
+from simplify import load_level, pick_level
+from census_store import DASHBOARD_COLUMNS, STORE_PATH, map_census
+from census_cube import build_cube, display_population, rollup, totals
+from census_index import build_index, district_options as index_district_options, ds_options as index_ds_options, select_rows
+import dashboard_metrics
+import figure_cache as figures
+from dashboard_metrics import RerunTrace, figure_bytes, is_admin, metrics_enabled
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -189,195 +206,453 @@ st.markdown("""
 
 
 # --- Data Loading with Caching ---
-@st.cache_data
+# Loaders use st.cache_resource: every session gets the same objects rather
+# than a deserialized copy per call, so memory stays flat as viewers are
+# added. The census frame is memory-mapped from an Arrow file (read-only,
+# shared with other processes); the cube is read-only under pandas
+# copy-on-write and the index arrays are frozen. Callers must not mutate
+# the GeoJSON dicts - the map path builds new FeatureCollections instead.
+
+
+@st.cache_resource
 def load_data():
-    """Load and preprocess the census data."""
-    # Determine path relative to this script
-    script_dir = Path(__file__).parent
-    data_path = script_dir.parent / "data" / "processed" / "GN_population_cleaned.csv"
-    
-    # Load data
-    df = pd.read_csv(data_path)
-    
-    # Clean column names (remove newlines)
-    df.columns = df.columns.str.replace('\n', '_').str.replace('\r', '').str.strip()
-    
-    # Rename columns for easier access
-    rename_map = {
-        'Province_Code': 'Province_Code',
-        'Province_Name': 'Province',
-        'District_Code': 'District_Code', 
-        'District_Name': 'District',
-        'DS_Division_Code': 'DS_Code',
-        'DS_Division_Name': 'DS_Division',
-        'GN_Division_Code': 'GN_Code',
-        'GN_Division_Name': 'GN_Division',
-        'GN_Division_Number': 'GN_Number',
-        'Sex_Total': 'Total_Population',
-        'Sex_Male': 'Male',
-        'Sex_Female': 'Female',
-        'Age_Total': 'Age_Total',
-        'Age_0_to_14': 'Age_0_14',
-        'Age_15_to_59': 'Age_15_59',
-        'Age_60_to_64': 'Age_60_64',
-        'Age_65_and_above': 'Age_65_Plus'
-    }
-    df = df.rename(columns=rename_map)
-    
-    # Ensure numeric columns
-    numeric_cols = ['Total_Population', 'Male', 'Female', 'Age_0_14', 'Age_15_59', 'Age_60_64', 'Age_65_Plus']
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
-    
-    # Calculate derived metrics
-    df['Sex_Ratio'] = (df['Female'] / df['Male'].replace(0, 1) * 100).round(1)
-    df['Youth_Pct'] = (df['Age_0_14'] / df['Total_Population'].replace(0, 1) * 100).round(1)
-    df['Working_Age_Pct'] = (df['Age_15_59'] / df['Total_Population'].replace(0, 1) * 100).round(1)
-    df['Elderly_Pct'] = ((df['Age_60_64'] + df['Age_65_Plus']) / df['Total_Population'].replace(0, 1) * 100).round(1)
-    df['Dependency_Ratio'] = ((df['Age_0_14'] + df['Age_60_64'] + df['Age_65_Plus']) / df['Age_15_59'].replace(0, 1) * 100).round(1)
-    
-    # Create a composite key for unique GeoJSON joining (District + GN name)
-    # GN Division names like 'Mallikaithivu' exist in MULTIPLE districts (Trinco & Mullaitivu).
-    # We must include District in the key to ensure the map shows the correct polygon location.
-    df['GN_Link_Key'] = (df['District'].str.upper().str.strip() + '|' + df['GN_Division'].str.upper().str.strip())
-    
-    return df
+    """Census data (typed, with derived metrics), memory-mapped from the Arrow copy of the store."""
+    return map_census(columns=DASHBOARD_COLUMNS)
+
+@st.cache_resource
+def load_cube():
+    """Province/District/DS sums, built once so reruns aggregate by lookup."""
+    return build_cube(load_data())
+
+@st.cache_resource
+def load_index():
+    """Row positions per Province/District/DS and the cached option lists."""
+    return build_index(load_data())
 
-@st.cache_data
+@st.cache_resource
 def load_geojson():
     """Load GeoJSON for map visualization."""
-    script_dir = Path(__file__).parent
-    geojson_path = script_dir.parent / "data" / "processed" / "GN_census_merged.geojson"
-    
-    if not geojson_path.exists():
+    # Fast path: conflict resolution already done offline by build_geojson.py
+    data = load_artifact()
+    if data is not None:
+        return data
+
+    if not SOURCE_PATH.exists():
         return None
-        
-    with open(geojson_path, 'r', encoding='utf-8') as f:
+
+    # Artifact missing or stale: resolve and link the raw merged file in-process
+    with open(SOURCE_PATH, 'r', encoding='utf-8') as f:
         data = json.load(f)
-    
-    # --- Spatial Conflict Resolution ---
-    # The GeoJSON contains "lying" records: identical geometries (ShapeID & coords) duplicated
-    # across districts. e.g. Mallikaithivu exists as "Trincomalee" but uses "Mullaitivu"
-    # geometry. We must filter these out based on physical proximity to the district center.
-
-    # 1. Calculate approximate centroid for each feature
-    def get_centroid(feature):
-        geom = feature.get('geometry')
-        if not geom or not geom.get('coordinates'):
-            return None
-        coords = geom['coordinates']
-        # For Polygon, coords[0] is outer ring. For MultiPolygon, coords[0][0] is outer ring of first poly.
-        ring = coords[0] if geom['type'] == 'Polygon' else coords[0][0]
-        # Avg of ring vertices is good enough approx for district assignment
-        lons = [p[0] for p in ring]
-        lats = [p[1] for p in ring]
-        return (sum(lats)/len(lats), sum(lons)/len(lons))
-
-    # 2. Collect reliable centroids to determine District Centers
-    # A feature is "reliable" if its ShapeID is unique to one District
-    shape_to_districts = {} 
-    feature_centroids = {}
-    
-    for i, feature in enumerate(data['features']):
-        props = feature['properties']
-        sid = props.get('shapeID')
-        dist = str(props.get('District_Name', '')).upper().strip()
-        
-        if sid and dist and dist != 'NONE':
-            if sid not in shape_to_districts:
-                shape_to_districts[sid] = set()
-            shape_to_districts[sid].add(dist)
-            
-            cent = get_centroid(feature)
-            if cent:
-                feature_centroids[i] = cent
-
-    # 3. Compute District Centers (Average of uncontested centroids)
-    district_centers = {}
-    district_points = {}
-    
-    for i, feature in enumerate(data['features']):
-        props = feature['properties']
-        sid = props.get('shapeID')
-        dist = str(props.get('District_Name', '')).upper().strip()
-        
-        # Only use uncontested shapes for the district center
-        if sid and dist and len(shape_to_districts.get(sid, [])) == 1:
-            if i in feature_centroids:
-                if dist not in district_points: district_points[dist] = []
-                district_points[dist].append(feature_centroids[i])
-
-    for dist, points in district_points.items():
-        if points:
-            avg_lat = sum(p[0] for p in points) / len(points)
-            avg_lon = sum(p[1] for p in points) / len(points)
-            district_centers[dist] = (avg_lat, avg_lon)
-
-    # 4. Filter "Lying" Records
-    # If a feature is claimed by multiple districts (same ShapeID), assign it ONLY
-    # to the district its centroid is closest to.
-    
-    validated_features = []
-    
-    for i, feature in enumerate(data['features']):
-        props = feature['properties']
-        sid = props.get('shapeID')
-        claimed_dist = str(props.get('District_Name', '')).upper().strip()
-        gn_name = str(props.get('shapeName', '')).upper().strip()
-        
-        # Default: accept the feature
-        is_valid = True
-        
-        # Check conflict
-        if sid and len(shape_to_districts.get(sid, [])) > 1:
-            # It's a conflict! (e.g. Mallikaithivu claimed by Trincomalee & Mullaitivu)
-            cent = feature_centroids.get(i)
-            if cent and claimed_dist in district_centers:
-                # Compare distance to claimed district vs competing districts
-                # Simple squared euclidean distance is sufficient
-                def dist_sq(p1, p2): return (p1[0]-p2[0])**2 + (p1[1]-p2[1])**2
-                
-                my_dist = dist_sq(cent, district_centers[claimed_dist])
-                
-                # Check neighbors
-                competitors = shape_to_districts[sid]
-                better_claimant = None
-                
-                for comp in competitors:
-                    if comp != claimed_dist and comp in district_centers:
-                        comp_dist = dist_sq(cent, district_centers[comp])
-                        # If significantly closer to another district, this record is a lie
-                        if comp_dist < my_dist:
-                            better_claimant = comp
-                            break
-                            
-                if better_claimant:
-                    # This polygon is physically closer to another district's center
-                    # So the claim that it is in 'claimed_dist' is false (copy-paste error)
-                    is_valid = False
-
-        if is_valid:
-            # Generate the key only for valid features
-            props['District_GN_Key'] = claimed_dist + '|' + gn_name
-            validated_features.append(feature)
-            
-    # Update data with filtered features
-    data['features'] = validated_features
-             
+    data = resolve_conflicts(data)
+    link_features(data)
     return data
 
+@st.cache_resource(max_entries=64)
+def load_map_geojson(center_lat, center_lon, zoom):
+    """Boundaries for a framed map view from the pre-built tiles in view (None without tiles)."""
+    return load_view(center_lat, center_lon, zoom)
+
+@st.cache_resource
+def load_pyramid_index():
+    """Simplification pyramid index (None when missing or stale)."""
+    return simplify.load_index()
+
+@st.cache_resource
+def load_simplified_geojson(level):
+    """Whole-country boundaries at a simplification level, else the full GeoJSON."""
+    data = load_level(level)
+    if data is not None:
+        return data
+    return load_geojson()
+
+# --- Panel data, keyed on the filter state ---
+# Each panel reads only the inputs it needs from FilterState and its data is
+# cached on them, so a rerun triggered by an unrelated control (raw table,
+# overview level) reuses it instead of recomputing.
+AGE_GROUP_COLUMNS = {
+    "0-14 (Youth)": "Age_0_14",
+    "15-59 (Working)": "Age_15_59",
+    "60-64": "Age_60_64",
+    "65+ (Elderly)": "Age_65_Plus",
+}
+
+
+@dataclass(frozen=True)
+class FilterState:
+    """Sidebar selection in canonical (sorted, hashable) form."""
+    provinces: tuple = ()
+    districts: tuple = ()
+    ds_divisions: tuple = ()
+    gender: str = "All"
+    age_groups: tuple = ()
+
+    @classmethod
+    def from_widgets(cls, provinces, districts, ds_divisions, gender, age_groups):
+        order = list(AGE_GROUP_COLUMNS)
+        return cls(tuple(sorted(provinces)), tuple(sorted(districts)), tuple(sorted(ds_divisions)),
+                   gender, tuple(sorted(age_groups, key=order.index)))
+
+    @property
+    def selection(self):
+        """(provinces, districts, ds_divisions) for the index and cube lookups."""
+        return list(self.provinces), list(self.districts), list(self.ds_divisions)
+
+    @property
+    def age_cols(self):
+        return [AGE_GROUP_COLUMNS[ag] for ag in self.age_groups]
+
+
+@st.cache_data(max_entries=256)
+def selection_totals(filters):
+    """KPI sums for the selection (depends on the Province/District/DS filters only)."""
+    return totals(load_cube(), *filters.selection)
+
+@st.cache_data(max_entries=256)
+def breakdown_table(filters, level):
+    """Cube rollup per `level` with the display population for the age/gender focus."""
+    table = rollup(load_cube(), level, *filters.selection)
+    table['Display_Population'] = display_population(table, filters.age_cols, filters.gender)
+    return table
+
+@st.cache_resource
+def load_extents():
+    """Province/District/DS extent table (None when missing or stale)."""
+    return build_extents.load_extents()
+
+@st.cache_resource
+def load_shard_manifest():
+    """Province/District shard manifest (None when the shards are missing or stale)."""
+    return build_shards.load_manifest()
+
+@st.cache_resource(max_entries=128)
+def load_shard(level, kind, name):
+    return build_shards.load_shard(load_shard_manifest(), level, kind, name)
+
+def selection_geojson(filters, level):
+    """
+    Boundaries covering the selection at a simplification level: the
+    selected Districts' (or Provinces') shards, or None when no shards are
+    built or nothing is selected.
+    """
+    manifest = load_shard_manifest()
+    districts = list(filters.districts)
+    if filters.ds_divisions and not districts:
+        # DS Divisions picked under a Province: the districts that contain them
+        index = load_index()
+        wanted = set(filters.ds_divisions)
+        districts = [d for d in index_district_options(index, filters.provinces)
+                     if wanted.intersection(index.ds_by_district.get(d, []))]
+    shards = build_shards.covering_shards(manifest, level, filters.provinces, districts) if manifest else None
+    if not shards:
+        return None
+    return {'type': 'FeatureCollection', 'features': [
+        f for kind, name in shards for f in load_shard(level, kind, name)['features']
+    ]}
+
+@st.cache_resource(max_entries=32)
+def map_layer(filters, zoom, view=None):
+    """
+    (geojson, map_df) for the choropleth: the boundaries to draw and the
+    GN_UID -> display population rows that have a boundary in view.
+    `view` is the (lat, lon) center of a view framed on the selection.
+    Shared read-only between sessions.
+    """
+    # A selection loads its Province/District shards at the detail level
+    # for the zoom and filter depth; the unfiltered map (or a selection
+    # without shards) loads the tiles in its framed view, else the whole
+    # country. Only the selected features are kept.
+    rows = select_rows(load_index(), *filters.selection)
+    depth = 2 if filters.ds_divisions else 1 if filters.districts else 0
+    # Levels with the same vertices as a finer one resolve to it, so they
+    # share its cached boundaries
+    level = simplify.resolve_level(load_pyramid_index(), pick_level(zoom, depth))
+    geojson = selection_geojson(filters, level) if rows is not None else None
+    if geojson is None and view is not None:
+        geojson = load_map_geojson(*view, zoom)
+    if geojson is None:
+        geojson = load_simplified_geojson(level)
+    if geojson and rows is not None:
+        selected_ids = set(load_data()['GN_UID'].to_numpy()[rows].tolist())
+        geojson = {'type': 'FeatureCollection', 'features': [
+            f for f in geojson['features'] if f.get('id') in selected_ids
+        ]}
+    if not geojson:
+        return None, None
+
+    # Only the join key and the value travel to the figure, and only
+    # for GN divisions whose boundaries are in view
+    df = load_data()
+    filtered_df = df if rows is None else df.iloc[rows]
+    map_df = pd.DataFrame({
+        'GN_UID': filtered_df['GN_UID'].to_numpy(),
+        'Display_Population': display_population(filtered_df, filters.age_cols, filters.gender).to_numpy(),
+    })
+    in_view = [f['id'] for f in geojson['features'] if 'id' in f]
+    return geojson, map_df[map_df['GN_UID'].isin(in_view)].reset_index(drop=True)
+
+
+# --- Figure cache, shared by all sessions ---
+# Bump when figure styling changes, so figures kept on disk are rebuilt
+FIGURE_VERSION = 1
+
+
+@st.cache_resource
+def figure_cache():
+    """Process-wide LRU of built figures (size and disk store from the environment)."""
+    return figures.from_env()
+
+@st.cache_resource
+def data_version():
+    """Modification times of the inputs behind every figure, part of each figure key."""
+    paths = [STORE_PATH, MANIFEST_PATH, build_tiles.INDEX_PATH, simplify.INDEX_PATH, build_shards.SHARD_MANIFEST_PATH,
+             build_extents.EXTENTS_PATH]
+    return [p.stat().st_mtime_ns if p.exists() else None for p in paths]
+
+
+def cached_figure(name, trace, build, *key):
+    """
+    Figure `name` for the key parts (filter state, view options), built by
+    build() only when no session has built it yet.
+    """
+    cache_key = figures.figure_key(name, FIGURE_VERSION, data_version(), *key)
+    with trace.span(f'figure_{name}') as span:
+        fig, span['cache'] = figure_cache().get_or_build(cache_key, build)
+    return fig
+
+
+@st.cache_resource
+def metrics_endpoint(port):
+    """Local JSON metrics endpoint, started once per server process."""
+    return dashboard_metrics.start_endpoint(port)
+
+
+def current_session():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
+
+def fragment_rerun():
+    """True while only a fragment (not the whole script) is rerunning."""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    return bool(ctx and ctx.fragment_ids_this_run)
+
+
+def plot(fig, trace, name):
+    """st.plotly_chart inside a timing span (serialization + send), with the payload size."""
+    payload = figure_bytes(fig) if trace.enabled else None
+    with trace.span(name, payload_bytes=payload):
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def admin_panel(trace, history):
+    """Admin-only sidebar panel: this rerun's spans and recent rerun totals."""
+    with st.sidebar:
+        with st.expander("⏱️ Performance (admin)", expanded=False):
+            st.metric("This rerun", f"{trace.total_ms():,.0f} ms")
+            stats = figure_cache().stats()
+            hit_rate = f"{stats['hit_rate']:.0%}" if stats['hit_rate'] is not None else "-"
+            st.caption(f"Figure cache: {stats['entries']} figures, {stats['mb']:.1f} / {stats['max_mb']:.0f} MB, "
+                       f"hit rate {hit_rate} ({stats['hits']} hits, {stats['disk_hits']} from disk, "
+                       f"{stats['misses']} misses, {stats['evictions']} evicted)")
+            spans = pd.DataFrame(trace.spans)
+            st.dataframe(spans, use_container_width=True, hide_index=True)
+            if len(history) > 1:
+                st.caption("Recent reruns (ms)")
+                st.bar_chart(pd.DataFrame({'total_ms': [r['total_ms'] for r in history]}))
+            st.download_button(
+                "Download session log (JSON lines)",
+                data="\n".join(json.dumps(r, default=str) for r in history),
+                file_name="dashboard_metrics.jsonl",
+                mime="application/json",
+            )
+
+
+@st.fragment
+def overview_panel(filters, trace):
+    """
+    Census overview with its own "Categorize by" control. Switching the
+    level reruns only this fragment, not the metrics, charts and map.
+    """
+    partial = fragment_rerun()
+    if partial:
+        # The full run's trace was already published; time this rerun on its own
+        trace = RerunTrace(enabled=trace.enabled, session=trace.session)
+
+    st.markdown("### 🗺️ Census Overview")
+
+    view_level = st.radio(
+        "Categorize by:",
+        ["Province", "District", "DS Division"],
+        horizontal=True,
+        key="overview_view_level"
+    )
+
+    col_map = {
+        "Province": "Province",
+        "District": "District",
+        "DS Division": "DS_Division"
+    }
+
+    group_col = col_map[view_level]
+
+    # Aggregation - cube rollup for the current filters
+    with trace.span('breakdown', level=group_col) as span:
+        overview_data = breakdown_table(filters, group_col).sort_values('Display_Population', ascending=True)
+        span['rows'] = len(overview_data)
+
+    # Limit for DS Division to avoid overcrowding
+    if view_level == "DS Division":
+        # Showing top 20 for readability
+        st.caption("Showing Top 20 DS Divisions by Population")
+        overview_data = overview_data.tail(20)
+
+    def build_overview():
+        fig_province = px.bar(
+            overview_data,
+            y=group_col,
+            x='Display_Population',
+            orientation='h',
+            color='Display_Population',
+            color_continuous_scale='Viridis',
+            labels={'Display_Population': 'Population', group_col: view_level}
+        )
+
+        fig_province.update_layout(
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            font_color='#1e3a5f',
+            xaxis=dict(gridcolor='#e2e8f0'),
+            yaxis=dict(gridcolor='#e2e8f0'),
+            showlegend=False,
+            height=500 + (200 if view_level == "District" else 0) # Taller for Districts
+        )
+        return fig_province
+
+    fig_province = cached_figure('overview', trace, build_overview, asdict(filters), view_level)
+    plot(fig_province, trace, 'render_overview')
+
+    if partial and trace.enabled:
+        dashboard_metrics.publish(trace.to_record(fragment='overview'))
+
+
+@st.fragment
+def map_panel(filters, has_rows, trace):
+    """
+    Population density map with its own "Show Map" toggle. Showing or hiding
+    the map reruns only this fragment, and reruns of the other fragments
+    (overview level, raw table) do not resend it.
+    """
+    partial = fragment_rerun()
+    if partial:
+        trace = RerunTrace(enabled=trace.enabled, session=trace.session)
+
+    show_map = st.toggle("Show Map", value=False, key="show_map")  # Default Disabled
+    if not show_map:
+        return
+
+    # Center map logic
+    center_lat, center_lon = 7.8731, 80.7718  # Default Sri Lanka center
+    zoom = 7
+    view = None  # (lat, lon) once the view is framed on the selection
+
+    # Frame the selection (the whole country without one) from the
+    # precomputed extent table: population-weighted center, zoom fitting
+    # its boundaries
+    if filters.ds_divisions:
+        zoom = 10
+    elif filters.districts:
+        zoom = 9
+    extents = load_extents()
+    extent = None
+    if extents and has_rows:
+        selected = any(filters.selection)
+        extent = selection_extent(extents, *filters.selection) if selected else country_extent(extents)
+    if extent:
+        center_lat, center_lon = extent['center']
+        zoom = extent['zoom']
+        view = (center_lat, center_lon)
+
+    with trace.span('map_layer') as span:
+        geojson, map_df = map_layer(filters, zoom, view)
+        span['features'] = len(geojson['features']) if geojson else 0
+        span['rows'] = len(map_df) if map_df is not None else 0
+
+    if not geojson:
+        st.warning("⚠️ Map data not available.")
+    else:
+        st.markdown("### 🗺️ Population Density")
+
+        def build_map():
+            fig_map = px.choropleth_mapbox(
+                map_df,
+                geojson=geojson,
+                locations='GN_UID',  # matched against each feature's integer id
+                color='Display_Population',
+                mapbox_style="carto-positron",
+                zoom=zoom,
+                center={"lat": center_lat, "lon": center_lon},
+                opacity=0.7,
+                labels={'Display_Population': 'Population'},
+                color_continuous_scale="RdYlGn_r",  # Green (low) to Red (high) density
+            )
+            fig_map.update_layout(
+                margin={"r":0,"t":0,"l":0,"b":0},
+                paper_bgcolor='rgba(0,0,0,0)',
+            )
+            return fig_map
+
+        fig_map = cached_figure('map', trace, build_map, asdict(filters), center_lat, center_lon, zoom)
+        plot(fig_map, trace, 'render_map')
+
+    if partial and trace.enabled:
+        dashboard_metrics.publish(trace.to_record(fragment='map'))
+
+
+@st.fragment
+def raw_table_panel(filtered_df, trace):
+    """Raw rows of the selection behind their own checkbox (reruns only this fragment)."""
+    partial = fragment_rerun()
+    if partial:
+        trace = RerunTrace(enabled=trace.enabled, session=trace.session)
+
+    st.markdown("---")
+    show_raw_data = st.checkbox("Show Raw Data Table", value=False, key="show_raw_data")
+    if show_raw_data:
+        st.markdown("### 📋 Raw Data")
+        display_cols = ['Province', 'District', 'DS_Division', 'GN_Division', 
+                       'Total_Population', 'Male', 'Female', 'Sex_Ratio',
+                       'Age_0_14', 'Age_15_59', 'Age_60_64', 'Age_65_Plus', 'Dependency_Ratio']
+        available_cols = [c for c in display_cols if c in filtered_df.columns]
+        with trace.span('render_table', rows=min(100, len(filtered_df))):
+            st.dataframe(
+                filtered_df[available_cols].head(100),
+                use_container_width=True,
+                height=400
+            )
+        st.caption(f"Showing {min(100, len(filtered_df))} of {len(filtered_df)} records")
+
+    if partial and trace.enabled:
+        dashboard_metrics.publish(trace.to_record(fragment='raw_table'))
+
+
 # --- Main App ---
 def main():
+    admin = is_admin(st.query_params)
+    trace = RerunTrace(enabled=admin or metrics_enabled(), session=current_session())
+    if os.environ.get(dashboard_metrics.PORT_ENV):
+        metrics_endpoint(os.environ[dashboard_metrics.PORT_ENV])
+
     # Load data
     try:
-        df = load_data()
+        with trace.span('load_data') as span:
+            df = load_data()
+            span['rows'] = len(df)
     except FileNotFoundError:
-        st.error("❌ Data file not found. Please ensure `GN_population_cleaned.csv` exists in `data/processed/`.")
+        st.error("❌ Data file not found. Please ensure `GN_population.parquet` or `GN_population_cleaned.csv` exists in `data/processed/`.")
         st.stop()
-        
-    geojson = load_geojson()
-    
+
     # --- Header ---
     st.markdown("""
     <div style='text-align: center; padding: 30px 0; border-bottom: 2px solid #1e3a5f;'>
@@ -394,27 +669,24 @@ def main():
     with st.sidebar:
         st.markdown("### 🔍 Filters")
         
+        with trace.span('load_index'):
+            index = load_index()
+
         # Province filter
-        provinces = sorted(df['Province'].dropna().unique().tolist())
+        provinces = index.provinces
         selected_provinces = st.multiselect("Select Province(s)", provinces, default=[])
         
         # Filter districts based on province
-        if selected_provinces:
-            district_options = sorted(df[df['Province'].isin(selected_provinces)]['District'].dropna().unique().tolist())
-        else:
-            district_options = sorted(df['District'].dropna().unique().tolist())
+        district_options = index_district_options(index, selected_provinces)
             
         selected_districts = st.multiselect("Select District(s)", district_options, default=[])
         
         # Filter DS Divisions based on district
         # Only show DS options if districts are selected to avoid huge lists, 
         # or if specific provinces selected (optional, sticking to District dependency for performance)
-        if selected_districts:
-            ds_options = sorted(df[df['District'].isin(selected_districts)]['DS_Division'].dropna().unique().tolist())
-        elif selected_provinces: # Allow DS selection if Province is selected too
-            ds_options = sorted(df[df['Province'].isin(selected_provinces)]['DS_Division'].dropna().unique().tolist())
-        else:
-            ds_options = [] # Hide DS options if no upper level selected to encourage drill-down.
+        # (Province selection also allows DS selection; with no upper level
+        # selected the list is empty to encourage drill-down.)
+        ds_options = index_ds_options(index, selected_provinces, selected_districts)
             
         if ds_options:
             selected_ds = st.multiselect("Select DS Division(s)", ds_options, default=[])
@@ -437,63 +709,36 @@ def main():
             age_group_options[1:],  # Exclude "All" from multiselect
             default=[]
         )
-        
-        st.markdown("---")
-        st.markdown("### 📊 View Options")
-        show_map = st.toggle("Show Map", value=False) # Default Disabled
-        show_raw_data = st.checkbox("Show Raw Data Table", value=False)
+
+    filters = FilterState.from_widgets(selected_provinces, selected_districts, selected_ds,
+                                       selected_gender, selected_age_groups)
     
     # --- Apply Filters ---
-    filtered_df = df.copy()
-    if selected_provinces:
-        filtered_df = filtered_df[filtered_df['Province'].isin(selected_provinces)]
-    if selected_districts:
-        filtered_df = filtered_df[filtered_df['District'].isin(selected_districts)]
-    if selected_ds:
-        filtered_df = filtered_df[filtered_df['DS_Division'].isin(selected_ds)]
-    
-    # --- Determine display population based on gender/age filters ---
-    # Map age group labels to column names
-    age_group_col_map = {
-        "0-14 (Youth)": "Age_0_14",
-        "15-59 (Working)": "Age_15_59",
-        "60-64": "Age_60_64",
-        "65+ (Elderly)": "Age_65_Plus"
-    }
+    # Index intersection; the full frame is used as-is when nothing is selected
+    with trace.span('filter') as span:
+        rows = select_rows(index, selected_provinces, selected_districts, selected_ds)
+        filtered_df = df if rows is None else df.iloc[rows]
+        span['rows'] = len(filtered_df)
     
-    # Calculate the "display population" based on filters
-    if selected_age_groups:
-        # Sum only selected age group columns
-        age_cols = [age_group_col_map[ag] for ag in selected_age_groups]
-        filtered_df['Display_Population'] = filtered_df[age_cols].sum(axis=1)
-    else:
-        # Use total population when no age filter
-        filtered_df['Display_Population'] = filtered_df['Total_Population']
-    
-    # Apply gender filter (note: gender breakdown by age is not in the dataset, 
-    # so this applies to age "All" or as an approximate indicator)
-    if selected_gender == "Male":
-        # When age groups selected, we can only approximate since we don't have gender x age breakdown
-        if not selected_age_groups:
-            filtered_df['Display_Population'] = filtered_df['Male']
-    elif selected_gender == "Female":
-        if not selected_age_groups:
-            filtered_df['Display_Population'] = filtered_df['Female']
+    # Sums for the current selection come from the pre-aggregated cube
+    age_cols = filters.age_cols
+    with trace.span('totals'):
+        summary = selection_totals(filters)
     
     # --- Key Metrics Row ---
     st.markdown("### 📈 Key Metrics")
     
     # Calculate totals based on gender/age filters
-    total_male = filtered_df['Male'].sum()
-    total_female = filtered_df['Female'].sum()
-    total_pop = filtered_df['Total_Population'].sum()
-    display_pop = filtered_df['Display_Population'].sum()
+    total_male = summary['Male']
+    total_female = summary['Female']
+    total_pop = summary['Total_Population']
+    display_pop = display_population(summary, age_cols, selected_gender)
     
     # Age group sums
-    age_0_14 = filtered_df['Age_0_14'].sum()
-    age_15_59 = filtered_df['Age_15_59'].sum()
-    age_60_64 = filtered_df['Age_60_64'].sum()
-    age_65_plus = filtered_df['Age_65_Plus'].sum()
+    age_0_14 = summary['Age_0_14']
+    age_15_59 = summary['Age_15_59']
+    age_60_64 = summary['Age_60_64']
+    age_65_plus = summary['Age_65_Plus']
     
     # Determine metric labels based on filters
     pop_label = "Total Population"
@@ -569,133 +814,80 @@ def main():
     if selected_age_groups:
         gender_note = "⚠️ Gender breakdown is APPROVED ESTIMATION based on regional sex ratio (actual data unavailable by age)."
     
-    labels = ['Male', 'Female']
-    values = [display_male, display_female]
-    fig_gender = go.Figure(data=[go.Pie(labels=labels, values=values, hole=.5, marker_colors=['#0ea5e9', '#ec4899'])])
-    fig_gender.update_layout(
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font_color='#1e3a5f',
-        legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5),
-        margin=dict(t=30, b=0, l=0, r=0),
-        height=300
-    )
+    def build_gender():
+        labels = ['Male', 'Female']
+        values = [display_male, display_female]
+        fig_gender = go.Figure(data=[go.Pie(labels=labels, values=values, hole=.5, marker_colors=['#0ea5e9', '#ec4899'])])
+        fig_gender.update_layout(
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            font_color='#1e3a5f',
+            legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5),
+            margin=dict(t=30, b=0, l=0, r=0),
+            height=300
+        )
+        return fig_gender
 
-    # 2. Population Structure (Pyramid or Bar)
-    # Determine which age groups are selected for highlighting
-    selected_age_labels = [ag.split(" ")[0] for ag in selected_age_groups] if selected_age_groups else []
-    
-    # Set colors - highlight selected, dim others
-    default_colors = ['#6366f1', '#10b981', '#f59e0b', '#64748b']
-    age_labels = ['0-14', '15-59', '60-64', '65+']
-    
-    if selected_age_groups:
-        # Highlight selected age groups, dim unselected
-        colors = [
-            default_colors[i] if age_labels[i] in selected_age_labels else '#d1d5db'
-            for i in range(4)
-        ]
-    else:
-        colors = default_colors
-    
-    age_df = pd.DataFrame({
-        'Age Group': age_labels,
-        'Population': [age_0_14, age_15_59, age_60_64, age_65_plus],
-        'Selected': [label in selected_age_labels for label in age_labels] if selected_age_groups else [True]*4
-    })
-    
-    fig_age = px.bar(
-        age_df,
-        x='Population',
-        y='Age Group',
-        orientation='h',
-        color='Age Group',
-        color_discrete_sequence=colors,
-        text='Population'
-    )
-    fig_age.update_layout(
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font_color='#1e3a5f',
-        xaxis_title="Population",
-        showlegend=False,
-        height=300,
-        margin=dict(l=0, r=0, t=30, b=0)
-    )
+    def build_age():
+        # 2. Population Structure (Pyramid or Bar)
+        # Determine which age groups are selected for highlighting
+        selected_age_labels = [ag.split(" ")[0] for ag in selected_age_groups] if selected_age_groups else []
+    
+        # Set colors - highlight selected, dim others
+        default_colors = ['#6366f1', '#10b981', '#f59e0b', '#64748b']
+        age_labels = ['0-14', '15-59', '60-64', '65+']
+    
+        if selected_age_groups:
+            # Highlight selected age groups, dim unselected
+            colors = [
+                default_colors[i] if age_labels[i] in selected_age_labels else '#d1d5db'
+                for i in range(4)
+            ]
+        else:
+            colors = default_colors
+    
+        age_df = pd.DataFrame({
+            'Age Group': age_labels,
+            'Population': [age_0_14, age_15_59, age_60_64, age_65_plus],
+            'Selected': [label in selected_age_labels for label in age_labels] if selected_age_groups else [True]*4
+        })
+    
+        fig_age = px.bar(
+            age_df,
+            x='Population',
+            y='Age Group',
+            orientation='h',
+            color='Age Group',
+            color_discrete_sequence=colors,
+            text='Population'
+        )
+        fig_age.update_layout(
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            font_color='#1e3a5f',
+            xaxis_title="Population",
+            showlegend=False,
+            height=300,
+            margin=dict(l=0, r=0, t=30, b=0)
+        )
+        return fig_age
 
-    # --- Dynamic Layout Logic ---
-    if show_map and geojson:
-        # Layout: Map (Left) | Gender (Right) -> Age (Bottom)
-        col_left, col_right = st.columns([1.5, 1])
-        
-        with col_left:
-            st.markdown("### 🗺️ Population Density")
-            
-            # Center map logic
-            center_lat, center_lon = 7.8731, 80.7718 # Default Sri Lanka center
-            zoom = 7
-            
-            # Adjust zoom/center if specific areas are selected
-            if selected_ds and not filtered_df.empty:
-                first_ds = filtered_df[filtered_df['DS_Division'].isin(selected_ds)].iloc[0]
-                # Approximation if Lat/Lon available in DF, else default
-                if 'Latitude' in filtered_df.columns:
-                     center_lat = filtered_df[filtered_df['DS_Division'].isin(selected_ds)]['Latitude'].mean()
-                     center_lon = filtered_df[filtered_df['DS_Division'].isin(selected_ds)]['Longitude'].mean()
-                zoom = 10
-            elif selected_districts and not filtered_df.empty:
-                if 'Latitude' in filtered_df.columns:
-                     center_lat = filtered_df[filtered_df['District'].isin(selected_districts)]['Latitude'].mean()
-                     center_lon = filtered_df[filtered_df['District'].isin(selected_districts)]['Longitude'].mean()
-                zoom = 9
-
-            # Optimization check
-            if len(filtered_df) > 1000 and not selected_districts and not selected_ds:
-                 st.info("⚠️ Large dataset. Filter to improve map performance.")
+    fig_gender = cached_figure('gender', trace, build_gender, asdict(filters))
+    fig_age = cached_figure('age', trace, build_age, filters.selection, filters.age_groups)
 
-            fig_map = px.choropleth_mapbox(
-                filtered_df,
-                geojson=geojson,
-                locations='GN_Link_Key',
-                featureidkey="properties.District_GN_Key",
-                color='Display_Population',
-                mapbox_style="carto-positron",
-                zoom=zoom,
-                center={"lat": center_lat, "lon": center_lon},
-                opacity=0.7,
-                labels={'Display_Population': 'Population'},
-                color_continuous_scale="RdYlGn_r",  # Green (low) to Red (high) density
-            )
-            fig_map.update_layout(
-                margin={"r":0,"t":0,"l":0,"b":0},
-                paper_bgcolor='rgba(0,0,0,0)',
-            )
-            st.plotly_chart(fig_map, use_container_width=True)
-            
-        with col_right:
-            st.markdown("### ⚧ Gender Dist.")
-            if gender_note:
-                st.caption(gender_note)
-            st.plotly_chart(fig_gender, use_container_width=True)
-            
-        # Age Structure (Full Width below Map/Gender)
+    # Layout: Gender (Left) | Age (Right) -> Balanced Grid
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown("### ⚧ Gender Distribution")
+        if gender_note:
+            st.caption(gender_note)
+        plot(fig_gender, trace, 'render_gender')
+    with c2:
         st.markdown("### 👥 Age Structure")
-        st.plotly_chart(fig_age, use_container_width=True)
+        plot(fig_age, trace, 'render_age')
 
-    else:
-        # Layout: Gender (Left) | Age (Right) -> Balanced Grid
-        if show_map and not geojson:
-            st.warning("⚠️ Map data not available.")
-            
-        c1, c2 = st.columns(2)
-        with c1:
-            st.markdown("### ⚧ Gender Distribution")
-            if gender_note:
-                st.caption(gender_note)
-            st.plotly_chart(fig_gender, use_container_width=True)
-        with c2:
-            st.markdown("### 👥 Age Structure")
-            st.plotly_chart(fig_age, use_container_width=True)
+    # --- Map view: its own fragment, only the boundaries covering the selection are loaded ---
+    map_panel(filters, not filtered_df.empty, trace)
     
     # --- District/DS Level Breakdown ---
     st.markdown("---")
@@ -710,138 +902,74 @@ def main():
         if len(selected_provinces) > 3: province_names = f"{len(selected_provinces)} Provinces"
         st.markdown(f"### 📊 District Breakdown in {province_names}")
         
-        breakdown = filtered_df.groupby('District').agg({
-            'Display_Population': 'sum',
-            'Total_Population': 'sum',
-            'Male': 'sum',
-            'Female': 'sum',
-            'Sex_Ratio': 'mean',
-            'Dependency_Ratio': 'mean'
-        }).reset_index().sort_values('Display_Population', ascending=False)
+        with trace.span('breakdown', level='District') as span:
+            breakdown = breakdown_table(filters, 'District').sort_values('Display_Population', ascending=False)
+            span['rows'] = len(breakdown)
         
-        fig_breakdown = px.bar(
-            breakdown,
-            x='District',
-            y='Display_Population',
-            color='Sex_Ratio',
-            color_continuous_scale='Viridis',
-            labels={'Display_Population': 'Population', 'Sex_Ratio': 'Sex Ratio'}
-        )
-        fig_breakdown.update_layout(
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            font_color='#1e3a5f',
-            xaxis=dict(tickangle=-45, gridcolor='#e2e8f0'),
-            yaxis=dict(gridcolor='#e2e8f0')
-        )
-        st.plotly_chart(fig_breakdown, use_container_width=True)
+        def build_breakdown():
+            fig_breakdown = px.bar(
+                breakdown,
+                x='District',
+                y='Display_Population',
+                color='Sex_Ratio',
+                color_continuous_scale='Viridis',
+                labels={'Display_Population': 'Population', 'Sex_Ratio': 'Sex Ratio'}
+            )
+            fig_breakdown.update_layout(
+                paper_bgcolor='rgba(0,0,0,0)',
+                plot_bgcolor='rgba(0,0,0,0)',
+                font_color='#1e3a5f',
+                xaxis=dict(tickangle=-45, gridcolor='#e2e8f0'),
+                yaxis=dict(gridcolor='#e2e8f0')
+            )
+            return fig_breakdown
+
+        fig_breakdown = cached_figure('breakdown', trace, build_breakdown, asdict(filters), 'District')
+        plot(fig_breakdown, trace, 'render_breakdown')
     
     elif selected_districts and not selected_ds:
         district_names = ", ".join(selected_districts)
         if len(selected_districts) > 3: district_names = f"{len(selected_districts)} Districts"
         st.markdown(f"### 📊 DS Division Breakdown in {district_names}")
         
-        breakdown = filtered_df.groupby('DS_Division').agg({
-            'Display_Population': 'sum',
-            'Total_Population': 'sum',
-            'Male': 'sum',
-            'Female': 'sum',
-            'Sex_Ratio': 'mean',
-            'Dependency_Ratio': 'mean'
-        }).reset_index().sort_values('Display_Population', ascending=False)
+        with trace.span('breakdown', level='DS_Division') as span:
+            breakdown = breakdown_table(filters, 'DS_Division').sort_values('Display_Population', ascending=False)
+            span['rows'] = len(breakdown)
         
         # Limit if too many
         if len(breakdown) > 30:
             st.caption(f"Showing Top 30 of {len(breakdown)} DS Divisions")
             breakdown = breakdown.head(30)
             
-        fig_breakdown = px.bar(
-            breakdown,
-            x='DS_Division',
-            y='Display_Population',
-            color='Dependency_Ratio',
-            color_continuous_scale='Viridis',
-            labels={'Display_Population': 'Population', 'Dependency_Ratio': 'Dependency %'}
-        )
-        fig_breakdown.update_layout(
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            font_color='#1e3a5f',
-            xaxis=dict(tickangle=-45, gridcolor='#e2e8f0'),
-            yaxis=dict(gridcolor='#e2e8f0')
-        )
-        st.plotly_chart(fig_breakdown, use_container_width=True)
+        def build_breakdown():
+            fig_breakdown = px.bar(
+                breakdown,
+                x='DS_Division',
+                y='Display_Population',
+                color='Dependency_Ratio',
+                color_continuous_scale='Viridis',
+                labels={'Display_Population': 'Population', 'Dependency_Ratio': 'Dependency %'}
+            )
+            fig_breakdown.update_layout(
+                paper_bgcolor='rgba(0,0,0,0)',
+                plot_bgcolor='rgba(0,0,0,0)',
+                font_color='#1e3a5f',
+                xaxis=dict(tickangle=-45, gridcolor='#e2e8f0'),
+                yaxis=dict(gridcolor='#e2e8f0')
+            )
+            return fig_breakdown
+
+        fig_breakdown = cached_figure('breakdown', trace, build_breakdown, asdict(filters), 'DS_Division')
+        plot(fig_breakdown, trace, 'render_breakdown')
     
     else:
         # Default Overview (No filters OR Deepest filters active)
         # Included new Drill-down logic logic from previous turn
         
-        st.markdown("### 🗺️ Census Overview")
-        
-        view_level = st.radio(
-            "Categorize by:",
-            ["Province", "District", "DS Division"],
-            horizontal=True,
-            key="overview_view_level"
-        )
-        
-        col_map = {
-            "Province": "Province",
-            "District": "District",
-            "DS Division": "DS_Division"
-        }
-        
-        group_col = col_map[view_level]
-        
-        # Aggregation - use filtered_df with Display_Population for proper filter response
-        overview_data = filtered_df.groupby(group_col).agg({
-            'Display_Population': 'sum',
-            'Total_Population': 'sum',
-            'Male': 'sum',
-            'Female': 'sum'
-        }).reset_index().sort_values('Display_Population', ascending=True)
-        
-        # Limit for DS Division to avoid overcrowding
-        if view_level == "DS Division":
-            # Showing top 20 for readability
-            st.caption("Showing Top 20 DS Divisions by Population")
-            overview_data = overview_data.tail(20)
-            
-        fig_province = px.bar(
-            overview_data,
-            y=group_col,
-            x='Display_Population',
-            orientation='h',
-            color='Display_Population',
-            color_continuous_scale='Viridis',
-            labels={'Display_Population': 'Population', group_col: view_level}
-        )
-        
-        fig_province.update_layout(
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            font_color='#1e3a5f',
-            xaxis=dict(gridcolor='#e2e8f0'),
-            yaxis=dict(gridcolor='#e2e8f0'),
-            showlegend=False,
-            height=500 + (200 if view_level == "District" else 0) # Taller for Districts
-        )
-        st.plotly_chart(fig_province, use_container_width=True)
+        overview_panel(filters, trace)
     
     # --- Raw Data Table ---
-    if show_raw_data:
-        st.markdown("---")
-        st.markdown("### 📋 Raw Data")
-        display_cols = ['Province', 'District', 'DS_Division', 'GN_Division', 
-                       'Total_Population', 'Male', 'Female', 'Sex_Ratio',
-                       'Age_0_14', 'Age_15_59', 'Age_60_64', 'Age_65_Plus', 'Dependency_Ratio']
-        available_cols = [c for c in display_cols if c in filtered_df.columns]
-        st.dataframe(
-            filtered_df[available_cols].head(100),
-            use_container_width=True,
-            height=400
-        )
-        st.caption(f"Showing {min(100, len(filtered_df))} of {len(filtered_df)} records")
+    raw_table_panel(filtered_df, trace)
     
     # --- Footer ---
     st.markdown("---")
@@ -852,6 +980,20 @@ def main():
     </div>
     """, unsafe_allow_html=True)
 
+    # --- Instrumentation: one record per rerun ---
+    if trace.enabled:
+        record = trace.to_record(
+            provinces=len(selected_provinces), districts=len(selected_districts), ds_divisions=len(selected_ds),
+            gender=selected_gender, age_groups=selected_age_groups,
+            show_map=st.session_state.get('show_map', False),
+        )
+        dashboard_metrics.publish(record)
+        history = st.session_state.setdefault('metrics_history', [])
+        history.append(record)
+        del history[:-50]
+        if admin:
+            admin_panel(trace, history)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,126 @@
+"""
+Per-rerun instrumentation for the Streamlit dashboard.
+main() wraps each stage (loading, filtering, aggregation, figure building,
+chart rendering) in a named timing span carrying row counts and payload
+sizes. A rerun's spans can be:
+  - appended as one JSON line per rerun to a log file (CENSUS_METRICS_LOG=path),
+  - served as JSON from a local endpoint (CENSUS_METRICS_PORT=port, then
+    GET http://127.0.0.1:<port>/metrics for the most recent reruns),
+  - shown in an admin-only sidebar panel: set CENSUS_ADMIN_TOKEN and open
+    the dashboard with ?admin=<token>.
+With none of these set, spans are still timed (a perf_counter call each)
+but payload sizes are not computed and nothing is published.
+"""
+import hmac
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOG_ENV = 'CENSUS_METRICS_LOG'
+PORT_ENV = 'CENSUS_METRICS_PORT'
+ADMIN_TOKEN_ENV = 'CENSUS_ADMIN_TOKEN'
+
+# Reruns kept in memory for the endpoint (all sessions of this process)
+RECENT_RERUNS = 200
+
+_recent = deque(maxlen=RECENT_RERUNS)
+_lock = threading.Lock()
+
+
+class RerunTrace:
+    """Named timing spans for one dashboard rerun."""
+
+    def __init__(self, enabled=False, session=None):
+        self.enabled = enabled
+        self.session = session
+        self.rerun_id = uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.spans = []
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Time the enclosed block; attributes can be added to the yielded dict."""
+        record = {'name': name, **attrs}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['ms'] = round((time.perf_counter() - start) * 1000, 3)
+            self.spans.append(record)
+
+    def total_ms(self):
+        return round((time.perf_counter() - self._start) * 1000, 3)
+
+    def to_record(self, **context):
+        """Structured log record for this rerun."""
+        return {
+            'rerun_id': self.rerun_id,
+            'session': self.session,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+            'total_ms': self.total_ms(),
+            **context,
+            'spans': self.spans,
+        }
+
+
+def metrics_enabled():
+    """True if reruns are logged or served (the admin panel enables tracing separately)."""
+    return bool(os.environ.get(LOG_ENV) or os.environ.get(PORT_ENV))
+
+
+def is_admin(query_params):
+    """Admin panel access: ?admin=<token> must match CENSUS_ADMIN_TOKEN."""
+    token = os.environ.get(ADMIN_TOKEN_ENV)
+    given = query_params.get('admin')
+    return bool(token) and given is not None and hmac.compare_digest(str(given), token)
+
+
+def figure_bytes(fig):
+    """Size of a Plotly figure's JSON, i.e. what the browser receives."""
+    return len(fig.to_json())
+
+
+def publish(record):
+    """Keep a rerun record for the endpoint and append it to the log file."""
+    with _lock:
+        _recent.append(record)
+        path = os.environ.get(LOG_ENV)
+        if path:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, default=str) + '\n')
+
+
+def recent(limit=None):
+    """Most recent rerun records, oldest first."""
+    with _lock:
+        records = list(_recent)
+    return records[-limit:] if limit else records
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = json.dumps(recent(), default=str).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_endpoint(port):
+    """Serve recent() on 127.0.0.1:<port>/metrics from a daemon thread."""
+    server = ThreadingHTTPServer(('127.0.0.1', int(port)), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,229 @@
+"""
+Bounded LRU cache of built Plotly figures for the dashboard.
+Figures are keyed by a canonical description of what they show (figure
+name, filter state, view options, data version), so the same view built
+by any session is reused instead of going through px/go again. The cache
+is bounded by total figure size (the JSON the browser receives, estimated
+from a sample of each long array rather than by serializing the figure)
+and entry count. It can be backed by a directory of figure JSON files that
+survives restarts (CENSUS_FIGURE_CACHE_DIR=path), itself an LRU bounded by
+CENSUS_FIGURE_CACHE_DISK_MB; figures are only serialized when written
+there. Hit/miss counts are kept for the dashboard's admin panel and
+metrics records.
+
+Cached figures are shared: callers must not modify them.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import plotly.io as pio
+
+DIR_ENV = 'CENSUS_FIGURE_CACHE_DIR'
+SIZE_ENV = 'CENSUS_FIGURE_CACHE_MB'
+DISK_SIZE_ENV = 'CENSUS_FIGURE_CACHE_DISK_MB'
+
+MAX_MB = 128
+MAX_ENTRIES = 512
+MAX_DISK_MB = 1024
+
+# Trace properties that carry the data (the rest is small styling)
+DATA_PROPS = ('x', 'y', 'z', 'text', 'values', 'labels', 'locations', 'geojson', 'lat', 'lon',
+              'customdata', 'hovertext', 'ids')
+
+# Elements measured per long sequence when estimating sizes
+SAMPLE = 16
+
+
+def figure_key(*parts):
+    """Stable hex key for JSON-serializable key parts (tuples and lists are equivalent)."""
+    text = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _json_size(value):
+    """Approximate JSON length of a value; long sequences are measured on an even sample and scaled."""
+    if isinstance(value, dict):
+        return 2 + sum(len(str(k)) + 4 + _json_size(v) for k, v in value.items())
+    if isinstance(value, np.ndarray):
+        value = value.ravel()
+    if isinstance(value, (list, tuple, np.ndarray)):
+        n = len(value)
+        if n == 0:
+            return 2
+        sample = value if n <= SAMPLE else value[::n // SAMPLE][:SAMPLE]
+        if isinstance(sample, np.ndarray):
+            sample = sample.tolist()
+        return 2 + round(sum(_json_size(v) + 1 for v in sample) * n / len(sample))
+    if isinstance(value, str):
+        return len(value) + 2
+    return len(repr(value))
+
+
+def estimate_size(fig):
+    """Approximate size of a figure's JSON without serializing it (data properties and layout)."""
+    size = _json_size(fig.layout.to_plotly_json())
+    for trace in fig.data:
+        size += sum(_json_size(trace[p]) for p in DATA_PROPS if p in trace and trace[p] is not None)
+    return size
+
+
+class FigureCache:
+    """Thread-safe LRU of figures bounded by total JSON size and entry count."""
+
+    def __init__(self, max_bytes=MAX_MB * 1_000_000, max_entries=MAX_ENTRIES, disk_dir=None,
+                 max_disk_bytes=MAX_DISK_MB * 1_000_000):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._entries = OrderedDict()  # key -> (figure, size in bytes)
+        self._bytes = 0
+        self._disk = OrderedDict()     # key -> file size, least recently used first
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.disk_hits = self.misses = self.evictions = self.disk_evictions = 0
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._scan_disk()
+
+    def get_or_build(self, key, build):
+        """
+        (figure, source) for `key`: from memory ('hit'), from the disk store
+        ('disk') or from build() ('miss', called outside the lock).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0], 'hit'
+
+        text = self._read_disk(key)
+        fig = self._parse(text) if text is not None else None
+        if fig is not None:
+            source, size = 'disk', len(text)
+        else:
+            fig, source = build(), 'miss'
+            size = estimate_size(fig)
+            if self.disk_dir:
+                self._write_disk(key, fig.to_json())
+        with self._lock:
+            if source == 'disk':
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+        self._put(key, fig, size)
+        return fig, source
+
+    def _put(self, key, fig, size):
+        with self._lock:
+            if size > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (fig, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def _disk_path(self, key):
+        return self.disk_dir / f"{key}.json"
+
+    def _scan_disk(self):
+        """Index the figures already on disk, oldest modification first."""
+        files = []
+        for path in self.disk_dir.glob('*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime_ns, path.stem, stat.st_size))
+        for _, key, size in sorted(files):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._evict_disk()
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            text = path.read_text(encoding='utf-8')
+            os.utime(path)  # recency survives restarts
+        except OSError:
+            return None
+        with self._lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+        return text
+
+    @staticmethod
+    def _parse(text):
+        try:
+            return pio.from_json(text)
+        except ValueError:
+            # Truncated or from an incompatible Plotly version: rebuild
+            return None
+
+    def _write_disk(self, key, text):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp.write_text(text, encoding='utf-8')
+            os.replace(tmp, path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            return
+        size = len(text.encode('utf-8'))
+        with self._lock:
+            self._disk_bytes += size - self._disk.pop(key, 0)
+            self._disk[key] = size
+            self._evict_disk()
+
+    def _evict_disk(self):
+        """Delete least recently used figure files over the disk budget (lock held or during init)."""
+        while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self.disk_evictions += 1
+            self._disk_path(key).unlink(missing_ok=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Entry count, size and hit/miss counters since start."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'mb': round(self._bytes / 1e6, 2),
+                'max_mb': round(self.max_bytes / 1e6, 2),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'disk_mb': round(self._disk_bytes / 1e6, 2),
+                'disk_evictions': self.disk_evictions,
+                'hit_rate': round((self.hits + self.disk_hits) / lookups, 3) if lookups else None,
+            }
+
+
+def from_env():
+    """FigureCache configured from CENSUS_FIGURE_CACHE_MB / _DIR / _DISK_MB."""
+    max_mb = float(os.environ.get(SIZE_ENV) or MAX_MB)
+    max_disk_mb = float(os.environ.get(DISK_SIZE_ENV) or MAX_DISK_MB)
+    return FigureCache(max_bytes=int(max_mb * 1_000_000), disk_dir=os.environ.get(DIR_ENV) or None,
+                       max_disk_bytes=int(max_disk_mb * 1_000_000))
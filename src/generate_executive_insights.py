@@ -1,34 +1,15 @@
 
-import pandas as pd
-import numpy as np
+import profiling
+from census_store import load_census
 
-def clean_and_load_data(file_path):
-    # Load dataset, skipping the first 10 rows to get to the header row
-    # The header is actually spread across rows, but row 10 (0-indexed) seems to have the main structure for data reading
-    # Let's read without header first to control it manually
-    df = pd.read_csv(file_path, header=None, skiprows=11)
-    
-    # Define columns based on visual inspection of the CSV structure
-    # 0: Province Code, 1: Province Name, 2: District Code, 3: District Name
-    # 13: 0-14, 14: 15-59, 15: 60-64, 16: 65+
-    
-    df.columns = [
-        'Province_Code', 'Province_Name', 'District_Code', 'District_Name',
-        'DS_Code', 'DS_Name', 'GN_Code', 'GN_Name', 'GN_Number',
-        'Total_Pop_Sex', 'Male', 'Female', 
-        'Total_Pop_Age', 'Age_0_14', 'Age_15_59', 'Age_60_64', 'Age_65_Plus'
-    ]
-    
-    # Convert numerical columns to numeric, coercing errors to NaN
-    cols_to_numeric = ['Total_Pop_Sex', 'Age_0_14', 'Age_15_59', 'Age_60_64', 'Age_65_Plus']
-    for col in cols_to_numeric:
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-        
-    return df
+def load_data():
+    # Project only the columns the district metrics need from the census store
+    df = load_census(columns=['District', 'Total_Population', 'Age_0_14', 'Age_15_59', 'Age_60_64', 'Age_65_Plus'])
+    return df.rename(columns={'District': 'District_Name', 'Total_Population': 'Total_Pop_Sex'})
 
 def calculate_district_metrics(df):
     # Group by District
-    district_df = df.groupby('District_Name')[['Total_Pop_Sex', 'Age_0_14', 'Age_15_59', 'Age_60_64', 'Age_65_Plus']].sum().reset_index()
+    district_df = df.groupby('District_Name', observed=True)[['Total_Pop_Sex', 'Age_0_14', 'Age_15_59', 'Age_60_64', 'Age_65_Plus']].sum().reset_index()
     
     # Calculate Derived Metrics
     district_df['Pop_60_Plus'] = district_df['Age_60_64'] + district_df['Age_65_Plus']
@@ -84,7 +65,9 @@ def print_strategic_insights(district_df):
 
 
 if __name__ == "__main__":
-    file_path = 'data/raw/GN_population_excel.csv'
-    df = clean_and_load_data(file_path)
-    district_metrics = calculate_district_metrics(df)
-    print_strategic_insights(district_metrics)
+    with profiling.stage('load'):
+        df = load_data()
+    with profiling.stage('groupby'):
+        district_metrics = calculate_district_metrics(df)
+    with profiling.stage('write_report'):
+        print_strategic_insights(district_metrics)
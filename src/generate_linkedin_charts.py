@@ -5,6 +5,8 @@ import pandas as pd
 import numpy as np
 import os
 
+import profiling
+
 # Create output directory
 os.makedirs("output/linkedin_visuals", exist_ok=True)
 
@@ -31,21 +33,23 @@ sns.set_theme(style="whitegrid")
 # plt.rcParams['font.sans-serif'] = ['Arial']
 
 # 1. Population Comparison
-plt.figure(figsize=(10, 6))
-ax = sns.barplot(x='District', y='Population', data=df, palette=['#1f77b4', '#ff7f0e'])
-plt.title('Total Population: Colombo vs Trincomalee (2024)', fontsize=16, weight='bold')
-plt.ylabel('Population (Millions)', fontsize=12)
-# Format y-axis to M
-def millions_formatter(x, pos):
-    return f'{x/1e6:.1f}M'
-from matplotlib.ticker import FuncFormatter
-ax.yaxis.set_major_formatter(FuncFormatter(millions_formatter))
-
-for i, v in enumerate(df['Population']):
-    ax.text(i, v + 50000, f"{v:,.0f}", ha='center', fontsize=12, weight='bold')
-plt.tight_layout()
-plt.savefig('output/linkedin_visuals/01_population_comparison.png', dpi=300)
-plt.close()
+with profiling.stage('render 01_population_comparison'):
+    plt.figure(figsize=(10, 6))
+    ax = sns.barplot(x='District', y='Population', data=df, palette=['#1f77b4', '#ff7f0e'])
+    plt.title('Total Population: Colombo vs Trincomalee (2024)', fontsize=16, weight='bold')
+    plt.ylabel('Population (Millions)', fontsize=12)
+    # Format y-axis to M
+    def millions_formatter(x, pos):
+        return f'{x/1e6:.1f}M'
+    from matplotlib.ticker import FuncFormatter
+    ax.yaxis.set_major_formatter(FuncFormatter(millions_formatter))
+
+    for i, v in enumerate(df['Population']):
+        ax.text(i, v + 50000, f"{v:,.0f}", ha='center', fontsize=12, weight='bold')
+    plt.tight_layout()
+with profiling.stage('save 01_population_comparison'):
+    plt.savefig('output/linkedin_visuals/01_population_comparison.png', dpi=300)
+    plt.close()
 
 # 2. Age Structure (Side-by-side bar)
 age_long = pd.melt(df, id_vars=['District'], value_vars=['Age_0_to_14', 'Age_15_to_59', 'Age_60_plus'],
@@ -57,18 +61,20 @@ age_long['Age Group'] = age_long['Age Group'].replace({
     'Age_60_plus': '60+ (Elderly)'
 })
 
-plt.figure(figsize=(10, 6))
-ax = sns.barplot(x='Age Group', y='Percentage', hue='District', data=age_long, palette=['#1f77b4', '#ff7f0e'])
-plt.title('Age Structure: Colombo vs Trincomalee', fontsize=16, weight='bold')
-plt.ylabel('Percentage (%)', fontsize=12)
-plt.legend(title='District')
+with profiling.stage('render 02_age_structure'):
+    plt.figure(figsize=(10, 6))
+    ax = sns.barplot(x='Age Group', y='Percentage', hue='District', data=age_long, palette=['#1f77b4', '#ff7f0e'])
+    plt.title('Age Structure: Colombo vs Trincomalee', fontsize=16, weight='bold')
+    plt.ylabel('Percentage (%)', fontsize=12)
+    plt.legend(title='District')
 
-for container in ax.containers:
-    ax.bar_label(container, fmt='%.1f%%', padding=3, fontsize=10)
+    for container in ax.containers:
+        ax.bar_label(container, fmt='%.1f%%', padding=3, fontsize=10)
 
-plt.tight_layout()
-plt.savefig('output/linkedin_visuals/02_age_structure.png', dpi=300)
-plt.close()
+    plt.tight_layout()
+with profiling.stage('save 02_age_structure'):
+    plt.savefig('output/linkedin_visuals/02_age_structure.png', dpi=300)
+    plt.close()
 
 
 # 3. Dependency Ratios
@@ -79,18 +85,20 @@ dep_long['Dependency Type'] = dep_long['Dependency Type'].replace({
     'Old_Age_Dependency': 'Old Age (60+)'
 })
 
-plt.figure(figsize=(10, 6))
-ax = sns.barplot(x='Dependency Type', y='Ratio', hue='District', data=dep_long, palette=['#1f77b4', '#ff7f0e'])
-plt.title('Dependency Ratios (Per 100 Working-Age People)', fontsize=16, weight='bold')
-plt.ylabel('Ratio', fontsize=12)
-plt.legend(title='District')
+with profiling.stage('render 03_dependency_ratios'):
+    plt.figure(figsize=(10, 6))
+    ax = sns.barplot(x='Dependency Type', y='Ratio', hue='District', data=dep_long, palette=['#1f77b4', '#ff7f0e'])
+    plt.title('Dependency Ratios (Per 100 Working-Age People)', fontsize=16, weight='bold')
+    plt.ylabel('Ratio', fontsize=12)
+    plt.legend(title='District')
 
-for container in ax.containers:
-    ax.bar_label(container, fmt='%.1f', padding=3, fontsize=10)
+    for container in ax.containers:
+        ax.bar_label(container, fmt='%.1f', padding=3, fontsize=10)
 
-plt.tight_layout()
-plt.savefig('output/linkedin_visuals/03_dependency_ratios.png', dpi=300)
-plt.close()
+    plt.tight_layout()
+with profiling.stage('save 03_dependency_ratios'):
+    plt.savefig('output/linkedin_visuals/03_dependency_ratios.png', dpi=300)
+    plt.close()
 
 # 4. Priority Scores
 prio_long = pd.melt(df, id_vars=['District'], value_vars=['School_Priority_Raw', 'ElderCare_Priority_Raw'],
@@ -100,17 +108,19 @@ prio_long['Priority Type'] = prio_long['Priority Type'].replace({
     'ElderCare_Priority_Raw': 'Elder Care Priority'
 })
 
-plt.figure(figsize=(10, 6))
-ax = sns.barplot(x='Priority Type', y='Score', hue='District', data=prio_long, palette=['#1f77b4', '#ff7f0e'])
-plt.title('Priority Index Scores: Infrastructure Needs', fontsize=16, weight='bold')
-plt.ylabel('Priority Score (Normalized)', fontsize=12)
-plt.legend(title='District')
+with profiling.stage('render 04_priority_comparison'):
+    plt.figure(figsize=(10, 6))
+    ax = sns.barplot(x='Priority Type', y='Score', hue='District', data=prio_long, palette=['#1f77b4', '#ff7f0e'])
+    plt.title('Priority Index Scores: Infrastructure Needs', fontsize=16, weight='bold')
+    plt.ylabel('Priority Score (Normalized)', fontsize=12)
+    plt.legend(title='District')
 
-for container in ax.containers:
-    ax.bar_label(container, fmt='%.1f', padding=3, fontsize=10)
+    for container in ax.containers:
+        ax.bar_label(container, fmt='%.1f', padding=3, fontsize=10)
 
-plt.tight_layout()
-plt.savefig('output/linkedin_visuals/04_priority_comparison.png', dpi=300)
-plt.close()
+    plt.tight_layout()
+with profiling.stage('save 04_priority_comparison'):
+    plt.savefig('output/linkedin_visuals/04_priority_comparison.png', dpi=300)
+    plt.close()
 
 print("Charts generated successfully in output/linkedin_visuals/")
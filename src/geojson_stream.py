@@ -0,0 +1,149 @@
+"""
+Incremental GeoJSON feature reader.
+Decodes one feature at a time from a FeatureCollection with
+json.JSONDecoder.raw_decode over a sliding text buffer, so memory stays
+bounded by the largest single feature rather than the whole file and the
+first features are available immediately.
+
+iter_features_range() decodes only the features that start inside a byte
+range, so worker processes can each parse their own shard of one file.
+"""
+import codecs
+import json
+import os
+import re
+
+CHUNK_CHARS = 1 << 20
+
+# Opening of a top-level feature object (nested geometries have other types)
+FEATURE_START = re.compile(r'\{\s*"type"\s*:\s*"Feature"\s*[,}]')
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def iter_features(path, chunk_chars=CHUNK_CHARS):
+    """Yield the features of a GeoJSON FeatureCollection one by one."""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buf = ''
+        eof = False
+
+        def fill():
+            nonlocal buf, eof
+            chunk = f.read(chunk_chars)
+            if not chunk:
+                eof = True
+            buf += chunk
+
+        # Find the opening bracket of the "features" array
+        start = -1
+        while start < 0:
+            key = buf.find('"features"')
+            if key >= 0:
+                start = buf.find('[', key)
+            if start < 0:
+                if eof:
+                    raise ValueError(f"{path}: no 'features' array found")
+                fill()
+        pos = start + 1
+
+        while True:
+            # Skip separators between features
+            while True:
+                while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos < len(buf) or eof:
+                    break
+                fill()
+            if pos >= len(buf) or buf[pos] == ']':
+                return
+
+            try:
+                feature, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # Feature continues past the buffer: drop consumed text and read on
+                buf, pos = buf[pos:], 0
+                fill()
+                continue
+            yield feature
+            pos = end
+            if pos > chunk_chars:
+                buf, pos = buf[pos:], 0
+
+
+def batched(features, batch_size=2000):
+    """Group an iterable of features into lists of up to `batch_size`."""
+    batch = []
+    for feature in features:
+        batch.append(feature)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_batches(path, batch_size=2000):
+    """Yield lists of up to `batch_size` features."""
+    yield from batched(iter_features(path), batch_size)
+
+
+def shard_ranges(path, n_shards):
+    """Split a file into `n_shards` contiguous byte ranges [(start, end), ...]."""
+    size = os.path.getsize(path)
+    n_shards = max(1, min(n_shards, size))
+    bounds = [size * i // n_shards for i in range(n_shards + 1)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def iter_features_range(path, start, end, chunk_bytes=CHUNK_CHARS):
+    """
+    Yield the features whose opening brace lies in bytes [start, end).
+    Consecutive ranges from shard_ranges() therefore yield every feature
+    exactly once. Feature starts are located with FEATURE_START, which
+    assumes "type" is the first key of each feature (as written by json.dump,
+    GDAL and geoBoundaries).
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    with open(path, 'rb') as f:
+        f.seek(start)
+        # Characters before `limit` were decoded from bytes before `end`
+        buf = utf8.decode(f.read(end - start))
+        limit = len(buf)
+        eof = False
+
+        def fill():
+            nonlocal buf, eof
+            chunk = f.read(chunk_bytes)
+            if not chunk:
+                eof = True
+            buf += utf8.decode(chunk, final=not chunk)
+
+        # Look ahead so a feature opening that straddles `end` still matches
+        fill()
+        match = FEATURE_START.search(buf)
+        if match is None or match.start() >= limit:
+            return
+        pos = match.start()
+
+        while True:
+            try:
+                feature, stop = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                buf, limit, pos = buf[pos:], limit - pos, 0
+                fill()
+                continue
+            yield feature
+
+            pos = SEPARATORS.match(buf, stop).end()
+            while pos == len(buf) and not eof:
+                fill()
+                pos = SEPARATORS.match(buf, pos).end()
+            if pos >= limit or pos >= len(buf) or buf[pos] == ']':
+                return
+            if pos > chunk_bytes:
+                buf, limit, pos = buf[pos:], limit - pos, 0
@@ -0,0 +1,280 @@
+"""
+Vectorized geometry helpers for the GN boundary features.
+All rings of all features are flattened into one contiguous coordinate array
+with offset indices, so centroids, bounding boxes and distances for the
+~14k GN polygons are computed in a handful of batched NumPy operations.
+"""
+from dataclasses import dataclass
+from itertools import chain
+
+import numpy as np
+
+# Approximate district centers (lat, lon), keyed by upper-case district name;
+# used by the position verifier and the synthetic boundary generator
+DISTRICT_CENTERS = {
+    'COLOMBO': (6.93, 79.85),
+    'GAMPAHA': (7.09, 80.00),
+    'KALUTARA': (6.58, 79.96),
+    'KANDY': (7.29, 80.64),
+    'MATALE': (7.47, 80.62),
+    'NUWARA ELIYA': (6.97, 80.78),
+    'GALLE': (6.05, 80.22),
+    'MATARA': (5.95, 80.54),
+    'HAMBANTOTA': (6.12, 81.12),
+    'JAFFNA': (9.66, 80.01),
+    'KILINOCHCHI': (9.38, 80.40),
+    'MANNAR': (8.98, 79.90),
+    'MULLAITIVU': (9.27, 80.81),
+    'VAVUNIYA': (8.75, 80.50),
+    'TRINCOMALEE': (8.57, 81.23),
+    'BATTICALOA': (7.73, 81.70),
+    'AMPARA': (7.30, 81.67),
+    'KURUNEGALA': (7.49, 80.36),
+    'PUTTALAM': (8.03, 79.83),
+    'ANURADHAPURA': (8.31, 80.41),
+    'POLONNARUWA': (7.94, 81.00),
+    'BADULLA': (6.99, 81.05),
+    'MONARAGALA': (6.87, 81.35),
+    'RATNAPURA': (6.68, 80.40),
+    'KEGALLE': (7.25, 80.35),
+}
+
+# Alternative spellings found in the census tables
+DISTRICT_ALIASES = {
+    'MONERAGALA': 'MONARAGALA',
+}
+
+
+@dataclass
+class FlatGeometry:
+    """Contiguous ring storage for a list of GeoJSON features."""
+    coords: np.ndarray          # (V, 2) float64 [lon, lat] for every vertex
+    ring_offsets: np.ndarray    # (R + 1,) start of each ring in coords
+    ring_feature: np.ndarray    # (R,) feature index owning each ring
+    ring_is_hole: np.ndarray    # (R,) True for interior rings
+    feature_offsets: np.ndarray  # (F + 1,) first ring of each feature
+
+    @property
+    def n_features(self):
+        return len(self.feature_offsets) - 1
+
+    @property
+    def n_rings(self):
+        return len(self.ring_offsets) - 1
+
+
+def _polygons(geom):
+    """Yield polygons (lists of rings) of a Polygon/MultiPolygon geometry."""
+    if not geom:
+        return
+    coords = geom.get('coordinates') or []
+    if geom.get('type') == 'Polygon':
+        yield coords
+    elif geom.get('type') == 'MultiPolygon':
+        yield from coords
+
+
+def flatten_features(features):
+    """Flatten every ring of every feature into a FlatGeometry."""
+    rings = []
+    ring_is_hole = []
+    ring_feature = []
+    feature_ring_counts = [0] * len(features)
+
+    for i, feature in enumerate(features):
+        for polygon in _polygons(feature.get('geometry')):
+            for r, ring in enumerate(polygon):
+                if not ring:
+                    continue
+                rings.append(ring)
+                ring_is_hole.append(r > 0)
+                ring_feature.append(i)
+                feature_ring_counts[i] += 1
+
+    ring_lengths = np.fromiter(map(len, rings), dtype=np.int64, count=len(rings))
+    n_vertices = int(ring_lengths.sum())
+    if rings and len(rings[0][0]) != 2:
+        # Drop Z/M ordinates so the flat buffer stays (lon, lat) pairs
+        rings = [[p[:2] for p in ring] for ring in rings]
+    coords = np.fromiter(
+        chain.from_iterable(chain.from_iterable(rings)), dtype=np.float64, count=2 * n_vertices
+    ).reshape(-1, 2)
+
+    ring_offsets = np.zeros(len(rings) + 1, dtype=np.int64)
+    np.cumsum(ring_lengths, out=ring_offsets[1:])
+    feature_offsets = np.zeros(len(features) + 1, dtype=np.int64)
+    np.cumsum(feature_ring_counts, out=feature_offsets[1:])
+
+    return FlatGeometry(
+        coords=coords,
+        ring_offsets=ring_offsets,
+        ring_feature=np.asarray(ring_feature, dtype=np.int64),
+        ring_is_hole=np.asarray(ring_is_hole, dtype=bool),
+        feature_offsets=feature_offsets,
+    )
+
+
+def _segment_sums(flat, values):
+    """Sum a per-vertex array over each ring (rings are contiguous)."""
+    out = np.zeros(flat.n_rings)
+    lengths = np.diff(flat.ring_offsets)
+    has = lengths > 0
+    if has.any():
+        out[has] = np.add.reduceat(values, flat.ring_offsets[:-1][has])
+    return out
+
+
+def _edge_terms(flat):
+    """
+    Per-vertex shoelace terms for the edge leaving each vertex, wrapping at
+    the end of each ring (a no-op for properly closed GeoJSON rings).
+    Returns (x, x_next, y, y_next, cross).
+    """
+    x, y = flat.coords[:, 0], flat.coords[:, 1]
+    x_next = np.empty_like(x)
+    y_next = np.empty_like(y)
+    x_next[:-1], y_next[:-1] = x[1:], y[1:]
+    last = flat.ring_offsets[1:] - 1
+    x_next[last] = x[flat.ring_offsets[:-1]]
+    y_next[last] = y[flat.ring_offsets[:-1]]
+    cross = x * y_next - x_next * y
+    return x, x_next, y, y_next, cross
+
+
+def ring_areas(flat):
+    """Signed shoelace area of every ring (in squared degrees)."""
+    *_, cross = _edge_terms(flat)
+    return 0.5 * _segment_sums(flat, cross)
+
+
+def centroids(flat):
+    """
+    True area-weighted centroid of each feature, holes subtracted.
+    Returns (F, 2) [lat, lon]; NaN for features without geometry. Degenerate
+    (zero-area) features fall back to the mean of their vertices.
+    """
+    n = flat.n_features
+    out = np.full((n, 2), np.nan)
+    if not len(flat.coords):
+        return out
+
+    x, x_next, y, y_next, cross = _edge_terms(flat)
+    area2 = _segment_sums(flat, cross)
+    cx6 = _segment_sums(flat, (x + x_next) * cross)
+    cy6 = _segment_sums(flat, (y + y_next) * cross)
+
+    # Orientation is not reliable in the source data: weight each ring by
+    # |area| and subtract interior rings explicitly. The sign of the ring's
+    # own area cancels out of cx6 / area2.
+    abs_area = np.abs(area2) / 2
+    ring_w = np.where(flat.ring_is_hole, -abs_area, abs_area)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ring_cx = np.where(area2 != 0, cx6 / (3 * area2), 0.0)
+        ring_cy = np.where(area2 != 0, cy6 / (3 * area2), 0.0)
+
+    w = np.bincount(flat.ring_feature, weights=ring_w, minlength=n)
+    mx = np.bincount(flat.ring_feature, weights=ring_w * ring_cx, minlength=n)
+    my = np.bincount(flat.ring_feature, weights=ring_w * ring_cy, minlength=n)
+
+    # Vertex mean fallback for degenerate features
+    lengths = np.diff(flat.ring_offsets)
+    counts = np.bincount(flat.ring_feature, weights=lengths, minlength=n)
+    sum_x = np.bincount(flat.ring_feature, weights=_segment_sums(flat, x), minlength=n)
+    sum_y = np.bincount(flat.ring_feature, weights=_segment_sums(flat, y), minlength=n)
+
+    has_area = w > 0
+    out[has_area, 0] = my[has_area] / w[has_area]
+    out[has_area, 1] = mx[has_area] / w[has_area]
+    fallback = (counts > 0) & ~has_area
+    out[fallback, 0] = sum_y[fallback] / counts[fallback]
+    out[fallback, 1] = sum_x[fallback] / counts[fallback]
+    return out
+
+
+def bounding_boxes(flat):
+    """(F, 4) [lon_min, lat_min, lon_max, lat_max] per feature; NaN without geometry."""
+    n = flat.n_features
+    out = np.full((n, 4), np.nan)
+    vertex_start = flat.ring_offsets[flat.feature_offsets[:-1]]
+    vertex_end = flat.ring_offsets[flat.feature_offsets[1:]]
+    has = vertex_end > vertex_start
+    if not has.any():
+        return out
+    starts = vertex_start[has]
+    out[has, 0:2] = np.minimum.reduceat(flat.coords, starts, axis=0)
+    out[has, 2:4] = np.maximum.reduceat(flat.coords, starts, axis=0)
+    return out
+
+
+def ring_bounding_boxes(flat):
+    """(R, 4) [lon_min, lat_min, lon_max, lat_max] per ring."""
+    out = np.full((flat.n_rings, 4), np.nan)
+    has = np.diff(flat.ring_offsets) > 0
+    if not has.any():
+        return out
+    starts = flat.ring_offsets[:-1][has]
+    out[has, 0:2] = np.minimum.reduceat(flat.coords, starts, axis=0)
+    out[has, 2:4] = np.maximum.reduceat(flat.coords, starts, axis=0)
+    return out
+
+
+def squared_distances(points, centers):
+    """(N, D) squared euclidean distances between [lat, lon] points and centers."""
+    points = np.asarray(points, dtype=np.float64)
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+    diff = points[:, None, :] - centers[None, :, :]
+    return np.einsum('ndk,ndk->nd', diff, diff)
+
+
+def canonical_district(name):
+    """Upper-case district name with alternative spellings resolved."""
+    key = str(name).upper().strip()
+    return DISTRICT_ALIASES.get(key, key)
+
+
+def district_center(name, default=None):
+    """Approximate (lat, lon) center of a district by name, accepting aliases."""
+    return DISTRICT_CENTERS.get(canonical_district(name), default)
+
+
+def quantize(flat, decimals):
+    """Round vertices to `decimals` and mask out repeated consecutive vertices."""
+    coords = np.round(flat.coords, decimals)
+    keep = np.ones(len(coords), dtype=bool)
+    if len(coords) > 1:
+        keep[1:] = (coords[1:] != coords[:-1]).any(axis=1)
+    # Ring starts and ends (the closing vertex) always survive
+    keep[flat.ring_offsets[:-1]] = True
+    keep[flat.ring_offsets[1:] - 1] = True
+    return coords, keep
+
+
+def to_geometries(flat, coords=None, keep=None):
+    """
+    Rebuild one GeoJSON geometry per feature from flat storage.
+    `coords` replaces the vertex array (e.g. rounded); `keep` is an optional
+    per-vertex mask of vertices to retain. simplify.py masks always keep
+    four vertices per ring; a ring collapsed below that by rounding (quantize)
+    falls back to its full vertex list so it stays valid.
+    Each outer ring starts a new polygon; None for features without rings.
+    """
+    coords = flat.coords if coords is None else coords
+    out = []
+    for f in range(flat.n_features):
+        polygons = []
+        for r in range(flat.feature_offsets[f], flat.feature_offsets[f + 1]):
+            start, end = flat.ring_offsets[r], flat.ring_offsets[r + 1]
+            ring = coords[start:end]
+            if keep is not None:
+                kept = ring[keep[start:end]]
+                ring = kept if len(kept) >= 4 else ring
+            if not flat.ring_is_hole[r] or not polygons:
+                polygons.append([])
+            polygons[-1].append(ring.tolist())
+        if not polygons:
+            out.append(None)
+        elif len(polygons) == 1:
+            out.append({'type': 'Polygon', 'coordinates': polygons[0]})
+        else:
+            out.append({'type': 'MultiPolygon', 'coordinates': polygons})
+    return out
@@ -0,0 +1,213 @@
+"""
+Linkage engine between census GN divisions and boundary features.
+Candidates are blocked by District / DS Division, exact name matches are
+joined first, and only the remaining names are scored with a trigram (Dice)
+similarity from a sparse incidence matrix product (pairs that share no
+trigram are never scored) and assigned one-to-one, best pair first. The
+result is a persisted crosswalk with a confidence per GN, so the
+full-country linkage is one pass instead of a per-name scan.
+
+build_geojson.py runs the linkage on the resolved boundaries, stores the
+census GN_UID as each feature's integer `id` and writes the crosswalk.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from census_store import PROCESSED_DIR, load_census
+
+CROSSWALK_PATH = PROCESSED_DIR / "GN_crosswalk.csv"
+
+# Trigram matches scoring below this are left unmatched (best candidate kept)
+MIN_CONFIDENCE = 0.5
+
+# Trigram candidates kept per census name for the assignment
+TOP_K = 10
+
+CENSUS_COLUMNS = ['GN_UID', 'District_Code', 'DS_Code', 'GN_Code', 'GN_Number',
+                  'District', 'DS_Division', 'GN_Division']
+
+
+def normalize_name(name):
+    """Uppercase, punctuation to spaces, collapsed whitespace."""
+    name = re.sub(r'[^A-Z0-9]+', ' ', str(name).upper())
+    return ' '.join(name.split())
+
+
+def trigrams(name):
+    """Character trigrams of a normalized name, padded so word edges count."""
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def exact_pairs(left_keys, left_names, right_keys, right_names):
+    """
+    (left positions, right positions) of exact (block, name) matches, joined
+    on a hash key. Repeated names pair up in order of appearance.
+    """
+    left = pd.DataFrame({'key': left_keys, 'name': left_names})
+    right = pd.DataFrame({'key': right_keys, 'name': right_names})
+    left['occ'] = left.groupby(['key', 'name']).cumcount()
+    right['occ'] = right.groupby(['key', 'name']).cumcount()
+    pairs = left.reset_index().merge(right.reset_index(), on=['key', 'name', 'occ'])
+    return pairs['index_x'].to_numpy(), pairs['index_y'].to_numpy()
+
+
+def _incidence(keys, names, vocab):
+    """
+    Binary (name x (block, trigram)) CSR matrix plus each name's trigram
+    count. Trigrams are keyed by block, so names in different blocks never
+    share a column. New (block, trigram) pairs are added to `vocab`.
+    """
+    rows, cols, sizes = [], [], []
+    for i, (key, name) in enumerate(zip(keys, names)):
+        grams = trigrams(name)
+        sizes.append(len(grams))
+        for g in grams:
+            rows.append(i)
+            cols.append(vocab.setdefault((key, g), len(vocab)))
+    return (rows, cols), np.array(sizes, dtype=np.float64)
+
+
+def trigram_candidates(left_keys, left_names, right_keys, right_names, top_k=TOP_K):
+    """
+    Bulk trigram scoring: the shared trigram counts of every same-block pair
+    are one sparse product of the (block, trigram) incidence matrices,
+    left x right^T, so pairs sharing no trigram are never scored. Returns
+    (score, left, right) triples, the `top_k` best per left name (ties to
+    the lower right position), all sorted best first.
+    """
+    vocab = {}
+    (lr, lc), left_sizes = _incidence(left_keys, left_names, vocab)
+    (rr, rc), right_sizes = _incidence(right_keys, right_names, vocab)
+    shape = len(vocab)
+    left = sparse.csr_matrix((np.ones(len(lr)), (lr, lc)), shape=(len(left_sizes), shape))
+    right = sparse.csr_matrix((np.ones(len(rr)), (rr, rc)), shape=(len(right_sizes), shape))
+    shared = (left @ right.T).tocoo()
+
+    rows, cols = shared.row.astype(np.int64), shared.col.astype(np.int64)
+    scores = 2 * shared.data / (left_sizes[rows] + right_sizes[cols])
+    # Best first within each left name, then keep the first top_k of each
+    order = np.lexsort((cols, -scores, rows))
+    rows, cols, scores = rows[order], cols[order], scores[order]
+    starts = np.searchsorted(rows, rows, side='left')
+    keep = np.arange(len(rows)) - starts < top_k
+    rows, cols, scores = rows[keep], cols[keep], scores[keep]
+
+    order = np.lexsort((cols, rows, -scores))
+    return list(zip(scores[order].tolist(), rows[order].tolist(), cols[order].tolist()))
+
+
+def _assign(triples):
+    """Greedy one-to-one assignment over (score, left, right) triples sorted best first."""
+    used_rows, used_cols, pairs = set(), set(), {}
+    for score, r, c in triples:
+        if r in used_rows or c in used_cols:
+            continue
+        pairs[r] = (c, score)
+        used_rows.add(r)
+        used_cols.add(c)
+    return pairs
+
+
+def feature_table(features):
+    """
+    One row per boundary feature with its normalized blocking keys and name.
+    Only properties are kept, so `features` may be a streaming iterator.
+    """
+    rows = [{
+        'feature_index': i,
+        'shapeID': f['properties'].get('shapeID') or '',
+        'shapeName': f['properties'].get('shapeName') or '',
+        'block_district': normalize_name(f['properties'].get('District_Name', '')),
+        'block_ds': normalize_name(f['properties'].get('DS_Division_Name', '')),
+    } for i, f in enumerate(features)]
+    return pd.DataFrame(rows, columns=['feature_index', 'shapeID', 'shapeName', 'block_district', 'block_ds'])
+
+
+def link(census, features):
+    """
+    Match census GN rows to boundary features.
+    Blocks by District + DS where the features carry a DS name, otherwise by
+    District alone. Returns one crosswalk row per census GN.
+    """
+    census = census.reset_index(drop=True)
+    census_name = census['GN_Division'].map(normalize_name)
+    census_district = census['District'].astype(str).map(normalize_name)
+    census_ds = census['DS_Division'].astype(str).map(normalize_name)
+    feature_name = features['shapeName'].map(normalize_name)
+
+    n = len(census)
+    matched_id = np.full(n, '', dtype=object)
+    candidate = np.full(n, '', dtype=object)
+    feature_index = np.full(n, -1, dtype=np.int64)
+    confidence = np.zeros(n)
+    method = np.full(n, 'unmatched', dtype=object)
+
+    has_ds = (features['block_ds'] != '').any()
+    census_keys = census_district + '|' + census_ds if has_ds else census_district
+    feature_keys = features['block_district'] + '|' + features['block_ds'] if has_ds else features['block_district']
+    shape_ids = features['shapeID'].to_numpy()
+    shape_names = features['shapeName'].to_numpy()
+    feature_positions = features['feature_index'].to_numpy()
+
+    # Exact normalized matches first: a join, no scoring
+    rows, cols = exact_pairs(census_keys.to_numpy(), census_name.to_numpy(),
+                             feature_keys.to_numpy(), feature_name.to_numpy())
+    matched_id[rows], candidate[rows] = shape_ids[cols], shape_names[cols]
+    feature_index[rows], confidence[rows], method[rows] = feature_positions[cols], 1.0, 'exact'
+
+    # Only the leftovers on both sides are scored
+    left = np.setdiff1d(np.arange(n), rows)
+    right = np.setdiff1d(np.arange(len(features)), cols)
+    triples = trigram_candidates(census_keys.to_numpy()[left].tolist(), census_name.to_numpy()[left].tolist(),
+                                 feature_keys.to_numpy()[right].tolist(), feature_name.to_numpy()[right].tolist())
+
+    # Every row reports its best candidate; assigned pairs override it
+    for score, r, c in reversed(triples):
+        candidate[left[r]], confidence[left[r]] = shape_names[right[c]], score
+    for r, (c, score) in _assign(triples).items():
+        i, f = left[r], right[c]
+        candidate[i], confidence[i] = shape_names[f], score
+        if score >= MIN_CONFIDENCE:
+            matched_id[i], feature_index[i] = shape_ids[f], feature_positions[f]
+            method[i] = 'trigram'
+
+    out = pd.DataFrame({
+        'shapeID': matched_id, 'shapeName': candidate, 'feature_index': feature_index,
+        'confidence': np.minimum(confidence, 1.0).round(3), 'method': method,
+    })
+    return pd.concat([census[CENSUS_COLUMNS], out], axis=1)
+
+
+def link_features(data):
+    """Link the whole census to resolved boundaries and set feature ids. Returns the crosswalk."""
+    census = load_census(columns=CENSUS_COLUMNS)
+    crosswalk = link(census, feature_table(data['features']))
+    attach_ids(data, crosswalk)
+    return crosswalk
+
+
+def build(data, path=CROSSWALK_PATH):
+    """link_features() plus writing the crosswalk CSV."""
+    crosswalk = link_features(data)
+    crosswalk.to_csv(path, index=False)
+    return crosswalk
+
+
+def attach_ids(data, crosswalk):
+    """Set feature['id'] = GN_UID for every linked feature."""
+    linked = crosswalk[crosswalk['feature_index'] >= 0]
+    features = data['features']
+    for uid, i in zip(linked['GN_UID'].tolist(), linked['feature_index'].tolist()):
+        features[i]['id'] = uid
+
+
+def load_crosswalk(path=CROSSWALK_PATH):
+    """Load the persisted crosswalk (None if it has not been built)."""
+    if not path.exists():
+        return None
+    return pd.read_csv(path, dtype={'GN_Number': str, 'shapeID': str, 'shapeName': str},
+                       keep_default_na=False)
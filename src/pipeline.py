@@ -0,0 +1,329 @@
+"""
+Incremental build pipeline for the census artifacts.
+Each stage declares its input and output files. A content-hash manifest
+records what every stage last consumed and produced, so a stage reruns
+only when one of its inputs changed (or an output went missing / was
+modified). A no-op rebuild only stats files, which takes milliseconds.
+
+Usage (from anywhere):
+    python src/pipeline.py                 # rebuild what is out of date
+    python src/pipeline.py insights        # only the named stage(s)
+    python src/pipeline.py --dry-run       # show what would run
+    python src/pipeline.py --force clean   # rerun regardless of hashes
+    python src/pipeline.py --profile       # per-stage wall/CPU/memory report
+
+With --profile every script that runs records its named stages (see
+profiling.py) and the run ends with one consolidated report in
+.pipeline/profiles/run_<time>/report.json.
+"""
+import argparse
+import ast
+import functools
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from build_geojson import file_sha256
+from profiling import PROFILE_DIR, PROFILE_ENV
+
+ROOT = Path(__file__).resolve().parent.parent
+MANIFEST_PATH = ROOT / ".pipeline" / "manifest.json"
+
+RAW = "data/raw"
+PROCESSED = "data/processed"
+
+# Stages in dependency order. Paths are relative to the repo root. Only data
+# inputs are listed: each stage's script and every src/ module it imports
+# (stage_inputs) are added, so code changes also trigger a rebuild.
+STAGES = [
+    {
+        'name': 'clean',
+        'command': ['src/clean_census.py'],
+        'inputs': [f"{RAW}/GN_population_excel.xlsx"],
+        'outputs': [f"{PROCESSED}/GN_population_cleaned.csv", f"{PROCESSED}/GN_population.parquet"],
+    },
+    {
+        'name': 'geojson',
+        'command': ['src/build_geojson.py'],
+        'inputs': [f"{PROCESSED}/GN_census_merged.geojson", f"{PROCESSED}/GN_population.parquet"],
+        'outputs': [f"{PROCESSED}/GN_census_validated.geojson", f"{PROCESSED}/GN_census_validated.manifest.json",
+                    f"{PROCESSED}/GN_crosswalk.csv"],
+    },
+    {
+        'name': 'simplify',
+        'command': ['src/simplify.py'],
+        'inputs': [f"{PROCESSED}/GN_census_validated.geojson", f"{PROCESSED}/GN_census_validated.manifest.json"],
+        'outputs': [f"{PROCESSED}/simplified/index.json"],
+    },
+    {
+        'name': 'tiles',
+        'command': ['src/build_tiles.py'],
+        'inputs': [f"{PROCESSED}/GN_census_validated.geojson", f"{PROCESSED}/GN_census_validated.manifest.json"],
+        'outputs': [f"{PROCESSED}/tiles/index.json"],
+    },
+    {
+        'name': 'shards',
+        'command': ['src/build_shards.py'],
+        'inputs': [f"{PROCESSED}/GN_census_validated.geojson", f"{PROCESSED}/GN_census_validated.manifest.json",
+                   f"{PROCESSED}/GN_population.parquet"],
+        'outputs': [f"{PROCESSED}/shards/manifest.json"],
+    },
+    {
+        'name': 'extents',
+        'command': ['src/build_extents.py'],
+        'inputs': [f"{PROCESSED}/GN_census_validated.geojson", f"{PROCESSED}/GN_census_validated.manifest.json",
+                   f"{PROCESSED}/GN_population.parquet"],
+        'outputs': [f"{PROCESSED}/GN_extents.json"],
+    },
+    {
+        'name': 'spatial_index',
+        'command': ['src/spatial_index.py', 'build'],
+        'inputs': [f"{PROCESSED}/GN_census_validated.geojson", f"{PROCESSED}/GN_census_validated.manifest.json"],
+        'outputs': [f"{PROCESSED}/GN_spatial_index.npz"],
+    },
+    {
+        'name': 'insights',
+        'command': ['src/generate_executive_insights.py'],
+        'inputs': [f"{PROCESSED}/GN_population.parquet"],
+        'outputs': ["analysis_output/executive_insights.txt"],
+    },
+    {
+        'name': 'linkedin_charts',
+        'command': ['src/generate_linkedin_charts.py'],
+        'inputs': [],
+        'outputs': [f"output/linkedin_visuals/0{i}_{name}.png" for i, name in enumerate(
+            ['population_comparison', 'age_structure', 'dependency_ratios', 'priority_comparison'], start=1)],
+    },
+    {
+        'name': 'linkedin_executive',
+        'command': ['src/generate_linkedin_executive_visuals.py'],
+        'inputs': [f"{PROCESSED}/GN_population.parquet"],
+        'outputs': ["output/linkedin_executive/01_demographic_divide_scatter.png",
+                    "output/linkedin_executive/02_aging_crisis_bar.png",
+                    "output/linkedin_executive/03_growth_engines_bar.png"],
+    },
+    {
+        'name': 'verify_positions',
+        'command': ['src/verify_positions.py'],
+        'inputs': [f"{PROCESSED}/GN_census_merged.geojson", f"{PROCESSED}/GN_crosswalk.csv"],
+        'outputs': ["position_verification_report.txt", "position_verification_report.json"],
+    },
+    {
+        'name': 'verify_linkage',
+        'command': ['src/verify_linkage.py'],
+        'inputs': [f"{PROCESSED}/GN_crosswalk.csv"],
+        'outputs': ["mismatch_report.txt"],
+    },
+]
+
+
+class HashCache:
+    """File hashes that are only recomputed when a file's size or mtime changes."""
+
+    def __init__(self, entries=None):
+        self.entries = entries or {}
+
+    def digest(self, rel_path):
+        path = ROOT / rel_path
+        if not path.exists():
+            return None
+        stat = path.stat()
+        cached = self.entries.get(rel_path)
+        if cached and cached['bytes'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+            return cached['sha256']
+        digest = file_sha256(path)
+        self.entries[rel_path] = {'sha256': digest, 'bytes': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        return digest
+
+
+@functools.lru_cache(maxsize=None)
+def local_imports(script):
+    """src/ modules imported by one repo-relative script (parsed once per run)."""
+    tree = ast.parse((ROOT / script).read_text(encoding='utf-8'), filename=script)
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        modules.update(f"src/{name.split('.')[0]}.py" for name in names)
+    return tuple(sorted(m for m in modules if (ROOT / m).exists()))
+
+
+def script_sources(script, seen=None):
+    """A script and every src/ module it imports, directly or through other src/ modules."""
+    seen = set() if seen is None else seen
+    if script not in seen:
+        seen.add(script)
+        for module in local_imports(script):
+            script_sources(module, seen)
+    return seen
+
+
+def stage_inputs(stage):
+    """A stage's data inputs plus the sources of its script."""
+    return stage['inputs'] + sorted(script_sources(stage['command'][0]))
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if not path.exists():
+        return {'files': {}, 'stages': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def stage_status(stage, record, hashes):
+    """Return (needs_run, reason, input_hashes) for one stage."""
+    inputs = {p: hashes.digest(p) for p in stage_inputs(stage)}
+    missing = [p for p, h in inputs.items() if h is None]
+    if missing:
+        return False, f"missing input {missing[0]}", inputs
+    if not record:
+        return True, "never built", inputs
+    if record.get('command') != stage['command']:
+        return True, "command changed", inputs
+    changed = [p for p in inputs if record['inputs'].get(p) != inputs[p]]
+    if changed:
+        return True, f"input changed: {changed[0]}", inputs
+    for p in stage['outputs']:
+        if hashes.digest(p) != record['outputs'].get(p):
+            return True, f"output missing or modified: {p}", inputs
+    return False, "up to date", inputs
+
+
+def _children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def write_profile_report(run_dir, timings):
+    """Merge the per-script profiles of one run into report.json and print the slowest stages."""
+    report = {'run': run_dir.name, 'stages': []}
+    for timing in timings:
+        script = Path(timing['command'][0]).stem
+        path = run_dir / f"{script}.json"
+        profile = None
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                profile = json.load(f)
+        report['stages'].append({**timing, 'profile': profile})
+    with open(run_dir / "report.json", 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    rows = [(s['name'], p['name'], p['wall_seconds'], p['cpu_seconds'], p['peak_rss_mb'],
+             p['hotspots'][0]['line'] if p['hotspots'] else '')
+            for s in report['stages'] if s['profile'] for p in s['profile']['stages']]
+    print(f"\nProfile ({run_dir / 'report.json'}):")
+    print(f"  {'stage':<20} {'step':<36} {'wall s':>8} {'cpu s':>8} {'rss MB':>8}  top allocation")
+    for name, step, wall, cpu, rss, hot in sorted(rows, key=lambda r: -r[2])[:20]:
+        print(f"  {name:<20} {step:<36} {wall:8.2f} {cpu:8.2f} {rss:8.1f}  {hot}")
+    return report
+
+
+def run(selected=None, force=False, dry_run=False, profile=False, allow_missing=False):
+    """
+    Bring the selected stages (default: all) up to date. Returns False on
+    failure, including a stage whose input is missing unless `allow_missing`
+    (then the stage is skipped and its outputs are left as they are).
+    """
+    start = time.perf_counter()
+    manifest = load_manifest()
+    hashes = HashCache(manifest.get('files'))
+    ok = True
+
+    env = None
+    timings = []
+    if profile and not dry_run:
+        run_dir = PROFILE_DIR / f"run_{time.strftime('%Y%m%d_%H%M%S')}"
+        run_dir.mkdir(parents=True, exist_ok=True)
+        env = dict(os.environ, **{PROFILE_ENV: str(run_dir)})
+
+    for stage in STAGES:
+        if selected and stage['name'] not in selected:
+            continue
+        record = manifest['stages'].get(stage['name'])
+        needs_run, reason, inputs = stage_status(stage, record, hashes)
+        if reason.startswith('missing input'):
+            if allow_missing:
+                print(f"  {stage['name']:<20} skipped ({reason})")
+                continue
+            print(f"  {stage['name']:<20} {'would fail' if dry_run else 'FAILED'} ({reason})")
+            ok = False
+            if dry_run:
+                continue
+            break
+        if force:
+            needs_run, reason = True, "forced"
+
+        if not needs_run:
+            print(f"  {stage['name']:<20} {reason}")
+            continue
+        print(f"  {stage['name']:<20} {'would run' if dry_run else 'running'} ({reason})")
+        if dry_run:
+            continue
+
+        t0 = time.perf_counter()
+        cpu0 = _children_cpu()
+        result = subprocess.run([sys.executable] + stage['command'], cwd=ROOT, env=env)
+        if env is not None:
+            timings.append({'name': stage['name'], 'command': stage['command'], 'exit': result.returncode,
+                            'wall_seconds': round(time.perf_counter() - t0, 4),
+                            'cpu_seconds': round(_children_cpu() - cpu0, 4)})
+        missing_outputs = [p for p in stage['outputs'] if not (ROOT / p).exists()]
+        if result.returncode != 0 or missing_outputs:
+            print(f"  {stage['name']:<20} FAILED"
+                  + (f" (no {missing_outputs[0]})" if missing_outputs else f" (exit {result.returncode})"))
+            ok = False
+            break
+
+        manifest['stages'][stage['name']] = {
+            'command': stage['command'],
+            'inputs': inputs,
+            'outputs': {p: hashes.digest(p) for p in stage['outputs']},
+            'seconds': round(time.perf_counter() - t0, 3),
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }
+        # Save after every stage so an interrupted run keeps its progress
+        manifest['files'] = hashes.entries
+        save_manifest(manifest)
+
+    manifest['files'] = hashes.entries
+    if not dry_run:
+        save_manifest(manifest)
+    print(f"Pipeline finished in {(time.perf_counter() - start) * 1000:.1f} ms")
+    if env is not None and timings:
+        write_profile_report(run_dir, timings)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally rebuild census artifacts.")
+    parser.add_argument('stages', nargs='*', help="Stages to consider (default: all)")
+    parser.add_argument('--force', action='store_true', help="Rerun selected stages even if up to date")
+    parser.add_argument('--dry-run', action='store_true', help="Only report what would run")
+    parser.add_argument('--allow-missing', action='store_true',
+                        help="Skip stages whose inputs are missing instead of failing")
+    parser.add_argument('--profile', action='store_true',
+                        help="Profile every stage that runs (combine with --force to profile all)")
+    args = parser.parse_args()
+
+    unknown = set(args.stages) - {s['name'] for s in STAGES}
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+    sys.exit(0 if run(args.stages, args.force, args.dry_run, args.profile, args.allow_missing) else 1)
+
+
+if __name__ == "__main__":
+    main()
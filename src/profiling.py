@@ -0,0 +1,168 @@
+"""
+Stage profiler shared by the offline scripts.
+Off unless CENSUS_PROFILE is set ("1", or a directory for the reports;
+`pipeline.py --profile` sets it for every stage it runs). Scripts mark
+their work with
+
+    with profiling.stage('excel_read'):
+        ...
+
+and each stage records wall time, CPU time (including finished child
+processes), peak RSS sampled while it runs, the tracemalloc peak and the
+source lines that allocated the most memory. The script's report is
+written as JSON when it exits. Stages are not meant to be nested. When
+profiling is off, stage() does nothing.
+"""
+import atexit
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+PROFILE_ENV = 'CENSUS_PROFILE'
+PROFILE_DIR = Path(__file__).resolve().parent.parent / ".pipeline" / "profiles"
+
+HOTSPOTS = 5
+RSS_INTERVAL = 0.01  # seconds between RSS samples
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+_IGNORED = [tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, threading.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+            tracemalloc.Filter(False, '<unknown>')]
+
+
+def enabled():
+    return bool(os.environ.get(PROFILE_ENV))
+
+
+def current_rss():
+    """Resident set size in bytes (peak so far where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _cpu_seconds():
+    own = time.process_time()
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own + children.ru_utime + children.ru_stime
+
+
+class _RssSampler:
+    """Background thread tracking the peak RSS between start() and stop()."""
+
+    def __init__(self):
+        self.peak = current_rss()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._done.wait(RSS_INTERVAL):
+            self.peak = max(self.peak, current_rss())
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._done.set()
+        self._thread.join()
+        return max(self.peak, current_rss())
+
+
+def _hotspots(before, after, limit=HOTSPOTS):
+    """Source lines with the largest net allocation between two snapshots."""
+    stats = after.filter_traces(_IGNORED).compare_to(before.filter_traces(_IGNORED), 'lineno')
+    top = [s for s in stats if s.size_diff > 0][:limit]
+    return [{'line': f"{Path(s.traceback[0].filename).name}:{s.traceback[0].lineno}",
+             'size_mb': round(s.size_diff / 1e6, 3), 'blocks': s.count_diff} for s in top]
+
+
+class Profiler:
+    """Per-stage measurements for one script run."""
+
+    def __init__(self, script):
+        self.script = script
+        self.started_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.stages = []
+        self._wall = time.perf_counter()
+        self._cpu = _cpu_seconds()
+        tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        sampler = _RssSampler().start()
+        wall, cpu = time.perf_counter(), _cpu_seconds()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, _cpu_seconds() - cpu
+            peak_rss = sampler.stop()
+            _, traced_peak = tracemalloc.get_traced_memory()
+            self.stages.append({
+                'name': name,
+                'wall_seconds': round(wall, 4),
+                'cpu_seconds': round(cpu, 4),
+                'peak_rss_mb': round(peak_rss / 1e6, 1),
+                'traced_peak_mb': round(traced_peak / 1e6, 3),
+                'hotspots': _hotspots(before, tracemalloc.take_snapshot()),
+            })
+
+    def report(self):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {
+            'script': self.script,
+            'started_at': self.started_at,
+            'wall_seconds': round(time.perf_counter() - self._wall, 4),
+            'cpu_seconds': round(_cpu_seconds() - self._cpu, 4),
+            'peak_rss_mb': round((peak if sys.platform == 'darwin' else peak * 1024) / 1e6, 1),
+            'stages': self.stages,
+        }
+
+    def write(self):
+        """Write the report to CENSUS_PROFILE (a directory) or .pipeline/profiles/."""
+        target = os.environ.get(PROFILE_ENV, '')
+        if target and target != '1':
+            path = Path(target) / f"{self.script}.json"
+        else:
+            path = PROFILE_DIR / f"{self.script}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+        print(f"Profile saved to {path}")
+        return path
+
+
+_active = None
+
+
+def profiler():
+    """The running script's profiler (created on first use), or None when profiling is off."""
+    global _active
+    if _active is None and enabled():
+        _active = Profiler(Path(sys.argv[0]).stem or 'python')
+        atexit.register(_active.write)
+    return _active
+
+
+@contextmanager
+def stage(name):
+    """Profile the enclosed block as stage `name` (no-op unless profiling is on)."""
+    p = profiler()
+    if p is None:
+        yield
+        return
+    with p.stage(name):
+        yield
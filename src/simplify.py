@@ -0,0 +1,323 @@
+"""
+Topology-preserving simplification pyramid for the GN boundaries.
+Rings are split into arcs at junctions (vertices where three or more
+boundary edges meet), every distinct arc is simplified once with
+Douglas-Peucker, and each ring is reassembled from its simplified arcs. A
+border shared by two GN divisions is therefore simplified identically on
+both sides, so coarse levels open no gaps or overlaps between neighbours.
+
+Simplification only drops vertices, so each level is a per-vertex keep
+mask over the flat geometry; the dashboard picks a level from its zoom and
+filter depth. A ring whose arcs simplify to fewer than three vertices gets
+its arcs' farthest dropped vertices back, per arc, so its neighbours along
+those arcs keep the same border. A level that keeps exactly the vertices
+of the next finer one is not written; the index maps it to that level.
+
+Usage:
+    python src/simplify.py
+"""
+import json
+import time
+
+import numpy as np
+
+import geometry
+from build_geojson import MANIFEST_PATH, PROCESSED_DIR, load_artifact
+
+SIMPLIFIED_DIR = PROCESSED_DIR / "simplified"
+INDEX_PATH = SIMPLIFIED_DIR / "index.json"
+
+# Bump when the arc splitting or output layout changes
+PYRAMID_VERSION = 4
+
+# Level -> Douglas-Peucker tolerance in degrees (~550 m, ~110 m, ~22 m),
+# coarsest first
+LEVELS = {'coarse': 0.005, 'medium': 0.001, 'fine': 0.0002}
+
+# Level -> coordinate decimals kept when a level is written for the map
+# (tiles and shards)
+DECIMALS = {'coarse': 3, 'medium': 4, 'fine': 5}
+
+# Coordinates closer than this are the same point when matching borders
+SNAP_DECIMALS = 7
+
+# Fewest distinct vertices a simplified ring keeps (plus the closing vertex)
+MIN_RING_VERTICES = 3
+
+
+def point_ids(flat):
+    """Integer id per vertex; vertices at the same (snapped) location share an id."""
+    snapped = np.round(flat.coords, SNAP_DECIMALS)
+    _, ids = np.unique(snapped, axis=0, return_inverse=True)
+    return ids.reshape(-1)
+
+
+def junctions(flat, ids):
+    """Boolean per point id: three or more distinct boundary edges meet there."""
+    starts, ends = flat.ring_offsets[:-1], flat.ring_offsets[1:]
+    nxt = np.arange(1, len(ids) + 1)
+    nxt[ends - 1] = starts  # wrap each ring
+    a, b = ids, ids[nxt]
+    edges = np.stack([np.minimum(a, b), np.maximum(a, b)], axis=1)
+    edges = np.unique(edges[edges[:, 0] != edges[:, 1]], axis=0)
+    degree = np.bincount(edges.ravel(), minlength=int(ids.max()) + 1 if len(ids) else 0)
+    return degree >= 3
+
+
+def _distances(points, a, b):
+    """Distance of each point to the line through a and b (to a when a == b)."""
+    seg = b - a
+    rel = points - a
+    norm = np.hypot(seg[0], seg[1])
+    if norm == 0:
+        return np.hypot(rel[:, 0], rel[:, 1])
+    return np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / norm
+
+
+def douglas_peucker(points, tolerance):
+    """Keep mask for an open polyline; both endpoints are always kept."""
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        lo, hi = stack.pop()
+        if hi - lo < 2:
+            continue
+        dist = _distances(points[lo + 1:hi], points[lo], points[hi])
+        i = int(dist.argmax())
+        if dist[i] > tolerance:
+            mid = lo + 1 + i
+            keep[mid] = True
+            stack.append((lo, mid))
+            stack.append((mid, hi))
+    return keep
+
+
+def _simplify_loop(points, tolerance):
+    """Keep mask for a closed loop (no closing duplicate) split at its farthest vertex."""
+    far = int(np.hypot(*(points - points[0]).T).argmax())
+    if far == 0:
+        return np.ones(len(points), dtype=bool)
+    closed = np.vstack([points, points[:1]])
+    keep = np.concatenate([douglas_peucker(closed[:far + 1], tolerance)[:-1],
+                           douglas_peucker(closed[far:], tolerance)[:-1]])
+    return keep
+
+
+def _restore(points, keep, count, closed):
+    """
+    `keep` with up to `count` dropped vertices restored, each the one
+    farthest from the kept polyline around it (wrapping around for loops).
+    """
+    keep = keep.copy()
+    n = len(points)
+    for _ in range(count):
+        kept = np.flatnonzero(keep)
+        spans = zip(kept, np.append(kept[1:], kept[0] + n)) if closed else zip(kept[:-1], kept[1:])
+        best, best_dist = None, -1.0
+        for lo, hi in spans:
+            if hi - lo < 2:
+                continue
+            idx = np.arange(lo + 1, hi) % n
+            dist = _distances(points[idx], points[lo % n], points[hi % n])
+            i = int(dist.argmax())
+            if dist[i] > best_dist:
+                best, best_dist = idx[i], dist[i]
+        if best is None:
+            break
+        keep[best] = True
+    return keep
+
+
+def _ring_arcs(ring_ids, is_junction):
+    """
+    Split an open ring (closing vertex removed) into arcs.
+    Returns a list of (positions, closed) with positions into the open ring.
+    """
+    m = len(ring_ids)
+    cut = np.flatnonzero(is_junction[ring_ids])
+    if not len(cut):
+        return [(np.arange(m), True)]
+    arcs = []
+    for k, start in enumerate(cut):
+        end = cut[k + 1] if k + 1 < len(cut) else cut[0] + m
+        arcs.append((np.arange(start, end + 1) % m, False))
+    return arcs
+
+
+def _canonical(arc_ids, closed):
+    """(key, order) so both rings sharing an arc see the same vertex sequence."""
+    if closed:
+        start = int(arc_ids.argmin())
+        fwd = np.roll(arc_ids, -start)
+        order = np.roll(np.arange(len(arc_ids)), -start)
+        if len(fwd) > 2 and fwd[-1] < fwd[1]:
+            fwd = np.concatenate([fwd[:1], fwd[1:][::-1]])
+            order = np.concatenate([order[:1], order[1:][::-1]])
+        return (True, fwd.tobytes()), order
+    rev = arc_ids[::-1]
+    if tuple(rev) < tuple(arc_ids):
+        return (False, rev.tobytes()), np.arange(len(arc_ids))[::-1]
+    return (False, arc_ids.tobytes()), np.arange(len(arc_ids))
+
+
+def simplify(flat, tolerances=LEVELS):
+    """Per-level vertex keep masks {level: bool array over flat.coords}."""
+    ids = point_ids(flat)
+    is_junction = junctions(flat, ids)
+    masks = {level: np.ones(len(flat.coords), dtype=bool) for level in tolerances}
+
+    # Split every ring into canonical arcs; each distinct arc's points once
+    rings, arc_points = [], {}
+    for r in range(flat.n_rings):
+        start, end = flat.ring_offsets[r], flat.ring_offsets[r + 1]
+        ring_ids = ids[start:end]
+        closed_ring = len(ring_ids) > 1 and ring_ids[0] == ring_ids[-1]
+        m = len(ring_ids) - 1 if closed_ring else len(ring_ids)
+        if m < 4:
+            continue
+        arcs = [(pos, closed, *_canonical(ring_ids[pos], closed))
+                for pos, closed in _ring_arcs(ring_ids[:m], is_junction)]
+        for pos, closed, key, order in arcs:
+            if key not in arc_points:
+                arc_points[key] = (flat.coords[start + pos[order]], closed)
+        rings.append((start, m, arcs))
+
+    for level, tolerance in tolerances.items():
+        kept = {key: _simplify_loop(pts, tolerance) if closed else douglas_peucker(pts, tolerance)
+                for key, (pts, closed) in arc_points.items()}
+
+        # Rings that would collapse: restore vertices on their arcs, so every
+        # ring sharing one of those arcs keeps the same border
+        needed = {}
+        for start, m, arcs in rings:
+            n_kept = sum(int(kept[key].sum()) - (not closed) for _, closed, key, _ in arcs)
+            if n_kept < MIN_RING_VERTICES:
+                for _, closed, key, _ in arcs:
+                    # Interior vertices per arc; a ring of k open arcs has k junctions
+                    want = MIN_RING_VERTICES if closed else -(-(MIN_RING_VERTICES - len(arcs)) // len(arcs))
+                    needed[key] = max(needed.get(key, 0), want)
+        for key, want in needed.items():
+            pts, closed = arc_points[key]
+            have = int(kept[key].sum()) if closed else int(kept[key][1:-1].sum())
+            if have < want:
+                kept[key] = _restore(pts, kept[key], want - have, closed)
+
+        for start, m, arcs in rings:
+            ring_keep = np.zeros(m, dtype=bool)
+            for pos, closed, key, order in arcs:
+                # Undo the canonical reordering for this ring's traversal
+                ring_keep[pos[order[kept[key]]]] = True
+            masks[level][start:start + m] = ring_keep
+    return masks
+
+
+def collapse_levels(masks):
+    """
+    (masks, aliases): the masks without levels that keep the same vertices
+    as the next finer level, and {dropped level: finer level it equals}.
+    """
+    distinct, aliases = {}, {}
+    finer = None
+    for level in reversed(list(masks)):
+        if finer is not None and np.array_equal(masks[level], masks[finer]):
+            aliases[level] = finer
+        else:
+            distinct[level] = masks[level]
+            finer = level
+    return {level: distinct[level] for level in masks if level in distinct}, aliases
+
+
+def resolve_level(index, level):
+    """The level whose output serves `level` in an index or manifest (None: unchanged)."""
+    return (index or {}).get('aliases', {}).get(level, level)
+
+
+def build():
+    """Write one simplified GeoJSON per level plus an index with vertex counts."""
+    data = load_artifact(verify=True)
+    if data is None:
+        raise FileNotFoundError("Validated GeoJSON artifact missing or stale; run build_geojson.py first")
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+        artifact_sha = json.load(f)['artifact']['sha256']
+
+    features = data['features']
+    flat = geometry.flatten_features(features)
+    masks, aliases = collapse_levels(simplify(flat))
+
+    SIMPLIFIED_DIR.mkdir(parents=True, exist_ok=True)
+    for stale in SIMPLIFIED_DIR.glob('GN_*.geojson'):
+        stale.unlink()
+    index = {'version': PYRAMID_VERSION, 'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+             'artifact_sha256': artifact_sha, 'vertices': len(flat.coords), 'levels': {},
+             'aliases': aliases}
+    for level, keep in masks.items():
+        geoms = geometry.to_geometries(flat, keep=keep)
+        # Only census-linked features (integer GN_UID id) can be colored
+        out = {'type': 'FeatureCollection', 'features': [
+            {'type': 'Feature', 'id': f['id'],
+             'properties': {'shapeID': f['properties'].get('shapeID', '')},
+             'geometry': g}
+            for f, g in zip(features, geoms) if g is not None and 'id' in f
+        ]}
+        payload = json.dumps(out, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        path = SIMPLIFIED_DIR / f"GN_{level}.geojson"
+        path.write_bytes(payload)
+        index['levels'][level] = {'path': path.name, 'tolerance': LEVELS[level],
+                                  'vertices': int(keep.sum()), 'bytes': len(payload)}
+        print(f"  {level:<7} tol={LEVELS[level]:<7} {int(keep.sum()):>9,} of {len(flat.coords):,} vertices, "
+              f"{len(payload) / 1e6:.1f} MB")
+    for level, finer in aliases.items():
+        print(f"  {level:<7} tol={LEVELS[level]:<7} same vertices as {finer}, not written")
+
+    with open(INDEX_PATH, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2)
+    return index
+
+
+def load_index():
+    """Pyramid index, or None if missing or older than the artifact."""
+    if not INDEX_PATH.exists() or not MANIFEST_PATH.exists():
+        return None
+    with open(INDEX_PATH, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+        artifact_sha = json.load(f)['artifact']['sha256']
+    if index.get('version') != PYRAMID_VERSION or index.get('artifact_sha256') != artifact_sha:
+        return None
+    return index
+
+
+def load_level(level):
+    """Simplified FeatureCollection for `level` (or the level it maps to), or None if missing or stale."""
+    index = load_index()
+    if index is None:
+        return None
+    level = resolve_level(index, level)
+    if level not in index['levels']:
+        return None
+    with open(SIMPLIFIED_DIR / index['levels'][level]['path'], 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def pick_level(zoom, depth=0):
+    """
+    Simplification level for a map zoom and filter depth
+    (0 = none/province, 1 = district, 2 = DS Division).
+    """
+    if zoom >= 10 or depth >= 2:
+        return 'fine'
+    if zoom >= 8 or depth >= 1:
+        return 'medium'
+    return 'coarse'
+
+
+def main():
+    print(f"Building simplification pyramid in {SIMPLIFIED_DIR}...")
+    build()
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Point-in-GN reverse lookup: which GN division contains a GPS point.
+The validated boundaries are indexed by a packed R-tree (sort-tile-
+recursive leaf order, 8 entries per node) held entirely in NumPy arrays.
+A batch of points walks the tree level by level as (point, node) pairs,
+then each candidate GN is refined with an exact even-odd point-in-polygon
+test over the rings whose bounding box contains the point (holes and
+multi-part GNs included). Points are processed in chunks, so millions of
+points resolve with bounded memory. The index is saved as one .npz next
+to the artifact and reloaded without reading any GeoJSON.
+
+Usage:
+    python src/spatial_index.py build
+    python src/spatial_index.py lookup POINTS.csv [--lat-col lat --lon-col lon] [--output out.csv]
+    python src/spatial_index.py bench [--points 1000000]
+"""
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import geometry
+from build_geojson import MANIFEST_PATH, PROCESSED_DIR, load_artifact
+from census_store import load_census
+
+INDEX_PATH = PROCESSED_DIR / "GN_spatial_index.npz"
+
+# Bump when the saved layout changes
+INDEX_VERSION = 1
+
+NODE_CAPACITY = 8
+CHUNK_POINTS = 50_000
+
+# Census attributes attached to resolved points
+CENSUS_ATTRIBUTES = ['Province', 'District', 'DS_Division', 'GN_Code', 'GN_Division', 'GN_Number']
+
+_FLAT_FIELDS = ['coords', 'ring_offsets', 'ring_feature', 'ring_is_hole', 'feature_offsets']
+
+
+@dataclass
+class SpatialIndex:
+    """Packed R-tree over the GN features plus their flattened rings."""
+    flat: geometry.FlatGeometry
+    ring_bbox: np.ndarray       # (R, 4) [lon_min, lat_min, lon_max, lat_max]
+    feature_bbox: np.ndarray    # (F, 4)
+    gn_uid: np.ndarray          # (F,) GN_UID per feature, -1 where not census-linked
+    order: np.ndarray           # leaf entries: feature indices in packed order
+    bounds: list                # per tree level (root first, leaf entries last): (n, 4) boxes
+    children: list              # per node level: (n + 1,) child offsets into the next level
+    artifact_sha256: str = None
+
+
+def _str_order(boxes, capacity=NODE_CAPACITY):
+    """Sort-tile-recursive order: vertical slices by x center, then y center within each slice."""
+    cx = (boxes[:, 0] + boxes[:, 2]) / 2
+    cy = (boxes[:, 1] + boxes[:, 3]) / 2
+    n_leaves = -(-len(boxes) // capacity)
+    slice_size = int(np.ceil(np.sqrt(n_leaves))) * capacity
+    by_x = np.argsort(cx, kind='stable')
+    slice_id = np.arange(len(boxes)) // slice_size
+    return by_x[np.lexsort((cy[by_x], slice_id))]
+
+
+def _pack(boxes, capacity=NODE_CAPACITY):
+    """
+    Tree levels (root first, ending with `boxes` itself) over boxes already
+    in leaf order. Nodes group consecutive entries, so each node's children
+    are one contiguous range.
+    """
+    bounds, children = [boxes], []
+    level = boxes
+    while True:
+        starts = np.arange(0, len(level), capacity)
+        nodes = np.concatenate([np.minimum.reduceat(level[:, :2], starts, axis=0),
+                                np.maximum.reduceat(level[:, 2:], starts, axis=0)], axis=1)
+        bounds.append(nodes)
+        children.append(np.append(starts, len(level)))
+        if len(nodes) == 1:
+            break
+        level = nodes
+    return bounds[::-1], children[::-1]
+
+
+def build_index(features, capacity=NODE_CAPACITY):
+    """SpatialIndex over GeoJSON features (feature `id` = GN_UID)."""
+    flat = geometry.flatten_features(features)
+    feature_bbox = geometry.bounding_boxes(flat)
+    has_geom = np.flatnonzero(~np.isnan(feature_bbox[:, 0]))
+    order = has_geom[_str_order(feature_bbox[has_geom], capacity)]
+    bounds, children = _pack(feature_bbox[order], capacity)
+    gn_uid = np.array([f['id'] if isinstance(f.get('id'), int) else -1 for f in features], dtype=np.int64)
+    return SpatialIndex(flat, geometry.ring_bounding_boxes(flat), feature_bbox, gn_uid, order, bounds, children)
+
+
+def _ranges(starts, ends):
+    """(owner, position) for every position in each [start, end) range."""
+    counts = ends - starts
+    owner = np.repeat(np.arange(len(starts)), counts)
+    position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+    return owner, position
+
+
+def _contains(boxes, lon, lat):
+    return (boxes[:, 0] <= lon) & (lon <= boxes[:, 2]) & (boxes[:, 1] <= lat) & (lat <= boxes[:, 3])
+
+
+def candidates(index, lat, lon):
+    """(point, feature) pairs whose feature bounding box contains the point."""
+    point = np.arange(len(lat))
+    node = np.zeros(len(lat), dtype=np.int64)
+    keep = _contains(index.bounds[0][node], lon, lat)
+    point, node = point[keep], node[keep]
+    for depth, offsets in enumerate(index.children):
+        owner, node = _ranges(offsets[node], offsets[node + 1])
+        point = point[owner]
+        keep = _contains(index.bounds[depth + 1][node], lon[point], lat[point])
+        point, node = point[keep], node[keep]
+    return point, index.order[node]
+
+
+def contains(index, point, feature, lat, lon):
+    """Even-odd point-in-polygon test for each (point, feature) pair."""
+    flat = index.flat
+    pair, ring = _ranges(flat.feature_offsets[feature], flat.feature_offsets[feature + 1])
+    keep = _contains(index.ring_bbox[ring], lon[point[pair]], lat[point[pair]])
+    pair, ring = pair[keep], ring[keep]
+
+    # Edges v -> v + 1 of each (closed) ring
+    edge_pair, v = _ranges(flat.ring_offsets[ring], flat.ring_offsets[ring + 1] - 1)
+    pair = pair[edge_pair]
+    px, py = lon[point[pair]], lat[point[pair]]
+    x1, y1 = flat.coords[v, 0], flat.coords[v, 1]
+    x2, y2 = flat.coords[v + 1, 0], flat.coords[v + 1, 1]
+    spans = (y1 > py) != (y2 > py)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crosses = spans & (px < (x2 - x1) * (py - y1) / (y2 - y1) + x1)
+    crossings = np.bincount(pair, weights=crosses, minlength=len(point))
+    return crossings % 2 == 1
+
+
+def lookup(index, lat, lon, chunk=CHUNK_POINTS):
+    """
+    Feature index containing each [lat, lon] point (-1 for none). Where
+    boundaries overlap, the lowest feature index wins.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    out = np.full(len(lat), -1, dtype=np.int64)
+    for start in range(0, len(lat), chunk):
+        la, lo = lat[start:start + chunk], lon[start:start + chunk]
+        point, feature = candidates(index, la, lo)
+        inside = contains(index, point, feature, la, lo)
+        point, feature = point[inside], feature[inside]
+        first = np.lexsort((feature, point))
+        point, feature = point[first], feature[first]
+        unique, pos = np.unique(point, return_index=True)
+        out[start + unique] = feature[pos]
+    return out
+
+
+def lookup_gn_uid(index, lat, lon):
+    """GN_UID containing each point (-1 outside every census-linked GN)."""
+    feature = lookup(index, lat, lon)
+    return np.where(feature >= 0, index.gn_uid[np.maximum(feature, 0)], -1)
+
+
+def attach_census(df, index, lat_col='lat', lon_col='lon'):
+    """`df` with the GN_UID and census attributes of the GN containing each point."""
+    out = df.copy()
+    out['GN_UID'] = lookup_gn_uid(index, df[lat_col].to_numpy(), df[lon_col].to_numpy())
+    census = load_census(columns=['GN_UID'] + CENSUS_ATTRIBUTES)
+    census['GN_UID'] = census['GN_UID'].astype(np.int64)
+    out = out.merge(census, on='GN_UID', how='left')
+    out['GN_Code'] = out['GN_Code'].astype('Int16')  # stays an integer next to unresolved points
+    return out
+
+
+def save_index(index, path=INDEX_PATH):
+    arrays = {name: getattr(index.flat, name) for name in _FLAT_FIELDS}
+    arrays.update(ring_bbox=index.ring_bbox, feature_bbox=index.feature_bbox, gn_uid=index.gn_uid, order=index.order)
+    for depth, b in enumerate(index.bounds):
+        arrays[f'bounds_{depth}'] = b
+    for depth, c in enumerate(index.children):
+        arrays[f'children_{depth}'] = c
+    meta = {'version': INDEX_VERSION, 'artifact_sha256': index.artifact_sha256, 'levels': len(index.bounds)}
+    np.savez(path, meta=np.array(json.dumps(meta)), **arrays)
+
+
+def load_index(path=INDEX_PATH):
+    """Saved index, or None when missing or older than the artifact."""
+    if not path.exists() or not MANIFEST_PATH.exists():
+        return None
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+        artifact_sha = json.load(f)['artifact']['sha256']
+    with np.load(path) as z:
+        meta = json.loads(str(z['meta']))
+        if meta.get('version') != INDEX_VERSION or meta.get('artifact_sha256') != artifact_sha:
+            return None
+        flat = geometry.FlatGeometry(**{name: z[name] for name in _FLAT_FIELDS})
+        levels = meta['levels']
+        return SpatialIndex(flat, z['ring_bbox'], z['feature_bbox'], z['gn_uid'], z['order'],
+                            [z[f'bounds_{d}'] for d in range(levels)],
+                            [z[f'children_{d}'] for d in range(levels - 1)], artifact_sha)
+
+
+def build(path=INDEX_PATH):
+    """Index the validated artifact and save it."""
+    data = load_artifact(verify=True)
+    if data is None:
+        raise FileNotFoundError("Validated GeoJSON artifact missing or stale; run build_geojson.py first")
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+        artifact_sha = json.load(f)['artifact']['sha256']
+    index = build_index(data['features'])
+    index.artifact_sha256 = artifact_sha
+    save_index(index, path)
+    return index
+
+
+def sample_points(index, n, seed=42):
+    """Benchmark points: random vertices of the indexed rings, pulled slightly towards their GN centroid."""
+    rng = np.random.default_rng(seed)
+    centers = geometry.centroids(index.flat)[:, ::-1]
+    v = rng.integers(0, len(index.flat.coords), n)
+    feature = index.flat.ring_feature[np.searchsorted(index.flat.ring_offsets, v, side='right') - 1]
+    t = rng.uniform(0.05, 1.0, n)[:, None]
+    lonlat = centers[feature] + t * (index.flat.coords[v] - centers[feature])
+    return lonlat[:, 1], lonlat[:, 0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve GPS points to GN divisions.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('build', help="Build and save the spatial index")
+    p_lookup = sub.add_parser('lookup', help="Attach GN_UID and census attributes to a CSV of points")
+    p_lookup.add_argument('points', help="CSV with latitude / longitude columns")
+    p_lookup.add_argument('--lat-col', default='lat')
+    p_lookup.add_argument('--lon-col', default='lon')
+    p_lookup.add_argument('--output', help="CSV to write (default: print a summary)")
+    p_bench = sub.add_parser('bench', help="Lookup throughput on sampled points")
+    p_bench.add_argument('--points', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        index = build()
+        print(f"Indexed {len(index.order):,} GN features ({len(index.children)} tree levels) "
+              f"-> {INDEX_PATH} ({INDEX_PATH.stat().st_size / 1e6:.1f} MB, {time.perf_counter() - start:.1f}s)")
+        return
+
+    start = time.perf_counter()
+    index = load_index()
+    if index is None:
+        print("Error: spatial index missing or stale; run `python src/spatial_index.py build` first.")
+        sys.exit(1)
+    print(f"Loaded index in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    if args.command == 'lookup':
+        df = pd.read_csv(args.points)
+        start = time.perf_counter()
+        result = attach_census(df, index, args.lat_col, args.lon_col)
+        matched = int((result['GN_UID'] >= 0).sum())
+        print(f"Resolved {matched:,} of {len(df):,} points in {time.perf_counter() - start:.2f}s")
+        if args.output:
+            result.to_csv(args.output, index=False)
+            print(f"Saved to {args.output}")
+        else:
+            print(result.head(10).to_string(index=False))
+        return
+
+    lat, lon = sample_points(index, args.points)
+    start = time.perf_counter()
+    uid = lookup_gn_uid(index, lat, lon)
+    elapsed = time.perf_counter() - start
+    print(f"{args.points:,} points in {elapsed:.2f}s ({args.points / elapsed:,.0f} points/s), "
+          f"{(uid >= 0).mean():.1%} inside a census-linked GN")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Synthetic census and boundary generator for load and benchmark testing.
+Scales the real GN table up (10x, 100x, ...) and/or projects it to other
+census years without network access:
+  - hierarchy: every real DS Division is repeated once per copy ("Kandy 2",
+    ...) under the same Province and District names; copies get their own
+    District codes so GN_UID stays unique (census_store.make_gn_uid),
+  - counts: each synthetic GN draws its population around its source GN
+    (Poisson with log-normal dispersion and a yearly growth rate), then
+    splits it by sex (binomial) and age group (multinomial) with the source
+    GN's shares, so national sex and age marginals are preserved,
+  - boundaries: each district's GNs tile a jittered square grid around the
+    district center, keyed like GN_census_merged.geojson (shapeName,
+    shapeID, District_Name, DS_Division_Name) so linkage, simplification
+    and tiling run unchanged,
+  - raw sheet: the data rows of the Excel Population sheet are replicated
+    below its header block, some counts as "1,234" text, for clean_census.
+
+Usage:
+    python src/synth_census.py --scale 10 [--years 2024 2030] [--format csv]
+        [--edge-points 4] [--no-geojson] [--output-dir data/synthetic]
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from census_store import COUNT_COLUMNS, load_census, make_gn_uid, write_store
+from geometry import district_center
+
+OUTPUT_DIR = Path(__file__).parent.parent / "data" / "synthetic"
+
+BASE_YEAR = 2024
+GROWTH_RATE = 0.006     # per year
+DISPERSION = 0.15       # log-normal sigma of a synthetic GN around its source GN
+SEED = 42
+
+# Copy k of a district gets District_Code + k * 100. GN_UID is
+# District_Code * 100000 + ..., so 200 copies still fit in int32.
+DISTRICT_CODE_STRIDE = 100
+MAX_SCALE = 200
+
+# Vertex jitter as a fraction of the grid cell (interior vertices only)
+JITTER = 0.25
+COORD_DECIMALS = 6
+
+ID_COLUMNS = ['Province_Code', 'Province', 'District_Code', 'District', 'DS_Code', 'DS_Division',
+              'GN_Code', 'GN_Division', 'GN_Number']
+AGE_COLUMNS = ['Age_0_14', 'Age_15_59', 'Age_60_64', 'Age_65_Plus']
+
+# Count columns of the raw Population sheet, and every how many rows one
+# is written as text with thousands separators
+RAW_COUNT_INDICES = [9, 10, 11, 12, 13, 14, 15, 16]
+RAW_TEXT_EVERY = 10
+
+
+def synth_census(base, scale=1, year=BASE_YEAR, growth=GROWTH_RATE, seed=SEED):
+    """Cleaned census frame with `scale` synthetic GNs per real GN, for `year`."""
+    if not 1 <= scale <= MAX_SCALE:
+        raise ValueError(f"scale must be between 1 and {MAX_SCALE}")
+    rng = np.random.default_rng([seed, year])
+
+    parts = []
+    for k in range(scale):
+        part = base[ID_COLUMNS].copy()
+        for col in ('Province', 'District', 'DS_Division'):
+            part[col] = part[col].astype(str)
+        if k:
+            part['District_Code'] = part['District_Code'].astype('int32') + k * DISTRICT_CODE_STRIDE
+            part['DS_Division'] = part['DS_Division'] + f" {k + 1}"
+        parts.append(part)
+    df = pd.concat(parts, ignore_index=True)
+
+    source = base[COUNT_COLUMNS].to_numpy(dtype=np.float64)
+    source = np.tile(source, (scale, 1))
+    total = source[:, 0]
+    safe_total = np.where(total > 0, total, 1)
+
+    expected = total * (1 + growth) ** (year - BASE_YEAR) * rng.lognormal(0, DISPERSION, len(df))
+    new_total = rng.poisson(expected)
+    p_male = np.where(total > 0, source[:, 1] / safe_total, 0.5)
+    male = rng.binomial(new_total, p_male)
+
+    ages = source[:, 3:7]
+    age_sum = ages.sum(axis=1, keepdims=True)
+    shares = np.where(age_sum > 0, ages / np.where(age_sum > 0, age_sum, 1), 0.25)
+    age_counts = rng.multinomial(new_total, shares)
+
+    df['Total_Population'] = new_total
+    df['Male'] = male
+    df['Female'] = new_total - male
+    for i, col in enumerate(AGE_COLUMNS):
+        df[col] = age_counts[:, i]
+    return df
+
+
+def _district_center(name):
+    center = district_center(name)
+    if center is None:
+        raise KeyError(f"No center known for district {name!r}")
+    return center
+
+
+def cell_size(counts):
+    """
+    Largest grid cell (degrees) at which no two district squares overlap.
+    `counts` maps district name -> number of GN cells.
+    """
+    names = list(counts)
+    centers = np.array([_district_center(n) for n in names])
+    half = np.ceil(np.sqrt([counts[n] for n in names])) / 2
+    sep = np.abs(centers[:, None, :] - centers[None, :, :]).max(axis=2)
+    reach = half[:, None] + half[None, :]
+    np.fill_diagonal(sep, np.inf)
+    return 0.95 * float((sep / reach).min())
+
+
+def district_rings(n, center, size, edge_points, rng):
+    """(n, 4 * edge_points + 1, 2) closed [lon, lat] rings tiling a square around `center`."""
+    m = int(np.ceil(np.sqrt(n)))
+    lat0 = center[0] + m * size / 2
+    lon0 = center[1] - m * size / 2
+    ii, jj = np.meshgrid(np.arange(m + 1), np.arange(m + 1), indexing='ij')
+    lattice = np.stack([lon0 + jj * size, lat0 - ii * size], axis=-1).astype(np.float64)
+    lattice[1:-1, 1:-1] += rng.uniform(-JITTER, JITTER, (m - 1, m - 1, 2)) * size
+
+    cells = np.arange(n)
+    r, c = cells // m, cells % m
+    corners = np.stack([lattice[r, c], lattice[r, c + 1], lattice[r + 1, c + 1], lattice[r + 1, c]], axis=1)
+    nxt = np.roll(corners, -1, axis=1)
+    t = np.arange(edge_points) / edge_points
+    edges = corners[:, :, None, :] + t[None, None, :, None] * (nxt - corners)[:, :, None, :]
+    rings = edges.reshape(n, 4 * edge_points, 2)
+    return np.round(np.concatenate([rings, rings[:, :1]], axis=1), COORD_DECIMALS)
+
+
+def write_boundaries(df, path, edge_points=4, seed=SEED):
+    """
+    Write a FeatureCollection with one polygon per census row, streamed
+    district by district. Returns the number of features written.
+    """
+    uid = make_gn_uid(df['District_Code'], df['DS_Code'], df['GN_Code']).to_numpy()
+    order = df.assign(GN_UID=uid).sort_values(['District', 'District_Code', 'DS_Code', 'GN_Code'])
+    counts = order.groupby('District', sort=False).size().to_dict()
+    size = cell_size(counts)
+    rng = np.random.default_rng(seed)
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"type": "FeatureCollection", "features": [\n')
+        first = True
+        for district, rows in order.groupby('District', sort=False):
+            rings = district_rings(len(rows), _district_center(district), size, edge_points, rng)
+            for row, ring in zip(rows.itertuples(index=False), rings.tolist()):
+                feature = {
+                    'type': 'Feature',
+                    'properties': {
+                        'shapeName': row.GN_Division, 'shapeID': f"SYN{row.GN_UID}", 'shapeISO': '',
+                        'shapeGroup': 'LKA', 'shapeType': 'ADM4', 'District_Name': district,
+                        'DS_Division_Name': row.DS_Division, 'Sex_Total': int(row.Total_Population),
+                    },
+                    'geometry': {'type': 'Polygon', 'coordinates': [ring]},
+                }
+                f.write(('' if first else ',\n') + json.dumps(feature, ensure_ascii=False))
+                first = False
+        f.write('\n]}\n')
+    return len(order)
+
+
+def scale_raw(df_raw, header_idx, factor):
+    """Raw Population sheet with its data rows replicated `factor` times below the header block."""
+    head = df_raw.iloc[:header_idx + 2]
+    data = df_raw.iloc[header_idx + 2:].copy()
+    dirty = data.index[::RAW_TEXT_EVERY]
+    for col in RAW_COUNT_INDICES:
+        data.loc[dirty, col] = data.loc[dirty, col].map(lambda v: f"{v:,}" if isinstance(v, int) else v)
+    return pd.concat([head] + [data] * factor, ignore_index=True)
+
+
+def marginals(df):
+    """National sex ratio and age shares, for comparing synthetic and real data."""
+    sums = df[COUNT_COLUMNS].sum()
+    out = {'Total_Population': int(sums['Total_Population']),
+           'Males_per_100_Females': round(float(100 * sums['Male'] / sums['Female']), 2)}
+    for col in AGE_COLUMNS:
+        out[col] = round(float(100 * sums[col] / sums['Total_Population']), 2)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic census tables and matching boundaries.")
+    parser.add_argument('--scale', type=int, default=10, help=f"Synthetic GNs per real GN (1-{MAX_SCALE})")
+    parser.add_argument('--years', type=int, nargs='+', default=[BASE_YEAR])
+    parser.add_argument('--growth', type=float, default=GROWTH_RATE, help="Yearly population growth rate")
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet')
+    parser.add_argument('--edge-points', type=int, default=4, help="Vertices per polygon edge")
+    parser.add_argument('--no-geojson', action='store_true', help="Skip the boundary file")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--output-dir', type=Path, default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    base = load_census()
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    print(f"Real data: {len(base):,} GN rows {marginals(base)}")
+
+    df = None
+    for year in args.years:
+        start = time.perf_counter()
+        df = synth_census(base, args.scale, year, args.growth, args.seed)
+        path = args.output_dir / f"GN_population_x{args.scale}_{year}.{args.format}"
+        if args.format == 'parquet':
+            write_store(df, path)
+        else:
+            df.to_csv(path, index=False)
+        print(f"{year}: {len(df):,} GN rows -> {path} ({time.perf_counter() - start:.1f}s) {marginals(df)}")
+
+    if not args.no_geojson:
+        # Geometry does not change between years; Sex_Total is from the last year
+        start = time.perf_counter()
+        path = args.output_dir / f"GN_boundaries_x{args.scale}.geojson"
+        n = write_boundaries(df, path, args.edge_points, args.seed)
+        print(f"Boundaries: {n:,} features -> {path} ({path.stat().st_size / 1e6:.1f} MB, "
+              f"{time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,79 @@
-import pandas as pd
+"""
+Census <-> map linkage report for all GN divisions.
+Reads the crosswalk written by build_geojson.py (linking in-process if it
+is missing) and writes mismatch_report.txt with match counts, weak fuzzy
+matches and unmatched GN divisions with their best candidate.
+`--stream` re-links against the raw merged file read feature by feature,
+keeping only properties, so memory does not grow with geometry detail.
+"""
+import argparse
 import json
+from pathlib import Path
 
-# Load CSV
-csv_path = 'data/processed/GN_population_cleaned.csv'
-df = pd.read_csv(csv_path)
-
-# Clean column names same as dashboard
-df.columns = df.columns.str.replace('\n', '_').str.replace('\r', '').str.strip()
-df = df.rename(columns={'DS_Division_Name': 'DS_Division', 'GN_Division_Name': 'GN_Division'})
-
-# Filter for a sample DS Division to narrow down the noise
-# 'Thimbirigasyaya' is a good candidate from previous `view_file`
-target_ds = 'Colombo' 
-df_subset = df[df['DS_Division'].str.strip() == target_ds].copy()
-
-if df_subset.empty:
-    print(f"Warning: No data found for DS Division '{target_ds}'. Using full dataset sample.")
-    df_subset = df.head(50)
-
-csv_names = set(df_subset['GN_Division'].astype(str).str.strip().str.upper())
-
-# Load GeoJSON
-geojson_path = 'data/processed/GN_census_merged.geojson'
-with open(geojson_path, 'r', encoding='utf-8') as f:
-    data = json.load(f)
-
-# Extract GeoJSON properties
-geo_names = set()
-for f in data['features']:
-    p = f['properties']
-    if p.get('shapeName'):
-        geo_names.add(str(p['shapeName']).strip().upper())
-
-# Find mismatches
-missing_in_map = csv_names - geo_names
-found_in_map = csv_names.intersection(geo_names)
-
-with open('mismatch_report.txt', 'w') as f:
-    f.write(f"--- Analysis for DS: {target_ds} ---\n")
-    f.write(f"Total GN in CSV: {len(csv_names)}\n")
-    f.write(f"Successfully Matched: {len(found_in_map)}\n")
-    f.write(f"Missing in Map (CSV has it, Map doesn't): {len(missing_in_map)}\n\n")
-    
-    f.write("--- Missing Examples (CSV Names) ---\n")
-    for name in sorted(list(missing_in_map))[:20]:
-        f.write(f"'{name}'\n")
-        
-    f.write("\n--- Available Map Names (Sample likely matches) ---\n")
-    # Try to find similar names in map for the missing ones (simple fuzzy check)
-    for missing in list(missing_in_map)[:5]:
-        f.write(f"\nLooking for matches for: '{missing}'\n")
-        candidates = [n for n in geo_names if missing[:4] in n]
-        for c in candidates[:5]:
-            f.write(f"  Candidate: '{c}'\n")
+import profiling
+from build_geojson import SOURCE_PATH, load_artifact, resolve_conflicts
+from census_store import load_census
+from geojson_stream import iter_features
+from gn_linkage import CENSUS_COLUMNS, MIN_CONFIDENCE, feature_table, link, link_features, load_crosswalk
+
+REPORT_PATH = 'mismatch_report.txt'
+
+
+def stream_crosswalk(path):
+    """Link the census against features streamed from `path` (conflicts not resolved)."""
+    print(f"Streaming {path}...")
+    features = feature_table(iter_features(path))
+    print(f"  {len(features):,} features read, linking...")
+    return link(load_census(columns=CENSUS_COLUMNS), features)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report census <-> map linkage for all GN divisions.")
+    parser.add_argument('--input', type=Path, default=SOURCE_PATH, help="GeoJSON to link against with --stream")
+    parser.add_argument('--stream', action='store_true', help="Re-link from a streamed GeoJSON (bounded memory)")
+    args = parser.parse_args()
+
+    with profiling.stage('crosswalk'):
+        if args.stream:
+            crosswalk = stream_crosswalk(args.input)
+        else:
+            crosswalk = load_crosswalk()
+            if crosswalk is None:
+                print("Crosswalk not found, linking in-process...")
+                data = load_artifact(verify=True)
+                if data is None:
+                    with open(SOURCE_PATH, 'r', encoding='utf-8') as f:
+                        data = resolve_conflicts(json.load(f))
+                crosswalk = link_features(data)
+
+    counts = crosswalk['method'].value_counts()
+    fuzzy = crosswalk[crosswalk['method'] == 'trigram'].sort_values('confidence')
+    unmatched = crosswalk[crosswalk['method'] == 'unmatched']
+
+    with open(REPORT_PATH, 'w') as f:
+        f.write("--- Linkage Analysis: all GN Divisions ---\n")
+        f.write(f"Total GN in census: {len(crosswalk)}\n")
+        f.write(f"Exact name matches: {counts.get('exact', 0)}\n")
+        f.write(f"Fuzzy (trigram) matches: {counts.get('trigram', 0)}\n")
+        f.write(f"Missing in Map (confidence < {MIN_CONFIDENCE}): {len(unmatched)}\n\n")
+
+        f.write("--- Unmatched by DS Division ---\n")
+        by_ds = unmatched.groupby(['District', 'DS_Division']).size().sort_values(ascending=False)
+        for (district, ds), n in by_ds.head(20).items():
+            f.write(f"{district} / {ds}: {n}\n")
+
+        f.write("\n--- Missing Examples (CSV Name -> best map candidate) ---\n")
+        for row in unmatched.head(50).itertuples(index=False):
+            f.write(f"'{row.GN_Division.upper()}' ({row.District} / {row.DS_Division}) -> "
+                    f"'{row.shapeName}' [{row.confidence:.2f}]\n")
+
+        f.write("\n--- Weakest Fuzzy Matches (review) ---\n")
+        for row in fuzzy.head(50).itertuples(index=False):
+            f.write(f"'{row.GN_Division.upper()}' -> '{row.shapeName}' [{row.confidence:.2f}]\n")
+
+    print(f"Linkage: {counts.get('exact', 0)} exact, {counts.get('trigram', 0)} fuzzy, "
+          f"{len(unmatched)} unmatched. Report saved to {REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,137 +1,400 @@
 """
 Full verification of ALL GN Division positions in GeoJSON.
+Checks every ring of every polygon against the Sri Lanka bounds, each
+feature's centroid against the center of the district it claims, and flags
+identical geometries claimed by different districts.
+
+The file is split into byte-range shards that worker processes parse and
+check independently; shard results merge into one report, written both as
+text and as JSON. `--stream` runs in a single process, feature by feature
+(bounded memory, results per batch).
+
+Duplicate detection needs every feature's geometry hash, so the hashes are
+spilled to sorted run files of at most RUN_KEYS entries and merged at the
+end. Each process holds at most RUN_KEYS hashes plus one STREAM_BATCH of
+features, the merge one line per run file, and the report at most
+MAX_EXAMPLES examples per check plus the duplicate groups found.
 """
+import argparse
+import hashlib
+import heapq
+import itertools
 import json
+import math
+import os
+import tempfile
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import numpy as np
+
+import geometry
+import profiling
+from geojson_stream import batched, iter_batches, iter_features, iter_features_range, shard_ranges
+from gn_linkage import load_crosswalk
+
 # Sri Lanka geographic bounds
 SRI_LANKA_BOUNDS = {
     'lat_min': 5.8, 'lat_max': 10.0,
     'lon_min': 79.4, 'lon_max': 82.1
 }
 
-# District approximate centers for validation
-DISTRICT_CENTERS = {
-    'COLOMBO': (6.93, 79.85),
-    'GAMPAHA': (7.09, 80.00),
-    'KALUTARA': (6.58, 79.96),
-    'KANDY': (7.29, 80.64),
-    'MATALE': (7.47, 80.62),
-    'NUWARA ELIYA': (6.97, 80.78),
-    'GALLE': (6.05, 80.22),
-    'MATARA': (5.95, 80.54),
-    'HAMBANTOTA': (6.12, 81.12),
-    'JAFFNA': (9.66, 80.01),
-    'KILINOCHCHI': (9.38, 80.40),
-    'MANNAR': (8.98, 79.90),
-    'MULLAITIVU': (9.27, 80.81),
-    'VAVUNIYA': (8.75, 80.50),
-    'TRINCOMALEE': (8.57, 81.23),
-    'BATTICALOA': (7.73, 81.70),
-    'AMPARA': (7.30, 81.67),
-    'KURUNEGALA': (7.49, 80.36),
-    'PUTTALAM': (8.03, 79.83),
-    'ANURADHAPURA': (8.31, 80.41),
-    'POLONNARUWA': (7.94, 81.00),
-    'BADULLA': (6.99, 81.05),
-    'MONARAGALA': (6.87, 81.35),
-    'RATNAPURA': (6.68, 80.40),
-    'KEGALLE': (7.25, 80.35),
-}
+# A centroid farther than this (degrees, ~80 km) from its claimed district's
+# center is flagged; larger than the radius of the biggest district
+MAX_CENTER_DISTANCE = 0.75
 
-def get_centroid(geom):
-    """Calculate approximate centroid from geometry."""
-    try:
-        geom_type = geom.get('type', '')
-        coords = geom.get('coordinates', [])
-        
-        if not coords:
-            return None, None
-        
-        if geom_type == 'Polygon':
-            points = coords[0]
-        elif geom_type == 'MultiPolygon':
-            points = coords[0][0]
+
+GEOJSON_PATH = Path("data/processed/GN_census_merged.geojson")
+REPORT_PATH = 'position_verification_report.txt'
+JSON_REPORT_PATH = 'position_verification_report.json'
+STREAM_BATCH = 2000
+
+# Upper bound on the text one worker holds at a time
+SHARD_BYTES = 32 << 20
+
+# Geometries equal after rounding to this many decimals are duplicates
+HASH_DECIMALS = 7
+
+# Examples kept per check for the reports (counts cover every feature)
+MAX_EXAMPLES = 1000
+
+# Geometry hashes held in memory before they are written as a sorted run
+RUN_KEYS = 100_000
+
+
+def _linked_elsewhere(props, uid_by_shape):
+    """True when the feature's shapeID links to a GN of another district than it claims."""
+    link = uid_by_shape.get(props.get('shapeID'))
+    return (link is not None and
+            geometry.canonical_district(link[1]) != geometry.canonical_district(props.get('District_Name', '')))
+
+
+def _record(props, uid_by_shape, **extra):
+    """
+    Machine-readable identity of a feature for the report. GN_UID is the
+    census GN its shapeID links to; when that GN lies in another district
+    than the feature claims, it is reported as linked_GN_UID with a
+    district mismatch instead.
+    """
+    record = {'shapeID': props.get('shapeID', ''), 'shapeName': props.get('shapeName', 'Unknown'),
+              'District': props.get('District_Name', ''), 'GN_UID': None, 'district_mismatch': False}
+    link = uid_by_shape.get(props.get('shapeID'))
+    if link is not None:
+        uid, linked_district = link
+        if _linked_elsewhere(props, uid_by_shape):
+            record.update(district_mismatch=True, linked_GN_UID=int(uid), linked_District=linked_district)
         else:
-            return None, None
-        
-        if not points or not isinstance(points[0], list):
-            return None, None
-        
-        lons = [p[0] for p in points]
-        lats = [p[1] for p in points]
-        
-        return sum(lats) / len(lats), sum(lons) / len(lons)
-    except (IndexError, TypeError, ZeroDivisionError):
-        return None, None
+            record['GN_UID'] = int(uid)
+    return {**record, **extra}
 
-def main():
-    geojson_path = Path("data/processed/GN_census_merged.geojson")
-    
-    print("Loading GeoJSON (this may take a moment)...")
-    with open(geojson_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    total = len(data['features'])
-    print(f"Total features to check: {total}\n")
-    
-    # Counters
-    in_bounds = 0
-    out_bounds = 0
-    no_geometry = 0
-    out_bounds_examples = []
-    
-    print("Checking ALL features...")
-    for i, feature in enumerate(data['features']):
-        if (i + 1) % 5000 == 0:
-            print(f"  Progress: {i+1}/{total}")
-        
-        geom = feature.get('geometry', {})
-        lat, lon = get_centroid(geom)
-        
-        if lat is None or lon is None:
-            no_geometry += 1
+
+def _describe(record):
+    district = record['District'] or 'no district'
+    if record['district_mismatch']:
+        return (f"{record['shapeName']} ({district}) [district mismatch: shapeID links to "
+                f"GN_UID {record['linked_GN_UID']} in {record['linked_District']}]")
+    uid = record['GN_UID'] if record['GN_UID'] is not None else 'unlinked'
+    return f"{record['shapeName']} ({district}) [GN_UID {uid}]"
+
+
+def geometry_hashes(flat):
+    """SHA-1 of each feature's rounded vertex sequence (None without geometry)."""
+    coords = np.round(flat.coords, HASH_DECIMALS)
+    starts = flat.ring_offsets[flat.feature_offsets[:-1]]
+    ends = flat.ring_offsets[flat.feature_offsets[1:]]
+    return [hashlib.sha1(coords[s:e].tobytes()).hexdigest() if e > s else None
+            for s, e in zip(starts, ends)]
+
+
+def check_batch(features, uid_by_shape):
+    """Ring bounds, district-proximity and geometry-hash checks for a list of features."""
+    flat = geometry.flatten_features(features)
+    n = flat.n_features
+    cents = geometry.centroids(flat)
+    lat, lon = cents[:, 0], cents[:, 1]
+    has_geometry = ~np.isnan(lat)
+
+    # Every ring must lie fully inside the bounds
+    boxes = geometry.ring_bounding_boxes(flat)
+    ring_out = ((boxes[:, 1] < SRI_LANKA_BOUNDS['lat_min']) | (boxes[:, 3] > SRI_LANKA_BOUNDS['lat_max']) |
+                (boxes[:, 0] < SRI_LANKA_BOUNDS['lon_min']) | (boxes[:, 2] > SRI_LANKA_BOUNDS['lon_max']))
+    rings_out = np.bincount(flat.ring_feature, weights=ring_out, minlength=n).astype(np.int64)
+    inside = has_geometry & (rings_out == 0)
+
+    # Distance to the claimed district's center (NaN when the district is unknown)
+    props = [f.get('properties') or {} for f in features]
+    district = [str(p.get('District_Name', '')).upper().strip() for p in props]
+    centers = np.array([geometry.district_center(d, (np.nan, np.nan)) for d in district]).reshape(-1, 2)
+    distance = np.hypot(lat - centers[:, 0], lon - centers[:, 1])
+    far = has_geometry & (distance > MAX_CENTER_DISTANCE)
+
+    out_bounds = [_record(props[i], uid_by_shape, lat=round(float(lat[i]), 4), lon=round(float(lon[i]), 4),
+                          rings_out_of_bounds=int(rings_out[i]))
+                  for i in np.flatnonzero(has_geometry & ~inside)]
+    far_from = [_record(props[i], uid_by_shape, distance=round(float(distance[i]), 2))
+                for i in np.flatnonzero(far)]
+    # (hash, district, shapeID, shapeName): duplicates are only visible across
+    # shards, so the keys are spilled to run files (spill_keys)
+    keys = [(h, district[i], props[i].get('shapeID', ''), props[i].get('shapeName', 'Unknown'))
+            for i, h in enumerate(geometry_hashes(flat)) if h is not None]
+
+    return {
+        'total': len(features),
+        'in_bounds': int(inside.sum()),
+        'no_geometry': int((~has_geometry).sum()),
+        'rings': flat.n_rings,
+        'rings_out_of_bounds': int(ring_out.sum()),
+        'far_from_district': int(far.sum()),
+        'linked': sum(1 for p in props if p.get('shapeID') in uid_by_shape),
+        'district_mismatch': sum(1 for p in props if _linked_elsewhere(p, uid_by_shape)),
+        'out_bounds_examples': out_bounds,
+        'far_examples': far_from,
+        'geometry_keys': keys,
+    }
+
+
+def accumulate(merged, result):
+    """
+    Add one batch / shard result into `merged` in place: counts add, lists
+    extend (example lists only up to MAX_EXAMPLES).
+    """
+    for key, value in result.items():
+        if not isinstance(value, list):
+            merged[key] = merged.get(key, 0) + value
             continue
-        
-        if (SRI_LANKA_BOUNDS['lat_min'] <= lat <= SRI_LANKA_BOUNDS['lat_max'] and
-            SRI_LANKA_BOUNDS['lon_min'] <= lon <= SRI_LANKA_BOUNDS['lon_max']):
-            in_bounds += 1
-        else:
-            out_bounds += 1
-            if len(out_bounds_examples) < 10:
-                name = feature['properties'].get('shapeName', 'Unknown')
-                out_bounds_examples.append(f"{name}: ({lat:.4f}, {lon:.4f})")
-    
+        items = merged.setdefault(key, [])
+        if key.endswith('_examples'):
+            value = value[:max(MAX_EXAMPLES - len(items), 0)]
+        items.extend(value)
+    return merged
+
+
+def spill_keys(merged, run_dir, limit=RUN_KEYS):
+    """
+    Write the geometry keys accumulated in `merged` to a sorted run file in
+    `run_dir` once there are `limit` of them (any, with limit=0); the
+    file's path is added to merged['key_runs'].
+    """
+    keys = merged.get('geometry_keys')
+    if not keys or len(keys) < limit:
+        return merged
+    path = Path(run_dir) / f"keys_{uuid.uuid4().hex}.jsonl"
+    with open(path, 'w', encoding='utf-8') as f:
+        # The fixed-width hex digest leads each line, so lines sort by digest
+        f.writelines(sorted(json.dumps(list(key), ensure_ascii=False) + '\n' for key in keys))
+    merged['geometry_keys'] = []
+    merged.setdefault('key_runs', []).append(str(path))
+    return merged
+
+
+def _merged_keys(run_paths):
+    """All keys of the sorted run files, in digest order."""
+    files = [open(path, 'r', encoding='utf-8') for path in run_paths]
+    try:
+        for line in heapq.merge(*files):
+            yield json.loads(line)
+    finally:
+        for f in files:
+            f.close()
+
+
+def find_duplicates(run_paths, uid_by_shape):
+    """Groups of identical geometries claimed by more than one district, from sorted key runs."""
+    duplicates = []
+    for digest, group in itertools.groupby(_merged_keys(run_paths), key=lambda key: key[0]):
+        members = [(district, shape_id, name) for _, district, shape_id, name in group]
+        districts = sorted({d for d, _, _ in members})
+        if len(districts) > 1:
+            duplicates.append({
+                'geometry_sha1': digest,
+                'districts': [d.title() for d in districts],
+                'features': [_record({'shapeID': s, 'shapeName': n, 'District_Name': d.title()}, uid_by_shape)
+                             for d, s, n in members],
+            })
+    return duplicates
+
+
+def _init_worker(uid_by_shape, pool_worker=False):
+    global _UID_BY_SHAPE
+    _UID_BY_SHAPE = uid_by_shape
+    # Forked from a profiled parent: allocations are only traced there
+    if pool_worker and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def check_shard(job):
+    """Worker: parse and check the features starting in one byte range."""
+    path, start, end, run_dir = job
+    t0 = time.perf_counter()
+    merged = {'total': 0}
+    for batch in batched(iter_features_range(path, start, end), STREAM_BATCH):
+        spill_keys(accumulate(merged, check_batch(batch, _UID_BY_SHAPE)), run_dir)
+    spill_keys(merged, run_dir, limit=0)
+    merged['shards'] = [{'start': start, 'end': end, 'features': merged['total'],
+                         'seconds': round(time.perf_counter() - t0, 3)}]
+    return merged
+
+
+def load_uid_map():
+    """shapeID -> (GN_UID, census District) from the integer crosswalk (None if not built)."""
+    crosswalk = load_crosswalk()
+    if crosswalk is None:
+        return None
+    linked = crosswalk[crosswalk['shapeID'] != '']
+    return dict(zip(linked['shapeID'], zip(linked['GN_UID'].astype(int).tolist(), linked['District'])))
+
+
+def run_parallel(path, uid_by_shape, run_dir, workers=None):
+    workers = workers or os.cpu_count() or 1
+    n_shards = max(workers, math.ceil(os.path.getsize(path) / SHARD_BYTES))
+    jobs = [(path, start, end, run_dir) for start, end in shard_ranges(path, n_shards)]
+    print(f"Checking {path} in {len(jobs)} shards on {workers} worker(s)...")
+    result = {}
+    if workers == 1:
+        _init_worker(uid_by_shape)
+        for r in map(check_shard, jobs):
+            accumulate(result, r)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(uid_by_shape, True)) as pool:
+            for r in pool.map(check_shard, jobs):
+                accumulate(result, r)
+
+    if result['total'] == 0 and next(iter_features(path), None) is not None:
+        # Feature objects not written with "type" first: shards cannot find them
+        print("Feature boundaries not recognized for sharding; falling back to streaming.")
+        return run_streaming(path, uid_by_shape, run_dir)
+    return result
+
+
+def run_streaming(path, uid_by_shape, run_dir):
+    print(f"Streaming {path} in batches of {STREAM_BATCH}...")
+    start = time.perf_counter()
+    merged = {}
+    for batch in iter_batches(path, STREAM_BATCH):
+        r = check_batch(batch, uid_by_shape)
+        spill_keys(accumulate(merged, r), run_dir)
+        done = merged['total']
+        print(f"  {done:>7,} checked ({time.perf_counter() - start:.1f}s): "
+              f"{r['total'] - r['in_bounds'] - r['no_geometry']} out of bounds, "
+              f"{r['far_from_district']} far from district in this batch")
+        for ex in r['out_bounds_examples'][:3]:
+            print(f"    ✗ {_describe(ex)}: ({ex['lat']:.4f}, {ex['lon']:.4f})")
+    return spill_keys(merged, run_dir, limit=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify GN feature positions.")
+    parser.add_argument('--input', type=Path, default=GEOJSON_PATH, help="GeoJSON FeatureCollection to check")
+    parser.add_argument('--stream', action='store_true', help="Single process, feature by feature (bounded memory)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with profiling.stage('load_crosswalk'):
+        uid_by_shape = load_uid_map()
+    with tempfile.TemporaryDirectory(prefix='verify_positions_') as run_dir:
+        with profiling.stage('check_features'):
+            if args.stream:
+                result = run_streaming(args.input, uid_by_shape or {}, run_dir)
+            else:
+                result = run_parallel(args.input, uid_by_shape or {}, run_dir, args.workers)
+        with profiling.stage('find_duplicates'):
+            duplicates = find_duplicates(result.pop('key_runs', []), uid_by_shape or {})
+    result.pop('geometry_keys', None)
+
+    total = result['total']
+    in_bounds = result['in_bounds']
+    no_geometry = result['no_geometry']
+    out_bounds = total - in_bounds - no_geometry
+    far = result['far_from_district']
+
     # Results
     print("\n" + "="*60)
     print("FULL VERIFICATION RESULTS")
     print("="*60)
     print(f"Total features:       {total:,}")
     print(f"In Sri Lanka bounds:  {in_bounds:,} ({100*in_bounds/total:.2f}%)")
-    print(f"Out of bounds:        {out_bounds:,}")
+    print(f"Out of bounds:        {out_bounds:,} ({result['rings_out_of_bounds']:,} of {result['rings']:,} rings)")
     print(f"No valid geometry:    {no_geometry:,}")
-    
-    if out_bounds_examples:
+    print(f"Far from district:    {far:,} (> {MAX_CENTER_DISTANCE} deg from claimed center)")
+    print(f"Cross-district dups:  {len(duplicates):,} geometries")
+    if uid_by_shape is not None:
+        print(f"Linked to census:     {result['linked']:,} "
+              f"({result['district_mismatch']:,} linked to a GN in another district)")
+    print(f"Checked in {time.perf_counter() - start:.1f}s")
+
+    if result['out_bounds_examples']:
         print("\nOut of bounds examples:")
-        for ex in out_bounds_examples:
-            print(f"  ✗ {ex}")
-    
+        for ex in result['out_bounds_examples'][:10]:
+            print(f"  ✗ {_describe(ex)}: ({ex['lat']:.4f}, {ex['lon']:.4f}), "
+                  f"{ex['rings_out_of_bounds']} ring(s) outside")
+    if result['far_examples']:
+        print("\nFar from claimed district examples:")
+        for ex in result['far_examples'][:10]:
+            print(f"  ✗ {_describe(ex)}: {ex['distance']:.2f} deg from {ex['District'].title()} center")
+    if duplicates:
+        print("\nDuplicate geometries across districts:")
+        for dup in duplicates[:10]:
+            print(f"  ✗ {', '.join(_describe(r) for r in dup['features'])} ({' / '.join(dup['districts'])})")
+
     # Save detailed report
-    with open('position_verification_report.txt', 'w') as f:
+    with open(REPORT_PATH, 'w') as f:
         f.write("FULL GN POSITION VERIFICATION REPORT\n")
         f.write("="*50 + "\n\n")
         f.write(f"Total features: {total}\n")
         f.write(f"In Sri Lanka bounds: {in_bounds} ({100*in_bounds/total:.2f}%)\n")
         f.write(f"Out of bounds: {out_bounds}\n")
-        f.write(f"No valid geometry: {no_geometry}\n\n")
-        
+        f.write(f"Rings out of bounds: {result['rings_out_of_bounds']} of {result['rings']}\n")
+        f.write(f"No valid geometry: {no_geometry}\n")
+        f.write(f"Far from claimed district center: {far}\n")
+        f.write(f"Duplicate geometries across districts: {len(duplicates)}\n")
+        if uid_by_shape is not None:
+            f.write(f"Linked to census (GN_UID): {result['linked']}\n")
+            f.write(f"Linked to a GN in another district: {result['district_mismatch']}\n")
+        f.write("\n")
+
         if in_bounds == total - no_geometry:
             f.write("RESULT: ALL GN divisions are correctly positioned within Sri Lanka!\n")
         else:
             f.write(f"RESULT: {out_bounds} features may have position issues.\n")
-    
-    print("\nDetailed report saved to: position_verification_report.txt")
-    
+        if result['far_examples']:
+            shown = '' if far == len(result['far_examples']) else f" (first {len(result['far_examples'])})"
+            f.write(f"\nFar from claimed district{shown}:\n")
+            for ex in result['far_examples']:
+                f.write(f"  {_describe(ex)}: {ex['distance']:.2f} deg from {ex['District'].title()} center\n")
+        if duplicates:
+            f.write("\nDuplicate geometries across districts:\n")
+            for dup in duplicates:
+                f.write(f"  {', '.join(_describe(r) for r in dup['features'])} ({' / '.join(dup['districts'])})\n")
+
+    report = {
+        'input': str(args.input),
+        'checked_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'mode': 'stream' if args.stream else 'parallel',
+        'bounds': SRI_LANKA_BOUNDS,
+        'max_center_distance': MAX_CENTER_DISTANCE,
+        'summary': {
+            'total': total, 'in_bounds': in_bounds, 'out_of_bounds': out_bounds,
+            'no_geometry': no_geometry, 'rings': result['rings'],
+            'rings_out_of_bounds': result['rings_out_of_bounds'],
+            'far_from_district': far, 'duplicate_geometries': len(duplicates),
+            'linked': result['linked'] if uid_by_shape is not None else None,
+            'district_mismatch': result['district_mismatch'] if uid_by_shape is not None else None,
+        },
+        'out_of_bounds': result['out_bounds_examples'],
+        'far_from_district': result['far_examples'],
+        'duplicates': duplicates,
+        'shards': result.get('shards', []),
+    }
+    with open(JSON_REPORT_PATH, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\nDetailed report saved to: {REPORT_PATH} (JSON: {JSON_REPORT_PATH})")
+
     if in_bounds == total - no_geometry:
         print("\n✅ ALL GN divisions are correctly positioned within Sri Lanka!")
     else:
@@ -0,0 +1,46 @@
+import pandas as pd
+
+from census_store import STORE_COLUMNS, make_gn_uid, prepare
+
+
+def cleaned_rows():
+    """Two GN rows as clean_census.py writes them (same GN code in different DS Divisions)."""
+    return pd.DataFrame({
+        'Province_Code': [1, 1], 'Province_Name': ['Western ', 'Western'],
+        'District_Code': [11, 11], 'District_Name': ['Colombo', 'Colombo'],
+        'DS_Code': [3, 12], 'DS_Name': ['Kolonnawa', ' Dehiwala'],
+        'GN_Code': [5, 5], 'GN_Name': [' Wellampitiya', 'Kawdana East'], 'GN_Number': [' 495', '540A'],
+        'Total_Population': [1000, '12'], 'Male': [480, 0], 'Female': [520, 12],
+        'Age_0_14': [200, 2], 'Age_15_59': [600, 0], 'Age_60_64': [100, 4], 'Age_65_Plus': [100, 6],
+    })
+
+
+def test_make_gn_uid_keeps_repeated_gn_codes_apart():
+    uid = make_gn_uid(pd.Series([11, 11, 25]), pd.Series([3, 12, 99]), pd.Series([5, 5, 999]))
+    assert uid.tolist() == [1103005, 1112005, 2599999]
+    assert uid.dtype == 'int32'
+
+
+def test_make_gn_uid_largest_codes_fit_int32():
+    uid = make_gn_uid(pd.Series([25], dtype='int16'), pd.Series([99], dtype='int16'),
+                      pd.Series([999], dtype='int16'))
+    assert uid.iloc[0] == 2599999
+
+
+def test_prepare_layout_and_types():
+    df = prepare(cleaned_rows())
+    assert list(df.columns) == STORE_COLUMNS
+    assert df['GN_UID'].tolist() == [1103005, 1112005]
+    assert df['Total_Population'].dtype == 'int32'
+    assert df['Total_Population'].tolist() == [1000, 12]
+    assert df['District_Code'].dtype == 'int16'
+    assert isinstance(df['Province'].dtype, pd.CategoricalDtype)
+    assert df['Province'].astype(str).tolist() == ['Western', 'Western']
+    assert df['GN_Number'].tolist() == ['495', '540A']
+
+
+def test_prepare_derived_columns():
+    df = prepare(cleaned_rows())
+    assert df['Sex_Ratio'].tolist() == [108.3, 1200.0]  # zero males divide by 1
+    assert df['Dependency_Ratio'].iloc[0] == 66.7
+    assert df['GN_Link_Key'].tolist() == ['COLOMBO|WELLAMPITIYA', 'COLOMBO|KAWDANA EAST']
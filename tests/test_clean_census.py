@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench_clean_census import clean_and_convert
+from clean_census import clean_numeric
+
+COLUMNS = {
+    'ints': [0, 12, 1_234_567, -3],
+    'floats': [1.0, 2.9, -2.9, np.nan],
+    'text': ['1,234', ' 56 ', '-', ''],
+    'mixed': [7, '1,000', 3.5, None],
+    'odd_text': ['3.5', ' ', '+12', '1_000'],
+    'empty': [None, None, np.nan, None],
+    'bools': [True, False, True, False],
+}
+
+
+@pytest.mark.parametrize('name', COLUMNS)
+def test_clean_numeric_matches_per_cell_reference(name):
+    series = pd.Series(COLUMNS[name], dtype=object, name=name)
+    expected = series.apply(clean_and_convert).astype('int64')
+    pd.testing.assert_series_equal(clean_numeric(series), expected)
+
+
+def test_clean_numeric_keeps_index():
+    series = pd.Series(['1,5', 2], index=[10, 20], dtype=object)
+    assert clean_numeric(series).index.tolist() == [10, 20]
@@ -0,0 +1,46 @@
+import plotly.graph_objects as go
+
+from figure_cache import FigureCache, estimate_size, figure_key
+
+
+def figure(n=10):
+    return go.Figure(go.Bar(x=list(range(n)), y=list(range(n))))
+
+
+def builder(fig, calls):
+    def build():
+        calls.append(1)
+        return fig
+    return build
+
+
+def test_figure_key_is_canonical():
+    assert figure_key('bar', ('A', 'B'), {'b': 1, 'a': 2}) == figure_key('bar', ['A', 'B'], {'a': 2, 'b': 1})
+    assert figure_key('bar', ['A']) != figure_key('bar', ['B'])
+
+
+def test_entry_limit_evicts_least_recently_used():
+    cache, calls = FigureCache(max_entries=2), []
+    for key in ('a', 'b'):
+        cache.get_or_build(key, builder(figure(), calls))
+    assert cache.get_or_build('a', builder(figure(), calls))[1] == 'hit'
+    cache.get_or_build('c', builder(figure(), calls))
+
+    assert cache.get_or_build('a', builder(figure(), calls))[1] == 'hit'
+    assert cache.get_or_build('b', builder(figure(), calls))[1] == 'miss'
+    assert cache.evictions == 2  # b for c, then c for b
+    assert cache.stats()['entries'] == 2
+
+
+def test_size_limit_evicts_and_skips_oversized_figures():
+    size = estimate_size(figure())
+    cache, calls = FigureCache(max_bytes=int(size * 2.5)), []
+    for key in ('a', 'b', 'c'):
+        cache.get_or_build(key, builder(figure(), calls))
+    assert cache.stats()['entries'] == 2
+    assert cache.get_or_build('a', builder(figure(), calls))[1] == 'miss'
+
+    big = figure(5000)
+    assert cache.get_or_build('big', builder(big, calls))[0] is big
+    assert cache.get_or_build('big', builder(big, calls))[1] == 'miss'
+    assert cache.stats()['entries'] == 2
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from geojson_stream import iter_features, iter_features_range, shard_ranges
+
+
+def feature(i, name):
+    return {'type': 'Feature', 'id': i, 'properties': {'shapeName': name},
+            'geometry': {'type': 'Polygon', 'coordinates': [[[80.0 + i, 7.0], [80.1, 7.1], [80.0, 7.2], [80.0 + i, 7.0]]]}}
+
+
+@pytest.fixture
+def collection(tmp_path):
+    # Multi-byte names and nested objects straddle every small chunk boundary
+    features = [feature(i, f"Kāḷi {'ම' * i} \"]}}") for i in range(25)]
+    path = tmp_path / "boundaries.geojson"
+    path.write_text(json.dumps({'type': 'FeatureCollection', 'features': features}, ensure_ascii=False),
+                    encoding='utf-8')
+    return path, features
+
+
+@pytest.mark.parametrize('chunk', [7, 64, 1 << 20])
+def test_iter_features_any_chunk_size(collection, chunk):
+    path, features = collection
+    assert list(iter_features(path, chunk_chars=chunk)) == features
+
+
+def test_iter_features_empty_collection(tmp_path):
+    path = tmp_path / "empty.geojson"
+    path.write_text('{"type": "FeatureCollection", "features": [ ]}')
+    assert list(iter_features(path, chunk_chars=4)) == []
+
+
+def test_iter_features_without_features_array(tmp_path):
+    path = tmp_path / "bad.geojson"
+    path.write_text('{"type": "FeatureCollection"}')
+    with pytest.raises(ValueError):
+        list(iter_features(path))
+
+
+def test_shard_ranges_cover_file(collection):
+    path, _ = collection
+    size = path.stat().st_size
+    for n in (1, 3, 16):
+        ranges = shard_ranges(path, n)
+        assert len(ranges) == n
+        assert ranges[0][0] == 0 and ranges[-1][1] == size
+        assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+
+
+def test_shard_ranges_never_exceed_file_size(tmp_path):
+    path = tmp_path / "tiny.geojson"
+    path.write_text('{}')
+    assert shard_ranges(path, 8) == [(0, 1), (1, 2)]
+
+
+@pytest.mark.parametrize('n_shards', [1, 2, 5, 40, 997])
+def test_ranges_yield_every_feature_once(collection, n_shards):
+    path, features = collection
+    found = [f for start, end in shard_ranges(path, n_shards)
+             for f in iter_features_range(path, start, end, chunk_bytes=32)]
+    assert found == features
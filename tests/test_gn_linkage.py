@@ -0,0 +1,36 @@
+from gn_linkage import _assign, normalize_name, trigram_candidates, trigrams
+
+
+def dice(a, b):
+    ga, gb = trigrams(a), trigrams(b)
+    return 2 * len(ga & gb) / (len(ga) + len(gb))
+
+
+def test_normalize_name():
+    assert normalize_name("  Kotahena-East (No.2) ") == 'KOTAHENA EAST NO 2'
+
+
+def test_candidates_scores_and_blocks():
+    left_keys, left_names = ['A', 'A', 'B'], ['KOTAHENA', 'MODARA', 'KOTAHENA']
+    right_keys, right_names = ['A', 'A', 'A'], ['KOTAHENA EAST', 'MODERA', 'XYZ']
+    triples = trigram_candidates(left_keys, left_names, right_keys, right_names)
+
+    assert {(i, j) for _, i, j in triples} == {(0, 0), (1, 1)}  # block B has no features
+    for score, i, j in triples:
+        assert score == dice(left_names[i], right_names[j])
+    assert [t[0] for t in triples] == sorted((t[0] for t in triples), reverse=True)
+
+
+def test_candidates_top_k_keeps_lowest_positions_on_ties():
+    triples = trigram_candidates(['A'], ['GALLE'], ['A'] * 4, ['GALLE'] * 4, top_k=2)
+    assert [(i, j) for _, i, j in triples] == [(0, 0), (0, 1)]
+
+
+def test_candidates_empty_inputs():
+    assert trigram_candidates([], [], ['A'], ['GALLE']) == []
+    assert trigram_candidates(['A'], ['GALLE'], [], []) == []
+
+
+def test_assign_is_one_to_one_best_first():
+    triples = [(0.9, 0, 0), (0.8, 1, 0), (0.7, 1, 1), (0.6, 0, 1), (0.5, 2, 1)]
+    assert _assign(triples) == {0: (0, 0.9), 1: (1, 0.7)}
@@ -0,0 +1,71 @@
+import numpy as np
+
+import geometry
+from simplify import MIN_RING_VERTICES, collapse_levels, resolve_level, simplify
+
+SIDE = 0.0005  # far below every level's tolerance
+
+
+def edge(p, q, n=8):
+    """n points from p towards q (q excluded)."""
+    t = np.arange(n)[:, None] / n
+    return (np.array(p) + t * (np.array(q) - np.array(p))).tolist()
+
+
+def ring(*corners):
+    points = [pt for p, q in zip(corners, corners[1:] + corners[:1]) for pt in edge(p, q)]
+    return points + points[:1]
+
+
+def polygon_feature(coords):
+    return {'type': 'Feature', 'geometry': {'type': 'Polygon', 'coordinates': [coords]}}
+
+
+def kept_rings(flat, mask):
+    out = []
+    for r in range(flat.n_rings):
+        start, end = flat.ring_offsets[r], flat.ring_offsets[r + 1]
+        out.append(flat.coords[start:end][mask[start:end]])
+    return out
+
+
+def test_lone_ring_keeps_minimum_vertices():
+    flat = geometry.flatten_features([polygon_feature(ring((0, 0), (SIDE, 0), (SIDE, SIDE), (0, SIDE)))])
+    masks = simplify(flat, {'coarse': 0.01})
+    (kept,) = kept_rings(flat, masks['coarse'])
+    assert (kept[0] == kept[-1]).all()
+    assert len(np.unique(kept[:-1], axis=0)) >= MIN_RING_VERTICES
+
+
+def test_restored_shared_border_matches_on_both_sides():
+    s = SIDE
+    left = ring((0, 0), (s, 0), (s, s), (0, s))
+    right = ring((s, 0), (2 * s, 0), (2 * s, s), (s, s))
+    flat = geometry.flatten_features([polygon_feature(left), polygon_feature(right)])
+    masks = simplify(flat, {'coarse': 0.01})
+    a, b = kept_rings(flat, masks['coarse'])
+
+    for kept in (a, b):
+        assert len(np.unique(kept[:-1], axis=0)) >= MIN_RING_VERTICES
+    border_a = {tuple(p) for p in a if np.isclose(p[0], s)}
+    border_b = {tuple(p) for p in b if np.isclose(p[0], s)}
+    assert border_a == border_b
+    assert len(border_a) > 2  # a vertex between the two junctions came back
+
+
+def test_fine_tolerance_keeps_every_vertex():
+    flat = geometry.flatten_features([polygon_feature(ring((0, 0), (1, 0), (1, 1), (0, 1)))])
+    masks = simplify(flat, {'fine': 1e-9})
+    # Collinear edge points are dropped even at a tiny tolerance; corners stay
+    kept, = kept_rings(flat, masks['fine'])
+    assert {tuple(p) for p in kept} == {(0, 0), (1, 0), (1, 1), (0, 1)}
+
+
+def test_collapse_levels_aliases_identical_coarser_level():
+    fine = np.array([True, True, True])
+    masks = {'coarse': np.array([True, False, True]), 'medium': fine.copy(), 'fine': fine}
+    distinct, aliases = collapse_levels(masks)
+    assert list(distinct) == ['coarse', 'fine']
+    assert aliases == {'medium': 'fine'}
+    assert resolve_level({'aliases': aliases}, 'medium') == 'fine'
+    assert resolve_level(None, 'coarse') == 'coarse'
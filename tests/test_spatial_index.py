@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from spatial_index import build_index, lookup, lookup_gn_uid
+
+
+def square(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]
+
+
+@pytest.fixture
+def index():
+    features = [
+        # GN with a hole
+        {'id': 101, 'geometry': {'type': 'Polygon', 'coordinates': [square(0, 0, 10, 10), square(4, 4, 6, 6)]}},
+        # Two-part GN with a gap between the parts
+        {'id': 202, 'geometry': {'type': 'MultiPolygon', 'coordinates': [[square(20, 20, 22, 22)],
+                                                                         [square(30, 30, 32, 32)]]}},
+        # Unlinked feature inside the hole
+        {'id': None, 'geometry': {'type': 'Polygon', 'coordinates': [square(4.5, 4.5, 5.5, 5.5)]}},
+        {'id': 303, 'geometry': None},
+    ]
+    return build_index(features, capacity=2)
+
+
+POINTS = {  # (lon, lat): feature
+    (1, 1): 0,
+    (4.2, 4.2): -1,    # in the hole only
+    (5, 5): 2,         # in the hole and in the feature filling it
+    (21, 21): 1,
+    (31, 31): 1,
+    (25, 25): -1,      # inside the multipart bounding box, between the parts
+    (50, 50): -1,
+}
+
+
+@pytest.mark.parametrize('chunk', [2, 100])
+def test_lookup_holes_and_multipart(index, chunk):
+    lon, lat = np.array(list(POINTS), dtype=float).T
+    assert lookup(index, lat, lon, chunk=chunk).tolist() == list(POINTS.values())
+
+
+def test_lookup_gn_uid(index):
+    lon, lat = np.array(list(POINTS), dtype=float).T
+    assert lookup_gn_uid(index, lat, lon).tolist() == [101, -1, -1, 202, 202, -1, -1]
+
+
+def test_feature_without_geometry_is_not_indexed(index):
+    assert 3 not in index.order.tolist()
+    assert index.gn_uid.tolist() == [101, 202, -1, 303]